@@ -73,6 +73,56 @@ function radiansToDegrees(radians) {
 class Vecta {
   static TAU = Math.PI * 2;
 
+  /*
+   * Maximum number of unused instances kept for acquire() to reuse.
+   */
+  static POOL_SIZE = 1024;
+
+  /*
+   * Unused instances given back with release().
+   */
+  static _pool = [];
+
+  /*
+   * Whether this instance is in the pool so releasing it again is ignored.
+   * It is private so it does not show up in Object.keys() or JSON.
+   */
+  #pooled = false;
+
+  /*
+   * Return a Vecta instance at (x, y) reused from the pool if possible.
+   *
+   * Give it back with release() once nothing refers to it anymore
+   * so a loop over many vectors does not allocate a new one each time.
+   */
+  static acquire(x = 0, y = 0) {
+    let v = Vecta._pool.pop();
+    if (v === undefined) {
+      return new Vecta(x, y);
+    }
+    v.#pooled = false;
+    v.x = x;
+    v.y = y;
+    return v;
+  }
+
+  /*
+   * Give the Vecta instances back to the pool for acquire() to reuse.
+   *
+   * Releasing an instance already in the pool does nothing.
+   */
+  static release(...vectors) {
+    for (let v of vectors) {
+      if (!(v instanceof Vecta)) {
+        throw new TypeError('Only Vecta instances can be released.');
+      }
+      if (!v.#pooled && (Vecta._pool.length < Vecta.POOL_SIZE)) {
+        v.#pooled = true;
+        Vecta._pool.push(v);
+      }
+    }
+  }
+
   /*
    * Return true if the Numbers first and second are equal to places.
    *
@@ -85,10 +135,25 @@ class Vecta {
     if (typeof second !== 'number') {
       return false;
     }
+    if (first === second) {
+      return true;
+    }
+    // Numbers this far apart cannot round to the same places so skip toFixed()
+    if (Math.abs(first - second) > 2 * Math.pow(10, -places)) {
+      return false;
+    }
     return (first.toFixed(places) === second.toFixed(places));
   }
 
   constructor() {
+    if ((arguments.length === 2) &&
+        (typeof arguments[0] === 'number') && (typeof arguments[1] === 'number')) {
+      // Most vectors are made from 2 Numbers so skip the checks below
+      this.x = arguments[0];
+      this.y = arguments[1];
+      return;
+    }
+
     let x, y;
     if (arguments.length === 1) {
       if (typeof arguments[0] === 'number') {
@@ -388,10 +453,13 @@ class Vecta {
       throw new RangeError('Normal must not be of length 0.');
     }
 
-    let n = v.normalize(),
-        dot_product = this.dot(n);
-    this.x -= 2 * n.x * dot_product;
-    this.y -= 2 * n.y * dot_product;
+    // Normalize the normal without allocating another vector
+    let length = v.length(),
+        nx = v.x / length,
+        ny = v.y / length,
+        dot_product = (this.x * nx) + (this.y * ny);
+    this.x -= 2 * nx * dot_product;
+    this.y -= 2 * ny * dot_product;
   }
 
   /*
@@ -444,7 +512,65 @@ Vecta.prototype.toString = function () {
  * A JavaScript 3-Dimensional vector based on pygame.math.Vector3.
  */
 class Vecta3D {
+  /*
+   * Maximum number of unused instances kept for acquire() to reuse.
+   */
+  static POOL_SIZE = 1024;
+
+  /*
+   * Unused instances given back with release().
+   */
+  static _pool = [];
+
+  /*
+   * Whether this instance is in the pool like in Vecta.
+   */
+  #pooled = false;
+
+  /*
+   * Return a Vecta3D instance at (x, y, z) reused from the pool if possible.
+   *
+   * Give it back with release() once nothing refers to it anymore.
+   */
+  static acquire(x = 0, y = 0, z = 0) {
+    let v = Vecta3D._pool.pop();
+    if (v === undefined) {
+      return new Vecta3D(x, y, z);
+    }
+    v.#pooled = false;
+    v.x = x;
+    v.y = y;
+    v.z = z;
+    return v;
+  }
+
+  /*
+   * Give the Vecta3D instances back to the pool for acquire() to reuse.
+   *
+   * Releasing an instance already in the pool does nothing.
+   */
+  static release(...vectors) {
+    for (let v of vectors) {
+      if (!(v instanceof Vecta3D)) {
+        throw new TypeError('Only Vecta3D instances can be released.');
+      }
+      if (!v.#pooled && (Vecta3D._pool.length < Vecta3D.POOL_SIZE)) {
+        v.#pooled = true;
+        Vecta3D._pool.push(v);
+      }
+    }
+  }
+
   constructor() {
+    if ((arguments.length === 3) && (typeof arguments[0] === 'number') &&
+        (typeof arguments[1] === 'number') && (typeof arguments[2] === 'number')) {
+      // Most vectors are made from 3 Numbers so skip the checks below
+      this.x = arguments[0];
+      this.y = arguments[1];
+      this.z = arguments[2];
+      return;
+    }
+
     let x, y, z;
     if (arguments.length === 1) {
       if (typeof arguments[0] === 'number') {
@@ -803,11 +929,15 @@ class Vecta3D {
       throw new RangeError('Normal must not be of length 0.');
     }
 
-    let n = v.normalize(),
-        dot_product = this.dot(n);
-    this.x -= 2 * n.x * dot_product;
-    this.y -= 2 * n.y * dot_product;
-    this.z -= 2 * n.z * dot_product;
+    // Normalize the normal without allocating another vector
+    let length = v.length(),
+        nx = v.x / length,
+        ny = v.y / length,
+        nz = v.z / length,
+        dot_product = (this.x * nx) + (this.y * ny) + (this.z * nz);
+    this.x -= 2 * nx * dot_product;
+    this.y -= 2 * ny * dot_product;
+    this.z -= 2 * nz * dot_product;
   }
 
   /*
@@ -837,3 +967,533 @@ class Vecta3D {
 Vecta3D.prototype.toString = function () {
   return `[${ this.x }, ${ this.y }, ${ this.z }]`;
 }
+
+/*
+ * A fixed number of 2-Dimensional vectors stored in one Float64Array per
+ * component.
+ *
+ * The bulk operations update every vector in place without allocating,
+ * so use it instead of an Array of Vecta instances for particles and boids.
+ * Vector i is (x[i], y[i]).
+ */
+class VectaArray {
+  constructor(length) {
+    if (!Number.isInteger(length)) {
+      throw new TypeError('length must be an integer.');
+    }
+    if (length < 0) {
+      throw new RangeError('length must not be negative.');
+    }
+    this.length = length;
+    this.x = new Float64Array(length);
+    this.y = new Float64Array(length);
+  }
+
+  /*
+   * Return a new VectaArray instance with a copy of each vector in the Array.
+   *
+   * Each vector may be anything accepted by the Vecta constructor.
+   */
+  static from(vectors) {
+    let result = new VectaArray(vectors.length);
+    for (let i = 0; i < vectors.length; i++) {
+      result.set(i, vectors[i]);
+    }
+    return result;
+  }
+
+  /*
+   * Return a Vecta instance of the other vector or throw an Error.
+   */
+  static _toVecta(args) {
+    if (args.length <= 0) {
+      throw new Error('Not enough arguments.');
+    }
+    if (args[0] instanceof Vecta) {
+      return args[0];
+    }
+    return new Vecta(...args);
+  }
+
+  _checkIndex(index) {
+    if (!Number.isInteger(index)) {
+      throw new TypeError('index must be an integer.');
+    }
+    if ((index < 0) || (this.length <= index)) {
+      throw new RangeError(`index must be between 0 and ${ this.length - 1 }, inclusive.`);
+    }
+  }
+
+  /*
+   * Return a new Vecta instance of the vector at index.
+   */
+  get(index) {
+    this._checkIndex(index);
+    return new Vecta(this.x[index], this.y[index]);
+  }
+
+  /*
+   * Set the vector at index to the other vector.
+   */
+  set(index, ...args) {
+    this._checkIndex(index);
+    if ((args.length === 2) && (typeof args[0] === 'number') && (typeof args[1] === 'number')) {
+      this.x[index] = args[0];
+      this.y[index] = args[1];
+      return;
+    }
+    let v = VectaArray._toVecta(args);
+    this.x[index] = v.x;
+    this.y[index] = v.y;
+  }
+
+  /*
+   * Add other multiplied by scale to every vector.
+   *
+   * other is either a VectaArray instance of the same length added
+   * vector by vector, or a single vector added to all of them.
+   */
+  addScaled(other, scale = 1) {
+    let x = this.x,
+        y = this.y;
+    if (other instanceof VectaArray) {
+      if (other.length !== this.length) {
+        throw new RangeError('other must have the same length.');
+      }
+      let ox = other.x,
+          oy = other.y;
+      for (let i = 0; i < this.length; i++) {
+        x[i] += ox[i] * scale;
+        y[i] += oy[i] * scale;
+      }
+      return;
+    }
+    let v = VectaArray._toVecta([other]),
+        dx = v.x * scale,
+        dy = v.y * scale;
+    for (let i = 0; i < this.length; i++) {
+      x[i] += dx;
+      y[i] += dy;
+    }
+  }
+
+  /*
+   * Multiply every vector by a Number.
+   */
+  scale(factor) {
+    if (typeof factor !== 'number') {
+      throw new TypeError('factor must be a Number.');
+    }
+    for (let i = 0; i < this.length; i++) {
+      this.x[i] *= factor;
+      this.y[i] *= factor;
+    }
+  }
+
+  /*
+   * Rotate every vector by the given angle in degrees.
+   */
+  rotate_ip(degrees) {
+    this.rotate_ip_rad(degrees * Math.PI / 180);
+  }
+
+  /*
+   * Rotate every vector by the given angle in radians.
+   */
+  rotate_ip_rad(radians) {
+    radians = ((radians % Vecta.TAU) + Vecta.TAU) % Vecta.TAU;
+    if (Vecta.isAlmostEqual(radians, 0)) {
+      return;
+    }
+    let sin = Math.sin(radians),
+        cos = Math.cos(radians);
+    // Use exact values for right angles like Vecta
+    if (Vecta.isAlmostEqual(radians, Math.PI / 2)) {
+      [sin, cos] = [1, 0];
+    }
+    else if (Vecta.isAlmostEqual(radians, Math.PI)) {
+      [sin, cos] = [0, -1];
+    }
+    else if (Vecta.isAlmostEqual(radians, 3 * Math.PI / 2)) {
+      [sin, cos] = [-1, 0];
+    }
+
+    let x = this.x,
+        y = this.y;
+    for (let i = 0; i < this.length; i++) {
+      let oldX = x[i];
+      x[i] = (cos * oldX) - (sin * y[i]);
+      y[i] = (sin * oldX) + (cos * y[i]);
+    }
+  }
+
+  /*
+   * Scale every vector to have length 1.
+   *
+   * Unlike Vecta, vectors of length 0 are left alone instead of throwing
+   * an Error part way through.
+   */
+  normalize_ip() {
+    let x = this.x,
+        y = this.y;
+    for (let i = 0; i < this.length; i++) {
+      let length = Math.sqrt((x[i] * x[i]) + (y[i] * y[i]));
+      if (length > 0) {
+        x[i] /= length;
+        y[i] /= length;
+      }
+    }
+  }
+
+  /*
+   * Return a Float64Array of the length of every vector.
+   *
+   * Pass a Float64Array as out to reuse it instead of allocating one.
+   */
+  lengths(out = new Float64Array(this.length)) {
+    for (let i = 0; i < this.length; i++) {
+      out[i] = Math.sqrt((this.x[i] * this.x[i]) + (this.y[i] * this.y[i]));
+    }
+    return out;
+  }
+
+  /*
+   * Return a Float64Array of the Euclidean distance from every vector to point.
+   *
+   * Pass a Float64Array as out to reuse it instead of allocating one.
+   */
+  distancesTo(point, out = new Float64Array(this.length)) {
+    let v = VectaArray._toVecta([point]);
+    for (let i = 0; i < this.length; i++) {
+      let dx = this.x[i] - v.x,
+          dy = this.y[i] - v.y;
+      out[i] = Math.sqrt((dx * dx) + (dy * dy));
+    }
+    return out;
+  }
+
+  /*
+   * Return the index of the vector closest to point other than the one
+   * at exclude, or -1 if there is none.
+   *
+   * Use nearest(vectors.get(i), i) to find the nearest neighbour of vector i.
+   */
+  nearest(point, exclude = -1) {
+    let v = VectaArray._toVecta([point]),
+        result = -1,
+        best = Infinity;
+    for (let i = 0; i < this.length; i++) {
+      let dx = this.x[i] - v.x,
+          dy = this.y[i] - v.y,
+          distance = (dx * dx) + (dy * dy);
+      if ((distance < best) && (i !== exclude)) {
+        best = distance;
+        result = i;
+      }
+    }
+    return result;
+  }
+
+  /*
+   * Return an Array of the indexes of the vectors within radius of point.
+   *
+   * Pass an Array as out to reuse it instead of allocating one.
+   */
+  within(point, radius, out = []) {
+    let v = VectaArray._toVecta([point]),
+        limit = radius * radius;
+    out.length = 0;
+    for (let i = 0; i < this.length; i++) {
+      let dx = this.x[i] - v.x,
+          dy = this.y[i] - v.y;
+      if (((dx * dx) + (dy * dy)) <= limit) {
+        out.push(i);
+      }
+    }
+    return out;
+  }
+}
+
+/*
+ * A fixed number of 3-Dimensional vectors stored in one Float64Array per
+ * component.
+ *
+ * Vector i is (x[i], y[i], z[i]).
+ */
+class VectaArray3D {
+  constructor(length) {
+    if (!Number.isInteger(length)) {
+      throw new TypeError('length must be an integer.');
+    }
+    if (length < 0) {
+      throw new RangeError('length must not be negative.');
+    }
+    this.length = length;
+    this.x = new Float64Array(length);
+    this.y = new Float64Array(length);
+    this.z = new Float64Array(length);
+  }
+
+  /*
+   * Return a new VectaArray3D instance with a copy of each vector in the Array.
+   *
+   * Each vector may be anything accepted by the Vecta3D constructor.
+   */
+  static from(vectors) {
+    let result = new VectaArray3D(vectors.length);
+    for (let i = 0; i < vectors.length; i++) {
+      result.set(i, vectors[i]);
+    }
+    return result;
+  }
+
+  /*
+   * Return a Vecta3D instance of the other vector or throw an Error.
+   */
+  static _toVecta3D(args) {
+    if (args.length <= 0) {
+      throw new Error('Not enough arguments.');
+    }
+    if (args[0] instanceof Vecta3D) {
+      return args[0];
+    }
+    return new Vecta3D(...args);
+  }
+
+  _checkIndex(index) {
+    if (!Number.isInteger(index)) {
+      throw new TypeError('index must be an integer.');
+    }
+    if ((index < 0) || (this.length <= index)) {
+      throw new RangeError(`index must be between 0 and ${ this.length - 1 }, inclusive.`);
+    }
+  }
+
+  /*
+   * Return a new Vecta3D instance of the vector at index.
+   */
+  get(index) {
+    this._checkIndex(index);
+    return new Vecta3D(this.x[index], this.y[index], this.z[index]);
+  }
+
+  /*
+   * Set the vector at index to the other vector.
+   */
+  set(index, ...args) {
+    this._checkIndex(index);
+    if ((args.length === 3) && (typeof args[0] === 'number') &&
+        (typeof args[1] === 'number') && (typeof args[2] === 'number')) {
+      this.x[index] = args[0];
+      this.y[index] = args[1];
+      this.z[index] = args[2];
+      return;
+    }
+    let v = VectaArray3D._toVecta3D(args);
+    this.x[index] = v.x;
+    this.y[index] = v.y;
+    this.z[index] = v.z;
+  }
+
+  /*
+   * Add other multiplied by scale to every vector.
+   *
+   * other is either a VectaArray3D instance of the same length added
+   * vector by vector, or a single vector added to all of them.
+   */
+  addScaled(other, scale = 1) {
+    let x = this.x,
+        y = this.y,
+        z = this.z;
+    if (other instanceof VectaArray3D) {
+      if (other.length !== this.length) {
+        throw new RangeError('other must have the same length.');
+      }
+      let ox = other.x,
+          oy = other.y,
+          oz = other.z;
+      for (let i = 0; i < this.length; i++) {
+        x[i] += ox[i] * scale;
+        y[i] += oy[i] * scale;
+        z[i] += oz[i] * scale;
+      }
+      return;
+    }
+    let v = VectaArray3D._toVecta3D([other]),
+        dx = v.x * scale,
+        dy = v.y * scale,
+        dz = v.z * scale;
+    for (let i = 0; i < this.length; i++) {
+      x[i] += dx;
+      y[i] += dy;
+      z[i] += dz;
+    }
+  }
+
+  /*
+   * Multiply every vector by a Number.
+   */
+  scale(factor) {
+    if (typeof factor !== 'number') {
+      throw new TypeError('factor must be a Number.');
+    }
+    for (let i = 0; i < this.length; i++) {
+      this.x[i] *= factor;
+      this.y[i] *= factor;
+      this.z[i] *= factor;
+    }
+  }
+
+  /*
+   * Rotate every vector by the given angle in degrees around axis.
+   */
+  rotate_ip(degrees, axis) {
+    this.rotate_ip_rad(degrees * Math.PI / 180, axis);
+  }
+
+  /*
+   * Rotate every vector by the given angle in radians around axis.
+   */
+  rotate_ip_rad(radians, axis) {
+    if (typeof radians !== 'number') {
+      throw new TypeError('angle must be a Number.');
+    }
+    let a = VectaArray3D._toVecta3D([axis]),
+        axisLength = a.length();
+    if (axisLength <= 0) {
+      throw new RangeError('Cannot normalize Vector of length 0.');
+    }
+    radians = ((radians % Vecta.TAU) + Vecta.TAU) % Vecta.TAU;
+    if (Vecta.isAlmostEqual(radians, 0)) {
+      return;
+    }
+
+    let ax = a.x / axisLength,
+        ay = a.y / axisLength,
+        az = a.z / axisLength,
+        sin = Math.sin(radians),
+        cos = Math.cos(radians);
+    // Use exact values for right angles like Vecta3D
+    if (Vecta.isAlmostEqual(radians, Math.PI / 2)) {
+      [sin, cos] = [1, 0];
+    }
+    else if (Vecta.isAlmostEqual(radians, Math.PI)) {
+      [sin, cos] = [0, -1];
+    }
+    else if (Vecta.isAlmostEqual(radians, 3 * Math.PI / 2)) {
+      [sin, cos] = [-1, 0];
+    }
+
+    // Same rotation matrix as Vecta3D computed once for every vector
+    let c = 1 - cos,
+        m00 = cos + (ax * ax * c),
+        m01 = (ax * ay * c) - (az * sin),
+        m02 = (ax * az * c) + (ay * sin),
+        m10 = (ax * ay * c) + (az * sin),
+        m11 = cos + (ay * ay * c),
+        m12 = (ay * az * c) - (ax * sin),
+        m20 = (ax * az * c) - (ay * sin),
+        m21 = (ay * az * c) + (ax * sin),
+        m22 = cos + (az * az * c),
+        x = this.x,
+        y = this.y,
+        z = this.z;
+    for (let i = 0; i < this.length; i++) {
+      let oldX = x[i],
+          oldY = y[i],
+          oldZ = z[i];
+      x[i] = (oldX * m00) + (oldY * m01) + (oldZ * m02);
+      y[i] = (oldX * m10) + (oldY * m11) + (oldZ * m12);
+      z[i] = (oldX * m20) + (oldY * m21) + (oldZ * m22);
+    }
+  }
+
+  /*
+   * Scale every vector to have length 1.
+   *
+   * Unlike Vecta3D, vectors of length 0 are left alone instead of throwing
+   * an Error part way through.
+   */
+  normalize_ip() {
+    let x = this.x,
+        y = this.y,
+        z = this.z;
+    for (let i = 0; i < this.length; i++) {
+      let length = Math.sqrt((x[i] * x[i]) + (y[i] * y[i]) + (z[i] * z[i]));
+      if (length > 0) {
+        x[i] /= length;
+        y[i] /= length;
+        z[i] /= length;
+      }
+    }
+  }
+
+  /*
+   * Return a Float64Array of the length of every vector.
+   *
+   * Pass a Float64Array as out to reuse it instead of allocating one.
+   */
+  lengths(out = new Float64Array(this.length)) {
+    for (let i = 0; i < this.length; i++) {
+      out[i] = Math.sqrt((this.x[i] * this.x[i]) + (this.y[i] * this.y[i]) + (this.z[i] * this.z[i]));
+    }
+    return out;
+  }
+
+  /*
+   * Return a Float64Array of the Euclidean distance from every vector to point.
+   *
+   * Pass a Float64Array as out to reuse it instead of allocating one.
+   */
+  distancesTo(point, out = new Float64Array(this.length)) {
+    let v = VectaArray3D._toVecta3D([point]);
+    for (let i = 0; i < this.length; i++) {
+      let dx = this.x[i] - v.x,
+          dy = this.y[i] - v.y,
+          dz = this.z[i] - v.z;
+      out[i] = Math.sqrt((dx * dx) + (dy * dy) + (dz * dz));
+    }
+    return out;
+  }
+
+  /*
+   * Return the index of the vector closest to point other than the one
+   * at exclude, or -1 if there is none.
+   */
+  nearest(point, exclude = -1) {
+    let v = VectaArray3D._toVecta3D([point]),
+        result = -1,
+        best = Infinity;
+    for (let i = 0; i < this.length; i++) {
+      let dx = this.x[i] - v.x,
+          dy = this.y[i] - v.y,
+          dz = this.z[i] - v.z,
+          distance = (dx * dx) + (dy * dy) + (dz * dz);
+      if ((distance < best) && (i !== exclude)) {
+        best = distance;
+        result = i;
+      }
+    }
+    return result;
+  }
+
+  /*
+   * Return an Array of the indexes of the vectors within radius of point.
+   *
+   * Pass an Array as out to reuse it instead of allocating one.
+   */
+  within(point, radius, out = []) {
+    let v = VectaArray3D._toVecta3D([point]),
+        limit = radius * radius;
+    out.length = 0;
+    for (let i = 0; i < this.length; i++) {
+      let dx = this.x[i] - v.x,
+          dy = this.y[i] - v.y,
+          dz = this.z[i] - v.z;
+      if (((dx * dx) + (dy * dy) + (dz * dz)) <= limit) {
+        out.push(i);
+      }
+    }
+    return out;
+  }
+}
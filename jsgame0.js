@@ -702,9 +702,112 @@ const keyboard = (function () {
  */
 const clock = (function () {
   /*
-   * Array of Arrays containing the scheduled callbacks.
+   * Array of Objects containing the scheduled callbacks as a binary min-heap
+   * ordered by their absolute due time.
+   *
+   * Each Object has the callback, its due time, its repeat interval or 0,
+   * the order it was scheduled in, and its index in heap.
+   */
+  let heap = [];
+
+  /*
+   * Map the callbacks to Sets of their Objects in heap for unschedule().
+   */
+  const CALLBACK_MAP = new Map();
+
+  /*
+   * Number of seconds the queue has been updated by.
+   */
+  let now = 0;
+
+  /*
+   * Counter to order the callbacks in the order they were scheduled.
+   */
+  let counter = 0;
+
+  /*
+   * Return true if the Object a is due before the Object b.
+   */
+  function before(a, b) {
+    return ((a.due < b.due) || ((a.due === b.due) && (a.order < b.order)));
+  }
+
+  /*
+   * Move the Object at index up heap until its parent is due before it.
+   */
+  function siftUp(index) {
+    let entry = heap[index];
+    while (index > 0) {
+      let parent = (index - 1) >> 1;
+      if (!before(entry, heap[parent])) {
+        break;
+      }
+      heap[index] = heap[parent];
+      heap[index].index = index;
+      index = parent;
+    }
+    heap[index] = entry;
+    entry.index = index;
+  }
+
+  /*
+   * Move the Object at index down heap until it is due before its children.
+   */
+  function siftDown(index) {
+    let entry = heap[index],
+        length = heap.length;
+    while (true) {
+      let child = 2 * index + 1;
+      if (child >= length) {
+        break;
+      }
+      if ((child + 1 < length) && before(heap[child + 1], heap[child])) {
+        child++;
+      }
+      if (!before(heap[child], entry)) {
+        break;
+      }
+      heap[index] = heap[child];
+      heap[index].index = index;
+      index = child;
+    }
+    heap[index] = entry;
+    entry.index = index;
+  }
+
+  /*
+   * Add the callback to heap to be due at delay seconds from now.
+   */
+  function push(callback, delay, interval) {
+    let entry = {
+      callback: callback,
+      due: now + delay,
+      interval: interval,
+      order: counter++,
+      index: heap.length
+    };
+    heap.push(entry);
+    siftUp(entry.index);
+    let entries = CALLBACK_MAP.get(callback);
+    if (entries === undefined) {
+      entries = new Set();
+      CALLBACK_MAP.set(callback, entries);
+    }
+    entries.add(entry);
+  }
+
+  /*
+   * Remove the Object at index from heap.
    */
-  let queue = [];
+  function remove(index) {
+    let last = heap.pop();
+    if (index < heap.length) {
+      heap[index] = last;
+      last.index = index;
+      siftDown(index);
+      siftUp(last.index);
+    }
+  }
 
   return {
     /*
@@ -720,7 +823,7 @@ const clock = (function () {
       if (delay <= 0) {
         throw new RangeError('delay must be a positive number in seconds.');
       }
-      queue.push([callback, delay, 0]);
+      push(callback, delay, 0);
     },
 
     /*
@@ -744,7 +847,7 @@ const clock = (function () {
       if (interval <= 0) {
         throw new RangeError('interval must be a positive number in seconds.');
       }
-      queue.push([callback, interval, interval]);
+      push(callback, interval, interval);
     },
 
     /*
@@ -754,40 +857,69 @@ const clock = (function () {
       if (typeof callback !== 'function') {
         throw new TypeError('callback must be a function.');
       }
-      queue = queue.filter((q) => (q[0] !== callback));
+      let entries = CALLBACK_MAP.get(callback);
+      if (entries === undefined) {
+        return;
+      }
+      for (let entry of entries) {
+        remove(entry.index);
+      }
+      CALLBACK_MAP.delete(callback);
     },
 
     _clearQueue() {
-      queue = [];
+      heap = [];
+      CALLBACK_MAP.clear();
+      now = 0;
     },
 
     /*
      * Return a copy of queue for testing.
+     *
+     * Each callback is an Array of the callback, the seconds until it is due,
+     * and its repeat interval in the order the callbacks were scheduled.
      */
     _getQueue() {
-      return queue.slice();
+      return heap.slice().sort((a, b) => (a.order - b.order)).map(
+        (entry) => [entry.callback, entry.due - now, entry.interval]);
     },
 
     /*
-     * Loop through all the callbacks in queue and call any that are due.
+     * Call the callbacks that are due after dt more seconds.
+     *
+     * Only the callbacks that are due are visited so the cost is
+     * proportional to their number instead of the size of the queue.
      */
     _updateQueue(dt) {
-      let due = [],
-          result = [],
-          newETA;
-      for (let [callback, eta, next] of queue) {
-        newETA = eta - dt;
-        if (newETA <= 0) {
-          due.push(callback);
-          if (next > 0) {
-            result.push([callback, next, next]);
-          }
+      now += dt;
+      if ((heap.length <= 0) || (heap[0].due > now)) {
+        return;
+      }
+
+      let due = [];
+      while ((heap.length > 0) && (heap[0].due <= now)) {
+        due.push(heap[0]);
+        remove(0);
+      }
+      // Call the callbacks in the order they were scheduled
+      due.sort((a, b) => (a.order - b.order));
+      for (let i = 0; i < due.length; i++) {
+        let entry = due[i];
+        if (entry.interval > 0) {
+          entry.due = now + entry.interval;
+          entry.index = heap.length;
+          heap.push(entry);
+          siftUp(entry.index);
         }
         else {
-          result.push([callback, newETA, next]);
+          let entries = CALLBACK_MAP.get(entry.callback);
+          entries.delete(entry);
+          if (entries.size <= 0) {
+            CALLBACK_MAP.delete(entry.callback);
+          }
         }
+        due[i] = entry.callback;
       }
-      queue = result;
 
       // Call the callbacks after updating the queue to avoid
       // the lost update problem if a callback modifies the queue
@@ -844,6 +976,11 @@ const music = (function () {
         return;
       }
       current = TRACK_MAP.get(name);
+      if ('defer' in current.dataset) {
+        // Resolve a deferred track on first use
+        delete current.dataset.defer;
+        current.preload = 'auto';
+      }
       current.currentTime = 0;
       current.loop = loop;
       current.muted = false;
@@ -1014,8 +1151,26 @@ const tone = (function () {
   const ATTACK = 350 / SAMPLE_RATE;
   const DECAY = 650 / SAMPLE_RATE;
   const RELEASE = 2000 / SAMPLE_RATE;
+  const BUFFER_CACHE_SIZE = 64;
+  const VOICE_COUNT = 16;
+  const STEAL_FADE = 0.005;
 
-  let context = null;
+  /*
+   * Map the string keys of a note and a duration to the AudioBuffer of the
+   * rendered tone, in least recently used order.
+   */
+  const BUFFER_CACHE = new Map();
+
+  /*
+   * Fixed pool of Objects with the GainNode of each voice,
+   * the AudioBufferSourceNode playing on it, and when it ends.
+   */
+  const VOICES = [];
+
+  let context = null,
+      cacheHits = 0,
+      cacheMisses = 0,
+      stolenVoices = 0;
 
   /*
    * Lazily create the AudioContext and build NOTE_MAP as needed.
@@ -1060,12 +1215,148 @@ const tone = (function () {
     }
   }
 
+  /*
+   * Return an Array of [gain, offset in seconds] of the Attack Decay Sustain
+   * Release (ADSR) envelope of a tone lasting duration seconds.
+   */
+  function getEnvelope(duration) {
+    let envelope = [[0, 0]];
+    if (duration < (ATTACK + DECAY)) {
+      // If duration is shorter than the Attack and Decay stages,
+      // then there is no Decay stage
+      envelope.push([1, duration * 0.1]);
+      envelope.push([0.9, duration]);
+      envelope.push([0, duration + RELEASE]);
+    }
+    else {
+      envelope.push([1, ATTACK]);
+      envelope.push([0.7, ATTACK + DECAY]);
+      envelope.push([0.7, duration]);
+      envelope.push([0, duration + RELEASE]);
+    }
+    return envelope;
+  }
+
+  /*
+   * Return an AudioBuffer of a sine wave of frequency hertz
+   * shaped by the envelope of a tone lasting duration seconds.
+   */
+  function render(frequency, duration) {
+    let envelope = getEnvelope(duration),
+        rate = context.sampleRate,
+        buffer = context.createBuffer(1, Math.ceil((duration + RELEASE) * rate), rate),
+        data = buffer.getChannelData(0),
+        step = 2 * Math.PI * frequency / rate,
+        stage = 1;
+    for (let i = 0; i < data.length; i++) {
+      let t = i / rate;
+      while ((stage < envelope.length - 1) && (t >= envelope[stage][1])) {
+        stage++;
+      }
+      // Pygame Zero linearly interpolates the samples so we do the same
+      let [startGain, startTime] = envelope[stage - 1],
+          [endGain, endTime] = envelope[stage],
+          fraction = (endTime > startTime) ? Math.min((t - startTime) / (endTime - startTime), 1) : 1;
+      data[i] = (startGain + ((endGain - startGain) * fraction)) * Math.sin(step * i);
+    }
+    return buffer;
+  }
+
+  /*
+   * Return the AudioBuffer of the note lasting duration seconds,
+   * rendering it only if it is not cached.
+   */
+  function getBuffer(note, duration) {
+    let key = note + '\n' + duration,
+        buffer = BUFFER_CACHE.get(key);
+    if (buffer !== undefined) {
+      // Move it to the end as the most recently used
+      BUFFER_CACHE.delete(key);
+      BUFFER_CACHE.set(key, buffer);
+      cacheHits++;
+      return buffer;
+    }
+
+    cacheMisses++;
+    buffer = render(NOTE_MAP.get(note), duration);
+    BUFFER_CACHE.set(key, buffer);
+    if (BUFFER_CACHE.size > BUFFER_CACHE_SIZE) {
+      BUFFER_CACHE.delete(BUFFER_CACHE.keys().next().value);
+    }
+    return buffer;
+  }
+
+  /*
+   * Return a free voice or else the voice closest to finishing.
+   */
+  function getVoice() {
+    if (VOICES.length <= 0) {
+      for (let i = 0; i < VOICE_COUNT; i++) {
+        let gain = context.createGain();
+        gain.connect(context.destination);
+        VOICES.push({gain: gain, source: null, end: 0});
+      }
+    }
+
+    let now = context.currentTime,
+        result = VOICES[0];
+    for (let voice of VOICES) {
+      if (voice.end <= now) {
+        return voice;
+      }
+      if (voice.end < result.end) {
+        result = voice;
+      }
+    }
+    return result;
+  }
+
   return {
     _getNoteMap() {
       populateNotes();
       return NOTE_MAP;
     },
 
+    /*
+     * Return the AudioBuffer of note lasting duration seconds.
+     */
+    _getBuffer(note, duration) {
+      populateNotes();
+      return getBuffer(note.trim().toLowerCase(), duration);
+    },
+
+    /*
+     * Return the number of voices still playing.
+     */
+    get activeVoices() {
+      if (context == null) {
+        return 0;
+      }
+      let now = context.currentTime;
+      return VOICES.filter((voice) => (voice.end > now)).length;
+    },
+
+    /*
+     * Return the number of times play() found the tone already rendered.
+     */
+    get cacheHits() {
+      return cacheHits;
+    },
+
+    /*
+     * Return the number of times play() had to render the tone.
+     */
+    get cacheMisses() {
+      return cacheMisses;
+    },
+
+    /*
+     * Return the number of voices cut short to play another tone.
+     */
+    get stolenVoices() {
+      return stolenVoices;
+    },
+
     /*
      * Play note for the given duration.
      *
@@ -1083,40 +1374,31 @@ const tone = (function () {
       }
 
       populateNotes();
-      let cleaned = note.trim().toLowerCase(),
-          envelope = [],
-          gain, oscillator;
+      let cleaned = note.trim().toLowerCase();
       if (NOTE_MAP.has(cleaned)) {
-        // Create the Attack Decay Sustain Release (ADSR) envelope
-        if (duration < (ATTACK + DECAY)) {
-          // If duration is shorter than the Attack and Decay stages,
-          // then there is no Decay stage
-          envelope.push([1, duration * 0.1]);
-          envelope.push([0.9, duration]);
-          envelope.push([0, duration + RELEASE]);
-        }
-        else {
-          envelope.push([1, ATTACK]);
-          envelope.push([0.7, ATTACK + DECAY]);
-          envelope.push([0.7, duration]);
-          envelope.push([0, duration + RELEASE]);
-        }
-
-        gain = context.createGain();
-        gain.connect(context.destination);
-        gain.gain.setValueAtTime(0, context.currentTime);
-        for (let [value, offset] of envelope) {
-          // Pygame Zero linearly interpolates the samples so we do the same
-          gain.gain.linearRampToValueAtTime(value, context.currentTime + offset);
+        // Each (note, duration) is rendered once and played on one of a
+        // fixed number of voices instead of building new nodes every time
+        let buffer = getBuffer(cleaned, duration),
+            voice = getVoice(),
+            start = context.currentTime,
+            source;
+        voice.gain.gain.cancelScheduledValues(start);
+        if (voice.end > start) {
+          // Fade out the stolen voice quickly to avoid a click
+          stolenVoices++;
+          voice.gain.gain.setValueAtTime(voice.gain.gain.value, start);
+          voice.gain.gain.linearRampToValueAtTime(0, start + STEAL_FADE);
+          voice.source.stop(start + STEAL_FADE);
+          start += STEAL_FADE;
         }
+        voice.gain.gain.setValueAtTime(1, start);
 
-        // Create the oscillator to generate the actual tone
-        oscillator = context.createOscillator();
-        oscillator.connect(gain);
-        oscillator.type = 'sine';
-        oscillator.frequency.value = NOTE_MAP.get(cleaned);
-        oscillator.start(context.currentTime);
-        oscillator.stop(context.currentTime + duration + RELEASE);
+        source = context.createBufferSource();
+        source.buffer = buffer;
+        source.connect(voice.gain);
+        source.start(start);
+        voice.source = source;
+        voice.end = start + buffer.duration;
       }
       else {
         throw new RangeError(`Unrecognized note "${ note }". Notes are A-G, are either normal, flat (b) or sharp (#) and of octave 0-8.`);
@@ -1186,6 +1468,18 @@ class Rect {
     this.height = height;
   }
 
+  /*
+   * Return the arguments to the constructor as a Rect.
+   * A single Rect or Actor is returned as is instead of being copied.
+   */
+  static _from(args) {
+    if ((args.length === 1) &&
+        ((args[0] instanceof Rect) || (args[0] instanceof Actor))) {
+      return args[0];
+    }
+    return new Rect(...args);
+  }
+
   get top() {
     return this.y;
   }
@@ -1508,7 +1802,7 @@ class Rect {
             (y < (this.y + this.height)));
   }
   colliderect() {
-    let rect = new Rect(...arguments);
+    let rect = Rect._from(arguments);
     return ((this.x < (rect.x + rect.width)) &&
             (this.y < (rect.y + rect.height)) &&
             ((this.x + this.width) > rect.x) &&
@@ -1516,11 +1810,9 @@ class Rect {
   }
   _collidelist(others) {
     let result = [],
-        i = 0,
-        rect;
+        i = 0;
     for (let other of others) {
-      rect = new Rect(other);
-      if (this.colliderect(rect)) {
+      if (this.colliderect(other)) {
         result.push(i);
       }
       i++;
@@ -1978,7 +2270,7 @@ class Actor {
             (y < (this.y + this.height)));
   }
   colliderect() {
-    let rect = new Rect(...arguments);
+    let rect = Rect._from(arguments);
     return ((this.x < (rect.x + rect.width)) &&
             (this.y < (rect.y + rect.height)) &&
             ((this.x + this.width) > rect.x) &&
@@ -2070,6 +2362,283 @@ class Actor {
   }
 }
 
+/*
+ * Opt-in broad-phase index to find the colliding Rect and Actor instances
+ * without checking every pair.
+ *
+ * The index is a uniform grid of square cells hashed into a Map.
+ * Each registered object is binned into the cells its bounds overlap.
+ * The bounds are read when the object is added or updated, so call update()
+ * after moving an object.
+ * Moving within the same cells costs O(1).
+ *
+ * query() and pairs() return the same collisions as colliderect() in the
+ * order the objects were added.
+ */
+class SpatialIndex {
+  /*
+   * Largest cell coordinate so the cell keys stay exact integers.
+   */
+  static MAX_CELL = 2 ** 25;
+
+  constructor(cellSize = 64) {
+    if (typeof cellSize !== 'number') {
+      throw new TypeError('cellSize must be a positive number.');
+    }
+    if (cellSize <= 0) {
+      throw new RangeError('cellSize must be a positive number.');
+    }
+    this.cellSize = cellSize;
+
+    // Map the integer cell keys to Arrays of the entries in them
+    this._cells = new Map();
+
+    // Map the registered objects to their entries
+    this._entries = new Map();
+
+    // Counters to order the entries and mark them visited by a query
+    this._counter = 0;
+    this._stamp = 0;
+  }
+
+  /*
+   * Return the integer cell coordinate of the number value.
+   */
+  _cell(value) {
+    let cell = Math.floor(value / this.cellSize);
+    return Math.max(-SpatialIndex.MAX_CELL, Math.min(cell, SpatialIndex.MAX_CELL - 1));
+  }
+
+  /*
+   * Return the integer key of the cell at cx and cy.
+   */
+  static _key(cx, cy) {
+    return ((cx + SpatialIndex.MAX_CELL) * SpatialIndex.MAX_CELL * 2) + cy + SpatialIndex.MAX_CELL;
+  }
+
+  /*
+   * Read the bounds of object into entry and return true if its cells changed.
+   *
+   * The old cells are left in entry.cells for _remove().
+   */
+  _bound(entry) {
+    let object = entry.object,
+        x = object.x,
+        y = object.y,
+        width = object.width,
+        height = object.height;
+    entry.x = x;
+    entry.y = y;
+    entry.width = width;
+    entry.height = height;
+
+    // Bin by the normalized bounds since negative sizes can still collide
+    let left = this._cell(Math.min(x, x + width)),
+        top = this._cell(Math.min(y, y + height)),
+        right = this._cell(Math.max(x, x + width)),
+        bottom = this._cell(Math.max(y, y + height));
+    if ((left === entry.left) && (top === entry.top) &&
+        (right === entry.right) && (bottom === entry.bottom)) {
+      return false;
+    }
+    entry.left = left;
+    entry.top = top;
+    entry.right = right;
+    entry.bottom = bottom;
+    return true;
+  }
+
+  /*
+   * Add entry to the cells from left to right and top to bottom.
+   */
+  _insert(entry) {
+    entry.cells.length = 0;
+    for (let cx = entry.left; cx <= entry.right; cx++) {
+      for (let cy = entry.top; cy <= entry.bottom; cy++) {
+        let key = SpatialIndex._key(cx, cy),
+            cell = this._cells.get(key);
+        if (cell === undefined) {
+          cell = [];
+          this._cells.set(key, cell);
+        }
+        cell.push(entry);
+        entry.cells.push(key);
+      }
+    }
+  }
+
+  /*
+   * Remove entry from the cells it was last inserted in.
+   */
+  _remove(entry) {
+    for (let key of entry.cells) {
+      let cell = this._cells.get(key),
+          i = cell.indexOf(entry);
+      cell[i] = cell[cell.length - 1];
+      cell.pop();
+      if (cell.length <= 0) {
+        this._cells.delete(key);
+      }
+    }
+  }
+
+  /*
+   * Number of objects in the index.
+   */
+  get size() {
+    return this._entries.size;
+  }
+
+  /*
+   * Add object with x, y, width, and height like a Rect or Actor to the index.
+   */
+  add(object) {
+    if ((object == null) || (typeof object !== 'object')) {
+      throw new TypeError('object must be a Rect or Actor.');
+    }
+    if (this._entries.has(object)) {
+      this.update(object);
+      return;
+    }
+    let entry = {object: object, order: this._counter++, stamp: 0, cells: []};
+    this._bound(entry);
+    this._insert(entry);
+    this._entries.set(object, entry);
+  }
+
+  /*
+   * Remove object from the index.
+   */
+  remove(object) {
+    let entry = this._entries.get(object);
+    if (entry !== undefined) {
+      this._remove(entry);
+      this._entries.delete(object);
+    }
+  }
+
+  /*
+   * Read the bounds of object again after it moved or changed size.
+   */
+  update(object) {
+    let entry = this._entries.get(object);
+    if (entry === undefined) {
+      throw new RangeError('object is not in the index.');
+    }
+    if (this._bound(entry)) {
+      this._remove(entry);
+      this._insert(entry);
+    }
+  }
+
+  /*
+   * Read the bounds of every object in the index again.
+   */
+  updateAll() {
+    for (let object of this._entries.keys()) {
+      this.update(object);
+    }
+  }
+
+  /*
+   * Remove every object from the index.
+   */
+  clear() {
+    this._cells.clear();
+    this._entries.clear();
+  }
+
+  /*
+   * Return an Array of the objects colliding with the rectangle
+   * given like the arguments to colliderect().
+   */
+  query() {
+    let rect = Rect._from(arguments),
+        x = rect.x,
+        y = rect.y,
+        width = rect.width,
+        height = rect.height,
+        left = this._cell(Math.min(x, x + width)),
+        top = this._cell(Math.min(y, y + height)),
+        right = this._cell(Math.max(x, x + width)),
+        bottom = this._cell(Math.max(y, y + height)),
+        stamp = ++this._stamp,
+        found = [];
+    if ((right - left + 1) * (bottom - top + 1) > this._cells.size) {
+      // Scan the occupied cells instead of the mostly empty area
+      for (let entry of this._entries.values()) {
+        if (SpatialIndex._collide(x, y, width, height, entry)) {
+          found.push(entry);
+        }
+      }
+    }
+    else {
+      for (let cx = left; cx <= right; cx++) {
+        for (let cy = top; cy <= bottom; cy++) {
+          let cell = this._cells.get(SpatialIndex._key(cx, cy));
+          if (cell === undefined) {
+            continue;
+          }
+          for (let entry of cell) {
+            if (entry.stamp === stamp) {
+              continue;
+            }
+            entry.stamp = stamp;
+            if (SpatialIndex._collide(x, y, width, height, entry)) {
+              found.push(entry);
+            }
+          }
+        }
+      }
+      found.sort((a, b) => (a.order - b.order));
+    }
+    return found.map((entry) => entry.object);
+  }
+
+  /*
+   * Return an Array of every pair [a, b] of colliding objects with a added
+   * before b.
+   */
+  pairs() {
+    let found = [];
+    for (let cell of this._cells.values()) {
+      for (let i = 0; i < cell.length; i++) {
+        let a = cell[i];
+        for (let j = i + 1; j < cell.length; j++) {
+          let b = cell[j];
+          if (!SpatialIndex._collide(a.x, a.y, a.width, a.height, b)) {
+            continue;
+          }
+          // Only report a pair in the first cell both objects share
+          let cx = Math.max(a.left, b.left),
+              cy = Math.max(a.top, b.top);
+          if (this._cells.get(SpatialIndex._key(cx, cy)) !== cell) {
+            continue;
+          }
+          if (a.order < b.order) {
+            found.push([a, b]);
+          }
+          else {
+            found.push([b, a]);
+          }
+        }
+      }
+    }
+    found.sort((p, q) => ((p[0].order - q[0].order) || (p[1].order - q[1].order)));
+    return found.map(([a, b]) => [a.object, b.object]);
+  }
+
+  /*
+   * Return true if the rectangle collides with the bounds of entry like colliderect().
+   */
+  static _collide(x, y, width, height, entry) {
+    return ((x < (entry.x + entry.width)) &&
+            (y < (entry.y + entry.height)) &&
+            ((x + width) > entry.x) &&
+            ((y + height) > entry.y));
+  }
+}
+
 /*
  * Class to handle the animation.
  *
@@ -2177,41 +2746,71 @@ class Inbetweener {
     return ((Inbetweener._out_bounce_internal(p - 1, 1) * 0.5) + 0.5);
   }
 
+  /*
+   * Array of the scheduled Inbetweener objects in the order they were
+   * scheduled. Replaced animations leave a null behind until the next update.
+   */
+  static _animations = [];
+
+  /*
+   * Map the puppets to their scheduled Inbetweener objects.
+   */
+  static _puppets = new Map();
+
   /*
    * Animation queue: Array of Inbetweener objects.
    */
-  static queue = [];
+  static get queue() {
+    return Inbetweener._animations.filter((a) => (a !== null));
+  }
 
   /*
    * Clear the animation queue.
    */
   static _clearQueue() {
-    Inbetweener.queue = [];
+    Inbetweener._animations.length = 0;
+    Inbetweener._puppets.clear();
   }
 
   /*
    * Loop through all the animations in the animation queue and tween.
+   *
+   * The queue is compacted in place so nothing is allocated unless an
+   * animation finishes with a callback.
    */
   static _updateQueue(dt) {
-    let due = [],
-        result = [];
-    for (let a of Inbetweener.queue) {
+    let animations = Inbetweener._animations,
+        length = animations.length,
+        count = 0,
+        due = null;
+    for (let i = 0; i < length; i++) {
+      let a = animations[i];
+      if (a === null) {
+        continue;
+      }
       a.update(dt);
       if (a.done) {
+        Inbetweener._puppets.delete(a.puppet);
         if (typeof a.callback === 'function') {
+          if (due === null) {
+            due = [];
+          }
           due.push(a.callback);
         }
       }
       else {
-        result.push(a);
+        a._index = count;
+        animations[count++] = a;
       }
     }
-    Inbetweener.queue = result;
+    animations.length = count;
 
     // Call the callbacks after updating the queue to avoid
     // the lost update problem if a callback modifies the queue
-    for (let callback of due) {
-      callback();
+    if (due !== null) {
+      for (let callback of due) {
+        callback();
+      }
     }
   }
 
@@ -2246,6 +2845,7 @@ class Inbetweener {
     // Populate this.attributes with the start and the end values of the properties to tween
     // They must either both be Numbers or Arrays of Numbers the same length
     this.attributes = new Map();
+    let channels = 0;
     for (let a of Object.getOwnPropertyNames(attributes)) {
       if (!(a in this.puppet)) {
         continue;
@@ -2254,6 +2854,7 @@ class Inbetweener {
           end = attributes[a];
       if ((typeof start === 'number') && (typeof end === 'number')) {
         this.attributes.set(a, {start: start, end: end});
+        channels++;
       }
       else if (Array.isArray(start) && Array.isArray(end)) {
         if (start.length !== end.length) {
@@ -2266,35 +2867,75 @@ class Inbetweener {
           continue;
         }
         this.attributes.set(a, {start: start, end: end});
+        channels += start.length;
+      }
+    }
+
+    // Flatten the attributes into typed arrays of every Number to tween
+    // so update() runs in a tight loop without allocating
+    this._function = Inbetweener[this.tween];
+    this._names = [];
+    this._ends = [];
+    this._lengths = new Int32Array(this.attributes.size);
+    this._values = [];
+    this._starts = new Float64Array(channels);
+    this._deltas = new Float64Array(channels);
+    this._index = -1;
+    let offset = 0;
+    for (let [k, v] of this.attributes) {
+      this._names.push(k);
+      this._ends.push(v.end);
+      if (typeof v.start === 'number') {
+        this._lengths[this._values.length] = -1;
+        this._values.push(null);
+        this._starts[offset] = v.start;
+        this._deltas[offset] = v.end - v.start;
+        offset++;
+      }
+      else {
+        this._lengths[this._values.length] = v.start.length;
+        this._values.push(new Array(v.start.length).fill(0));
+        for (let i = 0; i < v.start.length; i++, offset++) {
+          this._starts[offset] = v.start[i];
+          this._deltas[offset] = v.end[i] - v.start[i];
+        }
       }
     }
   }
 
   /*
    * Update the animation after dt seconds have passed.
+   *
+   * Array attributes are written into the same Array every frame.
    */
   update(dt) {
+    let names = this._names;
     this.elapsed += dt;
     if (this.elapsed > this.duration) {
       // If the animation has reached its end
-      for (let [k, v] of this.attributes) {
-        this.puppet[k] = v.end;
+      for (let i = 0; i < names.length; i++) {
+        this.puppet[names[i]] = this._ends[i];
       }
+      return;
     }
-    else {
-      // Interpolate between start and end based on the tween function
-      let n = Inbetweener[this.tween](this.elapsed / this.duration);
-      for (let [k, v] of this.attributes) {
-        if (typeof v.start === 'number') {
-          this.puppet[k] = v.start + ((v.end - v.start) * n);
-        }
-        else if (Array.isArray(v.start)) {
-          let result = [];
-          for (let i = 0; i < v.start.length; i++) {
-            result.push(v.start[i] + ((v.end[i] - v.start[i]) * n));
-          }
-          this.puppet[k] = result;
+
+    // Interpolate between start and end based on the tween function
+    let n = this._function(this.elapsed / this.duration),
+        starts = this._starts,
+        deltas = this._deltas,
+        offset = 0;
+    for (let i = 0; i < names.length; i++) {
+      let length = this._lengths[i];
+      if (length < 0) {
+        this.puppet[names[i]] = starts[offset] + (deltas[offset] * n);
+        offset++;
+      }
+      else {
+        let value = this._values[i];
+        for (let j = 0; j < length; j++, offset++) {
+          value[j] = starts[offset] + (deltas[offset] * n);
         }
+        this.puppet[names[i]] = value;
       }
     }
   }
@@ -2303,7 +2944,7 @@ class Inbetweener {
    * Boolean flag that is true if the animation is complete.
    */
   get done() {
-    if (this.attributes.size <= 0) {
+    if (this._names.length <= 0) {
       // If there is no property to update
       return true;
     }
@@ -2331,8 +2972,14 @@ function animate() {
   if (animation instanceof Inbetweener) {
     if (!animation.done) {
       // Newly scheduled animations will overwrite old ones
-      Inbetweener.queue = Inbetweener.queue.filter((a) => (a.puppet !== animation.puppet));
-      Inbetweener.queue.push(animation);
+      let animations = Inbetweener._animations,
+          old = Inbetweener._puppets.get(animation.puppet);
+      if (old !== undefined) {
+        animations[old._index] = null;
+      }
+      animation._index = animations.length;
+      animations.push(animation);
+      Inbetweener._puppets.set(animation.puppet, animation);
     }
     return animation;
   }
@@ -2354,13 +3001,48 @@ const screen = (function () {
   const MAX_COLOR = 255;
   const TAB_REGEX = /\t/g;
   const TAB_REPLACEMENT = '    ';
+  const TEXT_CACHE_SIZE = 256;
+  const TEXT_RENDER_CACHE_SIZE = 64;
+  const SPRITE_CACHE_SIZE = 512;
+  const ROTATION_STEP = 1;
   const TWO_PI = Math.PI * 2;
+  const MAX_DIRTY_RECTS = 256;
+  const MAX_DIRTY_FRACTION = 0.5;
+  const DEFAULT_MAX_TICKS = 5;
+  const MAX_STEP_TOLERANCE = 0.002;
 
   /*
-   * Return a CSS ID selector, adding "#" as needed.
+   * Map the string keys of text layouts to Objects with the lines and the
+   * font size fitting them, in least recently used order.
    */
-  function to_CSS_ID(selector) {
-    if (typeof selector !== 'string') {
+  const TEXT_CACHE = new Map();
+
+  /*
+   * Map the string keys of an image, an angle quantized to ROTATION_STEP
+   * degrees, and an anchor to Objects with the canvas of the rotated image
+   * and the offset of its topleft corner from the anchor, in least recently
+   * used order.
+   */
+  const SPRITE_CACHE = new Map();
+
+  /*
+   * Map the string keys of pre-rendered text to Objects with the canvas
+   * and the offset of the text on it, in least recently used order.
+   */
+  const TEXT_RENDER_CACHE = new Map();
+
+  /*
+   * Map the string names of layers to Objects with their offscreen canvas,
+   * its context, and whether they are drawn above the game, in the order
+   * they are composited.
+   */
+  const LAYERS = new Map();
+
+  /*
+   * Return a CSS ID selector, adding "#" as needed.
+   */
+  function to_CSS_ID(selector) {
+    if (typeof selector !== 'string') {
       throw new TypeError('selector must be a non-empty CSS selector string.');
     }
     if (selector.length <= 0) {
@@ -2418,6 +3100,369 @@ const screen = (function () {
     return lines[longest];
   }
 
+  /*
+   * Return the value for key in the Map cache and mark it recently used.
+   */
+  function cacheGet(cache, key) {
+    let value = cache.get(key);
+    if (value !== undefined) {
+      cache.delete(key);
+      cache.set(key, value);
+    }
+    return value;
+  }
+
+  /*
+   * Set key to value in the Map cache evicting the least recently used
+   * entries past size.
+   */
+  function cachePut(cache, key, value, size) {
+    cache.set(key, value);
+    while (cache.size > size) {
+      cache.delete(cache.keys().next().value);
+    }
+  }
+
+  /*
+   * Discard the text layouts and pre-rendered text.
+   *
+   * Measurements change when a web font finishes loading.
+   */
+  function clearTextCaches() {
+    TEXT_CACHE.clear();
+    TEXT_RENDER_CACHE.clear();
+  }
+
+  /*
+   * Return an Object with the tab expanded lines of text and the largest
+   * font size up to fontSize that fits them inside rect.
+   *
+   * Layouts are cached so text drawn every frame is only measured once.
+   */
+  function layoutText(text, fontName, fontSize, lineHeight, rect) {
+    let fit = (rect instanceof Rect),
+        key = [text, fontName, fontSize, lineHeight,
+               fit ? rect.width : '', fit ? rect.height : ''].join('\n'),
+        layout = cacheGet(TEXT_CACHE, key);
+    if (layout !== undefined) {
+      return layout;
+    }
+
+    // Use replace() and a regular expression
+    // because it has wider support than replaceAll()
+    let lines = text.replace(TAB_REGEX, TAB_REPLACEMENT).split('\n');
+    if (fit) {
+      // Binary search for the fewest 1 pixel steps down from fontSize
+      // so text fits inside rect, ending at or below 0 if it never fits
+      const longestLine = getLongest(lines);
+      let low = 0,
+          high = Math.max(0, Math.ceil(fontSize));
+      while (low < high) {
+        let middle = Math.floor((low + high) / 2),
+            size = fontSize - middle;
+        context.font = size + 'px ' + fontName;
+        if ((context.measureText(longestLine).width < rect.width) &&
+            ((lines.length * size * lineHeight) < rect.height)) {
+          high = middle;
+        }
+        else {
+          low = middle + 1;
+        }
+      }
+      fontSize -= low;
+    }
+    layout = {lines: lines, fontSize: fontSize};
+    cachePut(TEXT_CACHE, key, layout, TEXT_CACHE_SIZE);
+    return layout;
+  }
+
+  /*
+   * Fill and outline lines of text on context2D starting at (x, y).
+   */
+  function fillLines(context2D, lines, x, y, lineSize, color, gcolor, drawOutline) {
+    let lineY = y,
+        gradient;
+    context2D.fillStyle = color;
+    for (let line of lines) {
+      if (gcolor != null) {
+        // The linear gradient repeats for each line
+        if (context2D.textBaseline === 'bottom') {
+          gradient = context2D.createLinearGradient(0, lineY - lineSize, 0, lineY);
+        }
+        else if (context2D.textBaseline === 'middle') {
+          gradient = context2D.createLinearGradient(0, lineY - Math.floor(lineSize / 2), 0, lineY + Math.floor(lineSize / 2));
+        }
+        else {
+          gradient = context2D.createLinearGradient(0, lineY, 0, lineY + lineSize);
+        }
+        gradient.addColorStop(0, color);
+        gradient.addColorStop(1, gcolor);
+        context2D.fillStyle = gradient;
+      }
+
+      context2D.fillText(line, x, lineY);
+      if (drawOutline) {
+        context2D.strokeText(line, x, lineY);
+      }
+
+      lineY += lineSize;
+    }
+  }
+
+  /*
+   * Draw lines of text at (x, y) from a canvas pre-rendered with the
+   * current context settings.
+   *
+   * The canvas is cached by key so static text is only rendered once.
+   */
+  function drawPrerendered(key, lines, x, y, lineSize, color, gcolor, drawOutline) {
+    let rendered = cacheGet(TEXT_RENDER_CACHE, key);
+    if (rendered === undefined) {
+      let longest = 0;
+      for (let line of lines) {
+        longest = Math.max(longest, context.measureText(line).width);
+      }
+      // Leave room for the outline, the shadow, and the baseline
+      let pad = Math.ceil(context.lineWidth) + 2 +
+                Math.ceil(Math.max(Math.abs(context.shadowOffsetX), Math.abs(context.shadowOffsetY))),
+          fontSize = parseFloat(context.font),
+          offscreen = document.createElement('canvas'),
+          offsetX = pad,
+          offsetY = pad;
+      offscreen.width = Math.ceil(longest) + (2 * pad);
+      offscreen.height = Math.ceil((lines.length * lineSize) + fontSize) + (2 * pad);
+      if (context.textAlign === 'center') {
+        offsetX = Math.floor(offscreen.width / 2);
+      }
+      else if (context.textAlign === 'right') {
+        offsetX = offscreen.width - pad;
+      }
+      if (context.textBaseline === 'middle') {
+        offsetY += Math.ceil(Math.max(fontSize, lineSize) / 2);
+      }
+      else if (context.textBaseline === 'bottom') {
+        offsetY += Math.ceil(Math.max(fontSize, lineSize));
+      }
+
+      let offscreenContext = offscreen.getContext('2d');
+      for (let property of ['font', 'textAlign', 'textBaseline', 'globalAlpha',
+                            'lineWidth', 'strokeStyle', 'shadowOffsetX',
+                            'shadowOffsetY', 'shadowColor']) {
+        offscreenContext[property] = context[property];
+      }
+      fillLines(offscreenContext, lines, offsetX, offsetY, lineSize, color, gcolor, drawOutline);
+      rendered = {canvas: offscreen, offsetX: offsetX, offsetY: offsetY};
+      cachePut(TEXT_RENDER_CACHE, key, rendered, TEXT_RENDER_CACHE_SIZE);
+    }
+
+    // The alpha and shadow are already in the pre-rendered canvas
+    context.globalAlpha = 1;
+    context.shadowOffsetX = 0;
+    context.shadowOffsetY = 0;
+    context.drawImage(rendered.canvas, Math.round(x - rendered.offsetX), Math.round(y - rendered.offsetY));
+  }
+
+  /*
+   * Return an Object with a canvas of image rotated angle degrees
+   * counterclockwise about the anchor (dx, dy) and the offset of its topleft
+   * corner from the anchor, or null if image has not loaded yet.
+   */
+  function rotatedSprite(name, image, angle, dx, dy) {
+    if (!image.complete || (image.naturalWidth <= 0)) {
+      return null;
+    }
+    let quantized = ((Math.round(angle / ROTATION_STEP) * ROTATION_STEP) % 360 + 360) % 360,
+        key = [name, quantized, dx, dy].join('\n'),
+        sprite = cacheGet(SPRITE_CACHE, key);
+    if (sprite !== undefined) {
+      return sprite;
+    }
+
+    // Canvas rotates clockwise but Pygame Zero rotates counterclockwise (anticlockwise)
+    let theta = -quantized * Math.PI / 180,
+        cosTheta = Math.cos(theta),
+        sinTheta = Math.sin(theta),
+        xs = [],
+        ys = [];
+    for (let [cx, cy] of [[-dx, -dy], [image.width - dx, -dy],
+                          [-dx, image.height - dy], [image.width - dx, image.height - dy]]) {
+      xs.push((cx * cosTheta) - (cy * sinTheta));
+      ys.push((cx * sinTheta) + (cy * cosTheta));
+    }
+    let left = Math.floor(Math.min(...xs)),
+        top = Math.floor(Math.min(...ys)),
+        offscreen = document.createElement('canvas');
+    offscreen.width = Math.ceil(Math.max(...xs)) - left;
+    offscreen.height = Math.ceil(Math.max(...ys)) - top;
+
+    // Same transformations as blit() with the anchor at (-left, -top)
+    let offscreenContext = offscreen.getContext('2d');
+    offscreenContext.translate(-left, -top);
+    offscreenContext.rotate(theta);
+    offscreenContext.translate(-dx, -dy);
+    offscreenContext.drawImage(image, 0, 0);
+
+    sprite = {canvas: offscreen, x: left, y: top};
+    cachePut(SPRITE_CACHE, key, sprite, SPRITE_CACHE_SIZE);
+    return sprite;
+  }
+
+  /*
+   * Draw the Actor object with the image at anchor offsets (x, y) without
+   * saving and restoring the context.
+   *
+   * Return false if it cannot be drawn this way.
+   */
+  function drawActor(object, image, x, y) {
+    let angle = object.angle,
+        posx = object.posx,
+        posy = object.posy;
+    if (!Number.isFinite(angle) || !Number.isFinite(posx) || !Number.isFinite(posy)) {
+      return false;
+    }
+
+    let sprite = null;
+    if ((angle % 360) !== 0) {
+      sprite = rotatedSprite(object.name, image, angle, x, y);
+      if (sprite === null) {
+        return false;
+      }
+    }
+    let alpha = context.globalAlpha;
+    if (typeof object.opacity === 'number') {
+      context.globalAlpha = Math.max(0, Math.min(object.opacity, 1));
+    }
+    if (sprite === null) {
+      context.drawImage(image, posx - x, posy - y);
+      trackDirty(posx - x, posy - y, image.width, image.height);
+    }
+    else {
+      context.drawImage(sprite.canvas, posx + sprite.x, posy + sprite.y);
+      trackDirty(posx + sprite.x, posy + sprite.y, sprite.canvas.width, sprite.canvas.height);
+    }
+    context.globalAlpha = alpha;
+    return true;
+  }
+
+  /*
+   * Return a new offscreen canvas the size of the screen.
+   */
+  function makeCanvas() {
+    let offscreen = document.createElement('canvas');
+    offscreen.width = width;
+    offscreen.height = height;
+    return offscreen;
+  }
+
+  /*
+   * Resize the canvases of the layers added before the size of the screen
+   * was known, keeping what was already drawn into them.
+   */
+  function resizeLayers() {
+    for (let layer of LAYERS.values()) {
+      if ((layer.canvas.width === width) && (layer.canvas.height === height)) {
+        continue;
+      }
+      let offscreen = makeCanvas(),
+          offscreenContext = offscreen.getContext('2d');
+      offscreenContext.drawImage(layer.canvas, 0, 0);
+      layer.canvas = offscreen;
+      layer.context = offscreenContext;
+      layersChanged = true;
+    }
+  }
+
+  /*
+   * Draw the layers into the below and above composites if any changed.
+   *
+   * Return true if they were composited again.
+   */
+  function compositeLayers() {
+    if (!layersChanged) {
+      return false;
+    }
+    layersChanged = false;
+    below = above = null;
+    for (let layer of LAYERS.values()) {
+      let composite = layer.above ? above : below;
+      if (composite === null) {
+        composite = makeCanvas();
+        if (layer.above) {
+          above = composite;
+        }
+        else {
+          below = composite;
+        }
+      }
+      composite.getContext('2d').drawImage(layer.canvas, 0, 0);
+    }
+    return true;
+  }
+
+  /*
+   * Remember the region (x, y, w, h) was drawn this frame
+   * so the next clear() only has to restore it in dirty-rect mode.
+   */
+  function trackDirty(x, y, w, h) {
+    if (!dirtyRects || (activeLayer !== null)) {
+      return;
+    }
+    // Pad by a pixel to catch antialiasing at the edges
+    let left = Math.max(Math.floor(x) - 1, 0),
+        top = Math.max(Math.floor(y) - 1, 0),
+        right = Math.min(Math.ceil(x + w) + 1, width),
+        bottom = Math.min(Math.ceil(y + h) + 1, height);
+    if ((right > left) && (bottom > top)) {
+      currentDirty.push([left, top, right - left, bottom - top]);
+    }
+  }
+
+  /*
+   * Return true if the regions cover so much of the screen that
+   * repainting all of it is cheaper than repainting each region.
+   */
+  function tooDirty(regions) {
+    if (regions.length > MAX_DIRTY_RECTS) {
+      return true;
+    }
+    let area = 0;
+    for (let [, , w, h] of regions) {
+      area += w * h;
+    }
+    return area > (width * height * MAX_DIRTY_FRACTION);
+  }
+
+  /*
+   * Draw the regions of the composite canvas onto the screen.
+   */
+  function paintRegions(composite, regions) {
+    for (let [x, y, w, h] of regions) {
+      context.drawImage(composite, x, y, w, h, x, y, w, h);
+    }
+  }
+
+  /*
+   * Start loading a resource that the page deferred until the game starts.
+   *
+   * Deferred images keep their URL in data-src instead of src and deferred
+   * audio has preload="none" so neither holds up the load event.
+   */
+  function loadDeferred(element) {
+    if (!('defer' in element.dataset)) {
+      return;
+    }
+    delete element.dataset.defer;
+    if (element instanceof HTMLImageElement) {
+      element.src = element.dataset.src;
+    }
+    else if (element instanceof HTMLMediaElement) {
+      element.preload = 'auto';
+      if (element.readyState === HTMLMediaElement.HAVE_NOTHING) {
+        element.load();
+      }
+    }
+  }
+
   let canvas = null,
       pauseButton = null,
       resetButton = null,
@@ -2432,6 +3477,25 @@ const screen = (function () {
       running = 0,
       start;
 
+  // State of the layers and the dirty-rect mode
+  let activeLayer = null,
+      below = null,
+      above = null,
+      layersChanged = false,
+      dirtyRects = false,
+      repaintAll = true,
+      cleared = false,
+      previousDirty = [],
+      currentDirty = [];
+
+  // State of the fixed-timestep mode where step is null when it is off
+  let step = null,
+      tickLimit = DEFAULT_MAX_TICKS,
+      accumulator = 0,
+      drewLast = true,
+      ticks = 0,
+      skippedFrames = 0;
+
   /*
    * Event Handlers
    */
@@ -2540,15 +3604,60 @@ const screen = (function () {
     const elapsed = (timestamp - start) / 1000;
     start = timestamp;
 
-    clock._updateQueue(elapsed);
-    Inbetweener._updateQueue(elapsed);
-
-    if (hasUpdate) {
-      window.update(elapsed);
+    profiler._begin(timestamp);
+    let draw = true;
+    if (step === null) {
+      tick(elapsed);
     }
-    if (hasDraw) {
+    else {
+      // Run as many fixed steps as fit in the elapsed time up to tickLimit
+      let count = 0,
+          tolerance = Math.min(step / 4, MAX_STEP_TOLERANCE);
+      accumulator += elapsed;
+      while ((accumulator > step - tolerance) && (count < tickLimit)) {
+        tick(step);
+        accumulator -= step;
+        count++;
+      }
+      ticks += count;
+
+      // Nothing changed if no step ran
+      draw = (count > 0);
+      if (accumulator > step - tolerance) {
+        // Still behind, so skip drawing every other frame to catch up
+        // and drop the time that would take more than one frame to catch up
+        if (drewLast) {
+          draw = false;
+          skippedFrames++;
+          accumulator = Math.min(accumulator, tickLimit * step);
+        }
+        else {
+          accumulator %= step;
+        }
+      }
+      drewLast = draw;
+    }
+
+    if (hasDraw && draw) {
       window.draw();
+      screen._endFrame();
     }
+    profiler._mark(3);
+    profiler._end();
+  }
+
+  /*
+   * Advance the clock, the animations, and update() by dt seconds.
+   */
+  function tick(dt) {
+    clock._updateQueue(dt);
+    profiler._mark(0);
+    Inbetweener._updateQueue(dt);
+    profiler._mark(1);
+    if (hasUpdate) {
+      window.update(dt);
+    }
+    profiler._mark(2);
   }
 
   /*
@@ -2628,6 +3737,12 @@ const screen = (function () {
         return;
       }
 
+      if ('defer' in this.audioElement.dataset) {
+        // Resolve a deferred sound on first use
+        delete this.audioElement.dataset.defer;
+        this.audioElement.preload = 'auto';
+      }
+
       if (duration > 0) {
         // Fade in the audio element over duration seconds
         this.audioElement.volume = 0;
@@ -2943,10 +4058,7 @@ const screen = (function () {
             lineHeight = DEFAULT_LINE_HEIGHT,
             color = DEFAULT_FONT_COLOR,
             drawOutline = false,
-            // Use replace() and a regular expression
-            // because it has wider support than replaceAll()
-            lines = text.replace(TAB_REGEX, TAB_REPLACEMENT).split('\n'),
-            gcolor, x, y;
+            lines, gcolor, x, y;
 
         if (('fontsize' in config) && (typeof config['fontsize'] === 'number')) {
           fontSize = config['fontsize'];
@@ -2954,26 +4066,17 @@ const screen = (function () {
         if (('fontname' in config) && (typeof config['fontname'] === 'string')) {
           fontName = config['fontname'];
         }
-        context.font = fontSize + 'px ' + fontName;
-
         if (('lineheight' in config) && (typeof config['lineheight'] === 'number')) {
           lineHeight = config['lineheight'];
         }
 
+        // Change fontSize so text fits inside rect
+        ({lines, fontSize} = layoutText(text, fontName, fontSize, lineHeight, rect));
+        context.font = fontSize + 'px ' + fontName;
+
         context.textAlign = 'left';
         context.textBaseline = 'top';
         if (rect instanceof Rect) {
-          // Change fontSize so text fits inside rect
-          const longestLine = getLongest(lines);
-          while (fontSize > 0) {
-            if ((context.measureText(longestLine).width < rect.width) &&
-                ((lines.length * fontSize * lineHeight) < rect.height)) {
-              break;
-            }
-            fontSize--;
-            context.font = fontSize + 'px ' + fontName;
-          }
-
           ({x=0, y=0} = rect);
         }
         else {
@@ -3058,33 +4161,18 @@ const screen = (function () {
           }
         }
 
-        context.fillStyle = color;
-        let lineSize = fontSize * lineHeight,
-            lineY = y,
-            gradient;
-        for (let line of lines) {
-          if (gcolor != null) {
-            // The linear gradient repeats for each line
-            if (context.textBaseline === 'bottom') {
-              gradient = context.createLinearGradient(0, lineY - lineSize, 0, lineY);
-            }
-            else if (context.textBaseline === 'middle') {
-              gradient = context.createLinearGradient(0, lineY - Math.floor(lineSize / 2), 0, lineY + Math.floor(lineSize / 2));
-            }
-            else {
-              gradient = context.createLinearGradient(0, lineY, 0, lineY + lineSize);
-            }
-            gradient.addColorStop(0, color);
-            gradient.addColorStop(1, gcolor);
-            context.fillStyle = gradient;
-          }
-
-          context.fillText(line, x, lineY);
-          if (drawOutline) {
-            context.strokeText(line, x, lineY);
-          }
-
-          lineY += lineSize;
+        let lineSize = fontSize * lineHeight;
+        if (config['prerender'] === true) {
+          // Key on everything that changes the pixels but not the position
+          let key = [text, context.font, lineHeight, context.textAlign,
+                     context.textBaseline, context.globalAlpha, color, gcolor,
+                     drawOutline ? context.lineWidth : 0, context.strokeStyle,
+                     context.shadowOffsetX, context.shadowOffsetY,
+                     context.shadowColor].join('\n');
+          drawPrerendered(key, lines, x, y, lineSize, color, gcolor, drawOutline);
+        }
+        else {
+          fillLines(context, lines, x, y, lineSize, color, gcolor, drawOutline);
         }
         context.restore();
       },
@@ -3110,13 +4198,42 @@ const screen = (function () {
 
     /*
      * Clear the screen to black.
+     *
+     * If there are layers below the game, then they are drawn over color.
+     * In dirty-rect mode, only the regions drawn since the last clear are
+     * restored unless they cover most of the screen.
+     * Inside drawLayer(), clear the layer to transparent instead.
      */
     clear(color = 'black') {
+      if (activeLayer !== null) {
+        activeLayer.context.clearRect(0, 0, width, height);
+        return;
+      }
       if (context == null) {
         return;
       }
+
+      cleared = true;
+      if (compositeLayers()) {
+        repaintAll = true;
+      }
+      if (dirtyRects && !repaintAll && !tooDirty(previousDirty)) {
+        context.fillStyle = parseColor(color);
+        for (let [x, y, w, h] of previousDirty) {
+          context.clearRect(x, y, w, h);
+          context.fillRect(x, y, w, h);
+        }
+        if (below !== null) {
+          paintRegions(below, previousDirty);
+        }
+        return;
+      }
+      repaintAll = true;
       context.clearRect(0, 0, width, height);
       this.fill(color);
+      if (below !== null) {
+        context.drawImage(below, 0, 0);
+      }
     },
 
     /*
@@ -3150,6 +4267,10 @@ const screen = (function () {
       if (object instanceof Actor) {
         [x=0, y=0] = pos;
         image = images[object.name];
+        if (drawActor(object, image, x, y)) {
+          // Drawn directly or from the rotated sprite cache
+          return;
+        }
         context.save();
         if (typeof object.opacity === 'number') {
           context.globalAlpha = Math.max(0, Math.min(object.opacity, 1));
@@ -3163,11 +4284,24 @@ const screen = (function () {
         context.translate(-x, -y);
         context.drawImage(image, 0, 0);
         context.restore();
+        if (dirtyRects) {
+          let box = object.getBoundingBox();
+          trackDirty(box.x, box.y, box.width, box.height);
+        }
       }
       else if (object instanceof Surface) {
         [x=0, y=0] = pos;
         context.save();
-        context.putImageData(object.imageData, x, y);
+        if (target instanceof Rect) {
+          // Only copy the dirty Rect of the Surface
+          context.putImageData(object.imageData, x, y,
+                               target.x, target.y, target.width, target.height);
+          trackDirty(x + target.x, y + target.y, target.width, target.height);
+        }
+        else {
+          context.putImageData(object.imageData, x, y);
+          trackDirty(x, y, object.width, object.height);
+        }
         context.restore();
       }
       else if (typeof object === 'string') {
@@ -3181,14 +4315,17 @@ const screen = (function () {
           if (target instanceof Rect) {
             context.drawImage(image, pos.x, pos.y, pos.width, pos.height,
                               target.x, target.y, target.width, target.height);
+            trackDirty(target.x, target.y, target.width, target.height);
           }
           else {
             context.drawImage(image, pos.x, pos.y, pos.width, pos.height);
+            trackDirty(pos.x, pos.y, pos.width, pos.height);
           }
         }
         else {
           [x=0, y=0] = pos;
           context.drawImage(image, x, y);
+          trackDirty(x, y, image.width, image.height);
         }
         context.restore();
       }
@@ -3198,6 +4335,198 @@ const screen = (function () {
       }
     },
 
+    /*
+     * Draw the Array of Actor objects in one pass grouped by image.
+     *
+     * Actors sharing an image are drawn together in the order given
+     * and the groups are drawn in the order their images first appear,
+     * so use it for actors whose overlap order does not matter like bullets.
+     */
+    blitActors(actors) {
+      if (context == null) {
+        return;
+      }
+
+      let groups = new Map();
+      for (let actor of actors) {
+        if (!(actor instanceof Actor)) {
+          throw new TypeError('actors must be an Array of Actor objects.');
+        }
+        let group = groups.get(actor.name);
+        if (group === undefined) {
+          group = [];
+          groups.set(actor.name, group);
+        }
+        group.push(actor);
+      }
+      for (let [name, group] of groups) {
+        let image = images[name];
+        for (let actor of group) {
+          let [x=0, y=0] = actor._calculateAnchor();
+          if (!drawActor(actor, image, x, y)) {
+            screen.blit(actor, [x, y]);
+          }
+        }
+      }
+    },
+
+    /*
+     * Add a layer with the string name backed by an offscreen canvas.
+     *
+     * Layers are composited in the order they are added, either below
+     * everything drawn in draw() or above it if above is true.
+     * Adding an existing name replaces its canvas with a blank one.
+     * Layers added before screen.init() are resized to the screen there.
+     */
+    addLayer(name, above = false) {
+      if ((typeof name !== 'string') || (name.length <= 0)) {
+        throw new TypeError('name must be a non-empty string.');
+      }
+      let offscreen = makeCanvas();
+      LAYERS.set(name, {canvas: offscreen, context: offscreen.getContext('2d'), above: Boolean(above)});
+      layersChanged = true;
+    },
+
+    /*
+     * Remove the layer with the string name.
+     */
+    removeLayer(name) {
+      if (LAYERS.delete(name)) {
+        layersChanged = true;
+      }
+    },
+
+    /*
+     * Call callback with every screen.draw and screen.blit call drawing into
+     * the layer with the string name instead of the screen.
+     *
+     * The layers are only composited again on the next clear() after
+     * they change, so static layers cost one drawImage() per frame.
+     */
+    drawLayer(name, callback) {
+      let layer = LAYERS.get(name);
+      if (layer === undefined) {
+        throw new RangeError(`Unknown layer "${ name }".`);
+      }
+      if (activeLayer !== null) {
+        throw new Error('Cannot draw a layer inside another layer.');
+      }
+      let mainContext = context;
+      activeLayer = layer;
+      context = layer.context;
+      try {
+        callback();
+      }
+      finally {
+        context = mainContext;
+        activeLayer = null;
+        layersChanged = true;
+      }
+    },
+
+    /*
+     * Get whether only the regions drawn since the last clear() are restored.
+     */
+    get dirtyRects() {
+      return dirtyRects;
+    },
+
+    /*
+     * Set whether only the regions drawn since the last clear() are restored.
+     *
+     * Actors and images are tracked automatically.
+     * Anything else drawn outside of a layer must be passed to markDirty().
+     */
+    set dirtyRects(value) {
+      dirtyRects = Boolean(value);
+      repaintAll = true;
+      previousDirty = [];
+      currentDirty = [];
+    },
+
+    /*
+     * Mark the region given as a Rect or (x, y, width, height) as drawn
+     * this frame so the next clear() restores it in dirty-rect mode.
+     */
+    markDirty() {
+      let rect = Rect._from(arguments);
+      trackDirty(rect.x, rect.y, rect.width, rect.height);
+    },
+
+    /*
+     * Draw the layers above the game and start tracking the next frame.
+     *
+     * Called by the core game loop after draw().
+     */
+    _endFrame() {
+      if (context == null) {
+        return;
+      }
+      if (!cleared && compositeLayers()) {
+        // draw() paints its own background so there is nothing to restore
+        repaintAll = true;
+      }
+      if (above !== null) {
+        let regions = previousDirty.concat(currentDirty);
+        if (!dirtyRects || repaintAll || tooDirty(regions)) {
+          context.drawImage(above, 0, 0);
+        }
+        else {
+          paintRegions(above, regions);
+        }
+      }
+      previousDirty = currentDirty;
+      currentDirty = [];
+      repaintAll = cleared = false;
+    },
+
+    /*
+     * Call update() with a fixed dt of 1 / rate seconds instead of the
+     * time since the last frame, or go back to the time since the last
+     * frame if rate is null.
+     *
+     * Up to maxTicks updates run per frame to catch up and draw() is
+     * skipped when they are not enough or when no update ran.
+     */
+    fixedStep(rate = null, maxTicks = DEFAULT_MAX_TICKS) {
+      if ((rate == null) || (rate === 0)) {
+        step = null;
+      }
+      else {
+        if (typeof rate !== 'number') {
+          throw new TypeError('rate must be a number.');
+        }
+        if (!Number.isFinite(rate) || (rate < 0)) {
+          throw new RangeError('rate must be a positive number.');
+        }
+        if (!Number.isInteger(maxTicks)) {
+          throw new TypeError('maxTicks must be an integer.');
+        }
+        if (maxTicks < 1) {
+          throw new RangeError('maxTicks must be a positive integer.');
+        }
+        step = 1 / rate;
+      }
+      tickLimit = maxTicks;
+      accumulator = 0;
+      drewLast = true;
+      ticks = skippedFrames = 0;
+    },
+
+    /*
+     * Return the number of fixed steps run since fixedStep() was called.
+     */
+    get ticks() {
+      return ticks;
+    },
+
+    /*
+     * Return the number of frames not drawn to catch up since fixedStep() was called.
+     */
+    get skippedFrames() {
+      return skippedFrames;
+    },
+
     /*
      * Setup the global objects images, sounds, music, and screen.
      */
@@ -3227,6 +4556,22 @@ const screen = (function () {
         music._load(element);
       }
 
+      // Measure text again once web fonts finish loading
+      clearTextCaches();
+      if (document.fonts) {
+        document.fonts.addEventListener('loadingdone', clearTextCaches);
+      }
+
+      // Stream the deferred resources in the background
+      for (let id of [imagesID, soundsID, musicID]) {
+        element = document.querySelector(to_CSS_ID(id));
+        if (element != null) {
+          for (let e of element.querySelectorAll('[data-defer]')) {
+            loadDeferred(e);
+          }
+        }
+      }
+
       if (window.TITLE && (typeof window.TITLE === 'string')) {
         document.querySelector('title').textContent = window.TITLE;
         document.querySelector('h1').textContent = window.TITLE;
@@ -3253,6 +4598,14 @@ const screen = (function () {
       else {
         height = canvas.height = DEFAULT_HEIGHT;
       }
+      resizeLayers();
+
+      if (window.PROFILE === true) {
+        profiler.enable(true);
+      }
+      if (window.TICK_RATE && (typeof window.TICK_RATE === 'number')) {
+        screen.fixedStep(window.TICK_RATE, window.MAX_TICKS);
+      }
 
       context = canvas.getContext('2d');
       hasKeyDown = (typeof window.on_key_down === 'function');
@@ -3322,6 +4675,8 @@ const screen = (function () {
 
       // Start the core game loop
       start = undefined;
+      accumulator = 0;
+      drewLast = true;
       running = window.requestAnimationFrame(loop);
     },
 
@@ -3653,11 +5008,50 @@ class Surface {
     return false;
   }
 
+  /*
+   * Boolean flag that is true if the platform stores the bytes of
+   * a Uint32 little-endian so a packed color reads 0xAABBGGRR.
+   */
+  static LITTLE_ENDIAN = (new Uint8Array(new Uint32Array([1]).buffer)[0] === 1);
+
+  /*
+   * Return the color Array of 3 or 4 integers packed into a Uint32 pixel
+   * in the byte order of Surface.pixels.
+   */
+  static packColor(color) {
+    if (!Array.isArray(color)) {
+      throw new TypeError('color must be an Array of 3 or 4 integers.');
+    }
+    let [r, g, b, a] = Surface._padColorArray(color);
+    for (let c of [r, g, b, a]) {
+      if (typeof c !== 'number') {
+        throw new TypeError('color must be an Array of 3 or 4 integers.');
+      }
+    }
+    // Clamp like ImageData
+    [r, g, b, a] = [r, g, b, a].map((c) => Math.max(0, Math.min(Math.round(c), 255)));
+    if (Surface.LITTLE_ENDIAN) {
+      return ((a << 24) | (b << 16) | (g << 8) | r) >>> 0;
+    }
+    return ((r << 24) | (g << 16) | (b << 8) | a) >>> 0;
+  }
+
+  /*
+   * Return an Array containing the RGBA components of the Uint32 pixel.
+   */
+  static unpackColor(pixel) {
+    if (Surface.LITTLE_ENDIAN) {
+      return [pixel & 0xFF, (pixel >>> 8) & 0xFF, (pixel >>> 16) & 0xFF, pixel >>> 24];
+    }
+    return [pixel >>> 24, (pixel >>> 16) & 0xFF, (pixel >>> 8) & 0xFF, pixel & 0xFF];
+  }
+
   constructor(imageData) {
     if (!(imageData instanceof ImageData)) {
       throw new TypeError('imageData must be an ImageData.');
     }
     this.imageData = imageData;
+    this._pixels = null;
   }
 
   get width() {
@@ -3667,6 +5061,142 @@ class Surface {
     return this.imageData.height;
   }
 
+  /*
+   * Uint32Array view of the pixel data with one packed pixel per element.
+   *
+   * It shares the memory of imageData so writing to it changes the Surface
+   * without copying.
+   * Use Surface.packColor() and Surface.unpackColor() to convert colors.
+   */
+  get pixels() {
+    let data = this.imageData.data;
+    if ((this._pixels === null) || (this._pixels.buffer !== data.buffer)) {
+      this._pixels = new Uint32Array(data.buffer, data.byteOffset, data.length >> 2);
+    }
+    return this._pixels;
+  }
+
+  /*
+   * Return a Uint32Array view of the packed pixels in row y.
+   */
+  row(y) {
+    if (typeof y !== 'number') {
+      throw new TypeError('y must be a number.');
+    }
+    if ((y < 0) || (this.height <= y)) {
+      throw new RangeError('y must be a row of the Surface.');
+    }
+    let start = Math.floor(y) * this.width;
+    return this.pixels.subarray(start, start + this.width);
+  }
+
+  /*
+   * Iterate over an Array of y and the row(y) view for every row.
+   */
+  *rows() {
+    for (let y = 0; y < this.height; y++) {
+      yield [y, this.row(y)];
+    }
+  }
+
+  /*
+   * Return the Array [left, top, right, bottom] of the part of the Rect
+   * given in args inside the Surface or undefined if args is empty.
+   */
+  _clip(args) {
+    let left = 0,
+        top = 0,
+        right = this.width,
+        bottom = this.height;
+    if (args.length > 0) {
+      let rect = Rect._from(args);
+      left = Math.max(left, Math.floor(rect.x));
+      top = Math.max(top, Math.floor(rect.y));
+      right = Math.min(right, Math.floor(rect.x + rect.width));
+      bottom = Math.min(bottom, Math.floor(rect.y + rect.height));
+    }
+    return [left, top, right, bottom];
+  }
+
+  /*
+   * Fill the Surface or the optional Rect with the color Array.
+   */
+  fill(color, ...rect) {
+    let pixel = Surface.packColor(color),
+        pixels = this.pixels,
+        [left, top, right, bottom] = this._clip(rect);
+    if ((left === 0) && (top === 0) && (right === this.width) && (bottom === this.height)) {
+      pixels.fill(pixel);
+      return;
+    }
+    for (let y = top; y < bottom; y++) {
+      let start = y * this.width;
+      pixels.fill(pixel, start + left, start + right);
+    }
+  }
+
+  /*
+   * Copy the pixels of the Surface source to pos on this Surface.
+   *
+   * Only the optional Rect area of source is copied if given.
+   * Pixels are replaced and not blended like screen.blit() of a Surface.
+   */
+  blit(source, pos = [0, 0], ...area) {
+    if (!(source instanceof Surface)) {
+      throw new TypeError('source must be a Surface.');
+    }
+    let [x=0, y=0] = pos,
+        [left, top, right, bottom] = source._clip(area),
+        from = source.pixels,
+        to = this.pixels;
+    x = Math.floor(x);
+    y = Math.floor(y);
+    // Clip the destination to this Surface
+    if (x < 0) {
+      left -= x;
+      x = 0;
+    }
+    if (y < 0) {
+      top -= y;
+      y = 0;
+    }
+    right = Math.min(right, left + (this.width - x));
+    bottom = Math.min(bottom, top + (this.height - y));
+    if ((right <= left) || (bottom <= top)) {
+      return;
+    }
+    if ((source === this) && (y > top)) {
+      // Copy the rows bottom up so overlapping rows are not overwritten first
+      for (let row = bottom - 1; row >= top; row--) {
+        let start = row * source.width;
+        to.copyWithin(((y + row - top) * this.width) + x, start + left, start + right);
+      }
+      return;
+    }
+    for (let row = top; row < bottom; row++) {
+      let start = row * source.width;
+      to.set(from.subarray(start + left, start + right), ((y + row - top) * this.width) + x);
+    }
+  }
+
+  /*
+   * Replace every packed pixel with the result of calling fn(pixel, x, y).
+   */
+  mapPixels(fn) {
+    if (typeof fn !== 'function') {
+      throw new TypeError('fn must be a function.');
+    }
+    let pixels = this.pixels,
+        width = this.width,
+        height = this.height,
+        i = 0;
+    for (let y = 0; y < height; y++) {
+      for (let x = 0; x < width; x++, i++) {
+        pixels[i] = fn(pixels[i], x, y);
+      }
+    }
+  }
+
   /*
    * Return the starting index of the pixel data for coordinates (x, y).
    */
@@ -3699,11 +5229,8 @@ class Surface {
     }
 
     let start = this._coordinatesToIndex(x, y),
-        color = [];
-    for (let i = 0; i < 4; i++) {
-      color.push(this.imageData.data[start+i]);
-    }
-    return color;
+        data = this.imageData.data;
+    return [data[start], data[start+1], data[start+2], data[start+3]];
   }
 
   /*
@@ -3734,15 +5261,310 @@ class Surface {
     }
 
     let start = this._coordinatesToIndex(x, y),
-        newColor = Surface._padColorArray(color),
+        data = this.imageData.data,
         c;
     for (let i = 0; i < 4; i++) {
-      c = newColor[i];
+      // Pad the color like _padColorArray() without copying it
+      c = (i < color.length) ? color[i] : ((i < 3) ? 0 : 255);
       if (typeof c !== 'number') {
         throw new TypeError('color must be an Array of 3 or 4 integers.');
       }
       // ImageData clamps the value if c is not in [0, 255]
-      this.imageData.data[start+i] = c;
+      data[start+i] = c;
     }
   }
 }
+
+/*
+ * Global object to time the phases of each frame of the core game loop.
+ *
+ * It is off by default and costs one function call per phase when off.
+ * Turn it on with profiler.enable() or by setting PROFILE = true before
+ * screen.init() to also draw an overlay of the statistics on the screen.
+ */
+const profiler = (function () {
+  /*
+   * Names of the phases timed in each frame in the order they run.
+   */
+  const PHASES = Object.freeze(['clock', 'animate', 'update', 'draw']);
+
+  /*
+   * Number of frames kept in the rolling window.
+   */
+  const FRAME_COUNT = 600;
+
+  /*
+   * Milliseconds per frame at 60 frames per second.
+   */
+  const FRAME_BUDGET = 1000 / 60;
+
+  /*
+   * A frame is dropped if its interval exceeds this many typical intervals.
+   */
+  const DROPPED_RATIO = 1.5;
+
+  /*
+   * Number of frames between updates of the overlay statistics.
+   */
+  const OVERLAY_REFRESH = 30;
+
+  /*
+   * Ring buffers of the frame timestamps, the intervals between frames,
+   * and the milliseconds of each phase, all in milliseconds.
+   */
+  const TIMESTAMPS = new Float64Array(FRAME_COUNT);
+  const INTERVALS = new Float64Array(FRAME_COUNT);
+  const TIMES = PHASES.map(() => new Float64Array(FRAME_COUNT));
+
+  let enabled = false,
+      // Whether _begin() started the current frame while enabled
+      inFrame = false,
+      overlay = false,
+      // Number of frames recorded since the last reset
+      frames = 0,
+      // Index of the current frame in the ring buffers
+      current = 0,
+      // performance.now() when the last phase ended
+      mark = 0,
+      lastTimestamp = null,
+      overlayLines = [],
+      overlayTypical = FRAME_BUDGET,
+      overlayCountdown = 0;
+
+  /*
+   * Return the pth percentile of the sorted Array of numbers values.
+   */
+  function percentile(values, p) {
+    if (values.length <= 0) {
+      return 0;
+    }
+    let index = Math.min(values.length - 1, Math.ceil((p / 100) * values.length) - 1);
+    return values[Math.max(0, index)];
+  }
+
+  /*
+   * Return an Object summarizing the numbers in the Float64Array values.
+   */
+  function summarize(values) {
+    let sorted = Float64Array.from(values).sort(),
+        total = sorted.reduce((a, b) => (a + b), 0);
+    return {
+      mean: (sorted.length > 0) ? (total / sorted.length) : 0,
+      p50: percentile(sorted, 50),
+      p95: percentile(sorted, 95),
+      p99: percentile(sorted, 99),
+      max: (sorted.length > 0) ? sorted[sorted.length - 1] : 0
+    };
+  }
+
+  /*
+   * Return the Array of the ring buffer indices of the recorded frames
+   * from the oldest to the newest.
+   */
+  function recorded() {
+    let count = Math.min(frames, FRAME_COUNT),
+        result = [];
+    for (let i = count; i > 0; i--) {
+      result.push((current - i + FRAME_COUNT) % FRAME_COUNT);
+    }
+    return result;
+  }
+
+  /*
+   * Return the Object of statistics over the recorded frames.
+   */
+  function computeStats() {
+    let indices = recorded(),
+        // The first frame has no interval
+        intervals = indices.filter((i) => (INTERVALS[i] > 0)).map((i) => INTERVALS[i]),
+        work = indices.map((i) => TIMES.reduce((total, times) => (total + times[i]), 0)),
+        result = {frames: indices.length, phases: {}};
+    PHASES.forEach((phase, p) => {
+      result.phases[phase] = summarize(indices.map((i) => TIMES[p][i]));
+    });
+    result.work = summarize(work);
+    result.interval = summarize(intervals);
+
+    // Compare with the typical interval since the display may not be 60 Hz
+    let typical = result.interval.p50 || FRAME_BUDGET,
+        dropped = 0,
+        gcSuspect = 0;
+    indices.forEach((i, n) => {
+      if (INTERVALS[i] > (typical * DROPPED_RATIO)) {
+        dropped++;
+        // Time went missing outside the phases we measure
+        if (work[n] < (typical / 2)) {
+          gcSuspect++;
+        }
+      }
+    });
+    result.dropped = dropped;
+    result.gcSuspect = gcSuspect;
+    result.fps = (result.interval.mean > 0) ? (1000 / result.interval.mean) : 0;
+    return result;
+  }
+
+  /*
+   * Draw the overlay of the statistics in the topleft corner of the screen.
+   */
+  function drawOverlay() {
+    if (overlayCountdown <= 0) {
+      let stats = computeStats();
+      overlayLines = [
+        `${ stats.fps.toFixed(1) } fps  dropped ${ stats.dropped }  gc? ${ stats.gcSuspect }`,
+        `work p50 ${ stats.work.p50.toFixed(2) } p95 ${ stats.work.p95.toFixed(2) } p99 ${ stats.work.p99.toFixed(2) } ms`
+      ].concat(PHASES.map((phase) => `${ phase } p95 ${ stats.phases[phase].p95.toFixed(2) } ms`));
+      // Same threshold for dropped frames as computeStats()
+      overlayTypical = stats.interval.p50 || FRAME_BUDGET;
+      overlayCountdown = OVERLAY_REFRESH;
+    }
+    overlayCountdown--;
+
+    let graphWidth = 120,
+        graphHeight = 30,
+        top = (overlayLines.length * 14) + 4;
+    screen.draw.filled_rect(new Rect(0, 0, 240, top + graphHeight + 4), [0, 0, 0, 0.6]);
+    screen.draw.text(overlayLines.join('\n'), {topleft: [4, 2], fontsize: 12, lineheight: 14 / 12, color: 'white'});
+
+    // Bar graph of the newest work times against the frame budget
+    let indices = recorded().slice(-graphWidth);
+    indices.forEach((i, n) => {
+      let total = TIMES.reduce((sum, times) => (sum + times[i]), 0),
+          height = Math.min(graphHeight, Math.ceil(graphHeight * total / FRAME_BUDGET));
+      screen.draw.filled_rect(new Rect(4 + n, top + graphHeight - height, 1, height),
+                              (INTERVALS[i] > overlayTypical * DROPPED_RATIO) ? 'red' : 'lime');
+    });
+  }
+
+  return {
+    /*
+     * Array of the string names of the phases of a frame.
+     */
+    PHASES: PHASES,
+
+    get enabled() {
+      return enabled;
+    },
+
+    /*
+     * Boolean flag whether to draw the overlay after each frame.
+     */
+    get overlay() {
+      return overlay;
+    },
+    set overlay(value) {
+      overlay = Boolean(value);
+      overlayCountdown = 0;
+    },
+
+    /*
+     * Start timing frames, drawing the overlay if overlay is true.
+     *
+     * Timing starts with the next frame so a frame already under way
+     * is not recorded.
+     */
+    enable(drawOverlay = false) {
+      enabled = true;
+      this.overlay = drawOverlay;
+    },
+
+    /*
+     * Stop timing frames.
+     */
+    disable() {
+      enabled = false;
+      inFrame = false;
+      overlay = false;
+      lastTimestamp = null;
+    },
+
+    /*
+     * Discard the recorded frames.
+     */
+    reset() {
+      frames = 0;
+      current = 0;
+      lastTimestamp = null;
+      overlayCountdown = 0;
+    },
+
+    /*
+     * Return an Object with the mean, p50, p95, p99, and max milliseconds of
+     * each phase, the work of the whole frame, and the interval between
+     * frames, with the counts of dropped and GC suspect frames.
+     *
+     * GC suspect frames were dropped even though the measured work was
+     * less than half a frame, so the time went to garbage collection
+     * or something else outside the game.
+     */
+    stats() {
+      return computeStats();
+    },
+
+    /*
+     * Return the recorded frames and their statistics as an Object that
+     * JSON.stringify() turns into a trace jsgame0.py --compare-traces reads.
+     */
+    trace() {
+      return {
+        version: 1,
+        phases: PHASES.slice(),
+        frames: recorded().map((i) => {
+          let frame = {timestamp: TIMESTAMPS[i], interval: INTERVALS[i]};
+          PHASES.forEach((phase, p) => {
+            frame[phase] = TIMES[p][i];
+          });
+          return frame;
+        }),
+        stats: computeStats()
+      };
+    },
+
+    /*
+     * Start a frame at the requestAnimationFrame() timestamp.
+     */
+    _begin(timestamp) {
+      inFrame = enabled;
+      if (!enabled) {
+        return;
+      }
+      TIMESTAMPS[current] = timestamp;
+      INTERVALS[current] = (lastTimestamp == null) ? 0 : (timestamp - lastTimestamp);
+      lastTimestamp = timestamp;
+      for (let times of TIMES) {
+        times[current] = 0;
+      }
+      mark = performance.now();
+    },
+
+    /*
+     * End the phase with the integer index in PHASES.
+     *
+     * A phase ended more than once in a frame, like update() in fixed-timestep
+     * mode, adds up.
+     */
+    _mark(phase) {
+      if (!inFrame) {
+        return;
+      }
+      let now = performance.now();
+      TIMES[phase][current] += now - mark;
+      mark = now;
+    },
+
+    /*
+     * End the frame and draw the overlay.
+     */
+    _end() {
+      if (!inFrame) {
+        return;
+      }
+      inFrame = false;
+      current = (current + 1) % FRAME_COUNT;
+      frames++;
+      if (overlay) {
+        drawOverlay();
+      }
+    }
+  }
+})();
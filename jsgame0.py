@@ -1,10 +1,29 @@
 """Generate the HTML file for a Pygame Zero script."""
 
+import base64
 import collections
+import concurrent.futures
+import functools
+import gzip
+import hashlib
 import html
+import http.server
+import io
+import json
+import mimetypes
 import os
 import os.path
+import posixpath
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tokenize
 import unittest
+import urllib.parse
+import urllib.request
 
 FONT_EXTENSION_SET = {
     '.otf': 'opentype',
@@ -24,6 +43,39 @@ SOUND_EXTENSION_SET = frozenset([
     '.oga', '.ogg', '.wav', '.webm'])
 """frozenset of accepted file extensions for sounds."""
 
+ASSET_DIRECTORIES = {
+    'fonts': FONT_EXTENSION_SET,
+    'images': IMAGE_EXTENSION_SET,
+    'sounds': SOUND_EXTENSION_SET,
+    'music': SOUND_EXTENSION_SET
+}
+"""Dictionary mapping the asset directories to their accepted extensions."""
+
+SCRIPT_EXTENSION = '.py'
+"""String file extension of Pygame Zero scripts."""
+
+PAGE_EXTENSION = '.html'
+"""String file extension of the generated HTML pages."""
+
+PAGE_SECTIONS = ('head', 'resources', 'code')
+"""Tuple of the string sections of the HTML page in order.
+
+head contains the fonts, resources contains the images, sounds and music,
+and code contains the Python code and its JavaScript version.
+"""
+
+CACHE_FILENAME = '.jsgame0_cache.json'
+"""String filename of the build cache in the output directory."""
+
+CACHE_SIZE = 64 * 1024 * 1024
+"""Integer default maximum number of characters stored in the build cache."""
+
+MANIFEST_FILENAME = 'manifest.json'
+"""String filename of the asset manifest in the output directory."""
+
+HASH_LENGTH = 12
+"""Integer number of hexadecimal digits of the content hash in filenames."""
+
 TRICKY_CASES = ['Actor', 'images', 'sounds', 'keyboard', 'font',
                 '.image', '.x', '.y']
 """List of string gotchas that are tricky for porting."""
@@ -117,6 +169,48 @@ def is_valid(name):
         return True
     return False
 
+def is_accepted(filename, accepted=()):
+    """Return whether filename is valid with an extension in accepted.
+
+    Args:
+        filename: String filename to test.
+        accepted: Iterable containing string lowercase extensions to accept.
+            Defaults to an empty iterable which accepts all extensions.
+    Returns:
+        True if the name of filename is valid for Pygame Zero and its
+        extension is in accepted. False otherwise.
+    """
+    name, extension = os.path.splitext(filename)
+    if not is_valid(name):
+        return False
+    if len(accepted) > 0:
+        # Filter for accepted extensions
+        return extension.strip().lower() in accepted
+    return True
+
+def scan_directory(directory, accepted=()):
+    """Return the files in directory with extensions in accepted.
+
+    The directory is read once with os.scandir() so the file type and stat
+    information cached on each os.DirEntry is available without more calls.
+
+    Args:
+        directory: String path to the directory.
+        accepted: Iterable containing string lowercase extensions to accept.
+            Defaults to an empty iterable which accepts all extensions.
+    Returns:
+        List of os.DirEntry of files in directory with the extensions in
+        accepted sorted by name.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            result = [e for e in entries
+                      if is_accepted(e.name, accepted) and e.is_file()]
+    except OSError:
+        return []
+    result.sort(key=lambda e: e.name)
+    return result
+
 def list_directory(directory, accepted=()):
     """Return a list of files in directory with extensions in accepted.
 
@@ -128,56 +222,91 @@ def list_directory(directory, accepted=()):
         List of string filenames of files in directory with the extensions in
         accepted.
     """
-    if not os.path.isdir(directory):
-        return []
-    filenames = os.listdir(directory)
-    length = len(accepted)
+    return [e.name for e in scan_directory(directory, accepted)]
 
-    result = []
-    for f in filenames:
-        name, extension = os.path.splitext(f)
-        if is_valid(name):
-            if length > 0:
-                # Filter for accepted extensions
-                if extension.strip().lower() in accepted:
-                    result.append(f)
-            else:
-                result.append(f)
-    return sorted(result)
+def discover_assets(parent):
+    """Return the assets found for a Pygame Zero script in parent.
+
+    parent is scanned once for the directories in ASSET_DIRECTORIES and each
+    one found is scanned once for its accepted files.
+
+    Args:
+        parent: String path to the directory containing the script.
+    Returns:
+        Dictionary mapping each string directory in ASSET_DIRECTORIES to the
+        list of os.DirEntry of its accepted files sorted by name.
+    """
+    result = {d: [] for d in ASSET_DIRECTORIES}
+    try:
+        with os.scandir(parent or os.curdir) as entries:
+            for entry in entries:
+                if (entry.name in ASSET_DIRECTORIES) and entry.is_dir():
+                    result[entry.name] = scan_directory(
+                        entry.path, ASSET_DIRECTORIES[entry.name])
+    except OSError:
+        pass
+    return result
 
-def print_font_load(filenames):
+def print_font_load(filenames, file=None, urls=None):
     """Print the @font-face CSS rules to load fonts from filenames in fonts/.
 
     Args:
         filenames: List of string valid filenames in the "fonts/" directory.
+        file: Optional text stream to write to. Defaults to sys.stdout.
+        urls: Optional dictionary mapping string paths like "fonts/{name}" to
+            the string URLs to load them from. Defaults to None which loads
+            every font from its path.
     """
+    if urls is None:
+        urls = {}
+    output = []
     for f in filenames:
         name, extension = os.path.splitext(f)
-        print('@font-face {')
-        print("  font-family: '{}';".format(name))
-        print("  src: url('fonts/{}') format('{}');".format(
-            f, FONT_EXTENSION_SET.get(extension.strip().lower())))
-        print("""  font-weight: normal;
+        path = 'fonts/' + f
+        output.append("""@font-face {{
+  font-family: '{}';
+  src: url('{}') format('{}');
+  font-weight: normal;
   font-style: normal;
-}""")
+}}
+""".format(name, urls.get(path, path),
+           FONT_EXTENSION_SET.get(extension.strip().lower())))
+    _write(output, file)
 
-def print_image_load(filenames):
+def print_image_load(filenames, file=None, urls=None, deferred=()):
     """Print the image tags to load images from filenames in images/.
 
     Args:
         filenames: List of string valid filenames in the "images/" directory.
+        file: Optional text stream to write to. Defaults to sys.stdout.
+        urls: Optional dictionary mapping string paths like "images/{name}"
+            to the string URLs to load them from. Defaults to None which
+            loads every image from its path.
+        deferred: Optional container of the string filenames to load after
+            the game starts. Defaults to an empty tuple which loads every
+            image before the game starts.
     """
     if len(filenames) <= 0:
         return
+    if urls is None:
+        urls = {}
 
-    print('<section id="imageLoader" class="hidden">')
+    output = ['<section id="imageLoader" class="hidden">\n']
     for f in filenames:
         name, _ = os.path.splitext(f)
-        print('  <img class="hidden" src="images/{0}" alt="{1}" \
-data-name="{1}">'.format(f, name))
-    print('</section>')
+        path = 'images/' + f
+        if f in deferred:
+            # Without src, the image does not hold up the load event
+            output.append('  <img class="hidden" data-src="{0}" alt="{1}" \
+data-name="{1}" data-defer>\n'.format(urls.get(path, path), name))
+        else:
+            output.append('  <img class="hidden" src="{0}" alt="{1}" \
+data-name="{1}">\n'.format(urls.get(path, path), name))
+    output.append('</section>\n')
+    _write(output, file)
 
-def print_audio_load(filenames, section_ID='soundLoader', directory='sounds'):
+def print_audio_load(filenames, section_ID='soundLoader', directory='sounds',
+                     file=None, urls=None, deferred=()):
     """Print the audio tags to load audio from filenames in directory.
 
     Args:
@@ -185,27 +314,43 @@ def print_audio_load(filenames, section_ID='soundLoader', directory='sounds'):
         section_ID: Optional string ID of the section.
             Defaults to "soundLoader".
         directory: Optional string directory. Defaults to "sounds".
+        file: Optional text stream to write to. Defaults to sys.stdout.
+        urls: Optional dictionary mapping string paths like
+            "{directory}/{name}" to the string URLs to load them from.
+            Defaults to None which loads every file from its path.
+        deferred: Optional container of the string filenames to load after
+            the game starts. Defaults to an empty tuple which preloads every
+            file.
     """
     if len(filenames) <= 0:
         return
+    if urls is None:
+        urls = {}
 
-    print('<section id="{}" class="hidden">'.format(section_ID))
+    output = ['<section id="{}" class="hidden">\n'.format(section_ID)]
     for f in filenames:
         name, _ = os.path.splitext(f)
-        print("""  <audio class="hidden" controls preload="auto" \
-src="{}/{}" data-name="{}">\
-Your browser does not support the audio element.</audio>""".format(
-    directory, f, name))
-    print('</section>')
+        path = '{}/{}'.format(directory, f)
+        if f in deferred:
+            # Only fetched when played or after the game starts
+            preload = 'preload="none" data-defer'
+        else:
+            preload = 'preload="auto"'
+        output.append("""  <audio class="hidden" controls {} \
+src="{}" data-name="{}">\
+Your browser does not support the audio element.</audio>\n""".format(
+    preload, urls.get(path, path), name))
+    output.append('</section>\n')
+    _write(output, file)
 
-def print_javascript(lines):
+def print_javascript(lines, file=None, tokens=False):
     """Print a JavaScript version of the Python code in lines.
 
-    Not much actual translation is done. Only some simple substitutions are
-    made.
-
     Args:
         lines: List of string lines of the Python code.
+        file: Optional text stream to write to. Defaults to sys.stdout.
+        tokens: Optional boolean passed to translate().
+            Defaults to False.
     """
     counter = collections.Counter()
     for line in lines:
@@ -214,76 +359,1573 @@ def print_javascript(lines):
                 counter[o] += 1
 
     # Print a summary of what we found
-    print('''\
+    output = ['''\
 /*
  * Summary
- * ---''')
+ * ---
+''']
     for o in TRICKY_CASES:
-        print(' * {}: {}'.format(o, counter[o]))
-    print(' */')
+        output.append(' * {}: {}\n'.format(o, counter[o]))
+    output.append(' */\n')
 
-    # Figure out the indent level for each line
-    indents = [len(line) - len(line.lstrip()) for line in lines]
-    if any(i > 0 for i in indents):
-        # If a line is indented, then half the indent until the indent is odd
-        while True:
-            if any((i % 2) == 1 for i in indents):
-                break
-            for i in range(len(indents)):
-                indents[i] = indents[i] // 2
-
-    # Propagate the indent level backwards to deal with spacing empty lines
-    i = len(lines) - 2
-    while i >= 0:
-        while len(lines[i]) <= 0:
-            indents[i] = indents[i+1]
-            i -= 1
-        i -= 1
-
-    # Print the code
-    length = len(lines)
-    last_indent = 0
-    for i, (indent, line) in enumerate(zip(indents, lines)):
-        if indent < last_indent:
-            # The current line is not inside the block of the previous line
-            while indent < last_indent:
-                last_indent -= 1
-                print(('  ' * last_indent) + '}')
-        elif indent > last_indent:
-            # The current line is inside the block of the previous line
-            while indent > last_indent:
-                print(('  ' * last_indent) + '{')
-                last_indent += 1
+    output.extend(translate(lines, tokens))
+    _write(output, file)
 
+def translate(lines, tokens=False):
+    """Return a JavaScript version of the Python code in lines.
+
+    translate_lines() is the default because it keeps up with scripts of any
+    size. translate_tokens() converts more of the syntax but is many times
+    slower because it runs the tokenize module over every line.
+
+    Args:
+        lines: List of string lines of the Python code.
+        tokens: Optional boolean whether to use translate_tokens(). If the
+            code cannot be tokenized as Python, translate_lines() is used
+            instead. Defaults to False.
+    Returns:
+        List of string lines of JavaScript code ending in newlines.
+    """
+    if tokens:
+        try:
+            return translate_tokens(lines)
+        except (tokenize.TokenError, SyntaxError):
+            pass
+    return translate_lines(lines)
+
+def translate_lines(lines):
+    """Return a JavaScript version of the Python code in lines.
+
+    Not much actual translation is done. Block structure is guessed from the
+    indentation in one pass with a stack of indentation columns like the one
+    the Python tokenizer keeps, and only some simple substitutions are made,
+    so this works even if lines is not valid Python.
+
+    Args:
+        lines: List of string lines of the Python code.
+    Returns:
+        List of string lines of JavaScript ending with newlines.
+    """
+    output = []
+    # Indentation columns of the open blocks
+    columns = [0]
+    # Number of blank lines waiting for the indent level of the next line
+    blank = 0
+
+    for line in lines:
         cleaned = line.lstrip()
         if len(cleaned) <= 0:
-            print()
+            blank += 1
+            continue
+
+        column = len(line) - len(cleaned)
+        if column < columns[-1]:
+            # The current line is not inside the block of the previous line
+            while column < columns[-1]:
+                columns.pop()
+                output.append(('  ' * (len(columns) - 1)) + '}\n')
+            if column > columns[-1]:
+                # Dedent to a column between two open blocks
+                output.append(('  ' * (len(columns) - 1)) + '{\n')
+                columns.append(column)
+        elif column > columns[-1]:
+            # The current line is inside the block of the previous line
+            output.append(('  ' * (len(columns) - 1)) + '{\n')
+            columns.append(column)
+
+        # Blank lines belong to the block of the line after them
+        output.extend(['\n'] * blank)
+        blank = 0
+
+        indent = len(columns) - 1
+        if indent <= 0:
+            if cleaned.startswith('def '):
+                output.append('function ' + cleaned[4:] + '\n')
+            else:
+                output.append(cleaned + '\n')
+        else:
+            output.append('  ' * indent)
+            if cleaned.startswith('def '):
+                output.append(cleaned[4:] + '\n')
+            else:
+                output.append(cleaned.replace('self.', 'this.') + '\n')
+
+    # Close outstanding blocks
+    while len(columns) > 1:
+        columns.pop()
+        output.append(('  ' * (len(columns) - 1)) + '}\n')
+    output.extend(['\n'] * blank)
+    return output
+
+def translate_tokens(lines):
+    """Return a JavaScript version of the Python code in lines.
+
+    The code is translated in a single pass over the tokens from the tokenize
+    module. Blocks follow the INDENT and DEDENT tokens, comments and strings
+    are recognized as tokens so their contents are never rewritten, and
+    expressions continued over several lines stay in one statement.
+
+    The result is a starting point for a port and not a working program.
+    Only the syntax is translated and not the semantics.
+
+    Args:
+        lines: List of string lines of the Python code.
+    Returns:
+        List of string lines of JavaScript ending with newlines.
+    Raises:
+        tokenize.TokenError or SyntaxError if lines cannot be tokenized.
+    """
+    source = ''.join(line + '\n' for line in lines)
+    output = []
+    # Indentation columns and kinds of the open blocks
+    columns = [0]
+    kinds = ['module']
+    # Blank and comment lines waiting for the next statement or DEDENT
+    pending = []
+    line = []
+    # Start and nesting of f-strings split into parts by Python 3.12+
+    fstring_start = None
+    fstring_depth = 0
+
+    def flush(count):
+        """Output the first count pending lines at the current depth."""
+        prefix = '  ' * (len(kinds) - 1)
+        for row, column, text in pending[:count]:
+            if len(text) > 0:
+                output.append(prefix + text + '\n')
+            else:
+                output.append('\n')
+        del pending[:count]
+
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        kind = token.type
+        if fstring_depth > 0:
+            if kind == _FSTRING_START:
+                fstring_depth += 1
+            elif kind == _FSTRING_END:
+                fstring_depth -= 1
+                if fstring_depth <= 0:
+                    # Translate the whole f-string like Python 3.11 does
+                    line.append(tokenize.TokenInfo(
+                        tokenize.STRING,
+                        _source_slice(lines, fstring_start, token.end),
+                        fstring_start, token.end, token.line))
+            continue
+        if kind == _FSTRING_START:
+            fstring_start = token.start
+            fstring_depth = 1
+        elif kind == tokenize.NEWLINE:
+            flush(len(pending))
+            output.append(_translate_statement(line, kinds, lines))
+            line = []
+        elif kind == tokenize.NL:
+            if len(line) > 0:
+                # Line break inside brackets
+                line.append(token)
+            elif ((len(pending) <= 0) or
+                  (pending[-1][0] != token.start[0])):
+                # Blank line
+                pending.append((token.start[0], 0, ''))
+        elif kind == tokenize.COMMENT:
+            if len(line) > 0:
+                line.append(token)
+            else:
+                pending.append((token.start[0], token.start[1],
+                                '//' + token.string[1:]))
+        elif kind == tokenize.INDENT:
+            columns.append(len(token.string))
+            if len(kinds) < len(columns):
+                # Indented without a block, like a continued statement
+                kinds.append('block')
+                output.append(('  ' * (len(kinds) - 2)) + '{\n')
+        elif kind == tokenize.DEDENT:
+            # Comments indented inside the block stay inside the block
+            column = columns.pop()
+            count = 0
+            for i, (row, c, text) in enumerate(pending):
+                if (len(text) > 0) and (c >= column):
+                    count = i + 1
+            flush(count)
+            kinds.pop()
+            output.append(('  ' * (len(kinds) - 1)) + '}\n')
+        elif kind == tokenize.ENDMARKER:
+            flush(len(pending))
         else:
-##            end = cleaned.find('#')
-##            if end < 0:
-##                end = len(cleaned)
-##            else:
-##                while cleaned[end-1].isspace():
-##                    end -= 1
-
-            if indent <= 0:
-                if cleaned.startswith('def '):
-                    print('function ' + cleaned[4:])
+            line.append(token)
+    return output
+
+_FSTRING_START = getattr(tokenize, 'FSTRING_START', -1)
+"""Integer token type starting an f-string in Python 3.12+ or -1."""
+
+_FSTRING_END = getattr(tokenize, 'FSTRING_END', -1)
+"""Integer token type ending an f-string in Python 3.12+ or -1."""
+
+def _source_slice(lines, start, end):
+    """Return the source in lines from (row, column) start to end."""
+    (start_row, start_column), (end_row, end_column) = start, end
+    if start_row == end_row:
+        return lines[start_row-1][start_column:end_column]
+    return '\n'.join([lines[start_row-1][start_column:]] +
+                     lines[start_row:end_row-1] +
+                     [lines[end_row-1][:end_column]])
+
+def _translate_statement(tokens, kinds, lines):
+    """Return the JavaScript line for the statement in tokens.
+
+    Opening a block pushes its kind on to kinds.
+
+    Args:
+        tokens: List of tokenize.TokenInfo of one logical line.
+        kinds: List of string kinds of the open blocks.
+        lines: List of string lines of the Python code.
+    Returns:
+        String JavaScript line ending with a newline.
+    """
+    depth = len(kinds) - 1
+    prefix = '  ' * depth
+    comment = ''
+    if tokens[-1].type == tokenize.COMMENT:
+        token = tokens.pop()
+        comment = '  //' + token.string[1:]
+    first = tokens[0].string
+
+    if first in ('import', 'from', 'global', 'nonlocal', '@'):
+        # No JavaScript equivalent so keep it as a comment
+        return '{}// {}{}\n'.format(
+            prefix, _source_slice(lines, tokens[0].start, tokens[-1].end),
+            comment)
+    if (first == 'pass') and (len(tokens) == 1):
+        if len(comment) > 0:
+            return prefix + comment.lstrip() + '\n'
+        return ''
+    if (len(tokens) == 1) and (tokens[0].type == tokenize.STRING):
+        # A docstring becomes a comment
+        text = _translate_string(first)
+        return '{}/*{}*/{}\n'.format(prefix, text[1:-1], comment)
+
+    if first in _BLOCK_KEYWORDS:
+        # Find the colon ending the header at the top level of brackets
+        level = 0
+        colon = -1
+        for i, token in enumerate(tokens):
+            if token.type == tokenize.OP:
+                if token.string in '([{':
+                    level += 1
+                elif token.string in ')]}':
+                    level -= 1
+                elif (token.string == ':') and (level <= 0):
+                    colon = i
+                    break
+        if colon > 0:
+            header = _translate_header(tokens[:colon], kinds[-1], depth)
+            body = tokens[colon+1:]
+            if (len(body) == 1) and (body[0].string == 'pass'):
+                return '{}{} {{}}{}\n'.format(prefix, header, comment)
+            if len(body) > 0:
+                # A simple statement on the same line as the header
+                return '{}{} {{ {} }}{}\n'.format(
+                    prefix, header,
+                    _translate_expression(body, depth).strip() + ';',
+                    comment)
+            if first in ('class', 'def', 'async'):
+                kinds.append(first)
+            else:
+                kinds.append('block')
+            return '{}{} {{{}\n'.format(prefix, header, comment)
+
+    return '{}{};{}\n'.format(prefix, _translate_expression(tokens, depth),
+                              comment)
+
+_BLOCK_KEYWORDS = frozenset(['if', 'elif', 'else', 'while', 'for', 'def',
+                             'class', 'try', 'except', 'finally', 'with',
+                             'async'])
+"""frozenset of the string keywords starting a block in Python."""
+
+def _translate_header(tokens, parent, depth):
+    """Return the JavaScript for the block header in tokens.
+
+    Args:
+        tokens: List of tokenize.TokenInfo of the header without the colon.
+        parent: String kind of the block containing the header.
+        depth: Integer depth of the block containing the header.
+    Returns:
+        String JavaScript header without the opening brace.
+    """
+    first = tokens[0].string
+    if (first == 'async') and (len(tokens) > 1):
+        return 'async ' + _translate_header(tokens[1:], parent, depth)
+    rest = tokens[1:]
+    if first in ('if', 'while'):
+        return '{} ({})'.format(first, _translate_expression(rest, depth))
+    if first == 'elif':
+        return 'else if ({})'.format(_translate_expression(rest, depth))
+    if first in ('else', 'try', 'finally'):
+        return first
+    if first == 'except':
+        name = 'error'
+        if (len(rest) >= 2) and (rest[-2].string == 'as'):
+            name = rest[-1].string
+        return 'catch ({})'.format(name)
+    if first == 'with':
+        return 'with ({})'.format(_translate_expression(rest, depth))
+    if first == 'class':
+        name = rest[0].string
+        if ((len(rest) > 3) and (rest[1].string == '(') and
+            (rest[2].string != 'object') and (rest[2].type == tokenize.NAME)):
+            return 'class {} extends {}'.format(name, rest[2].string)
+        return 'class ' + name
+    if first == 'def':
+        name = rest[0].string
+        parameters = rest[1:]
+        for i, token in enumerate(parameters):
+            if token.string == '->':
+                # Drop the return annotation
+                parameters = parameters[:i]
+                break
+        parameters = _drop_annotations(parameters)
+        if parent == 'class':
+            if ((len(parameters) > 2) and
+                (parameters[1].string in ('self', 'cls'))):
+                # Drop self and its trailing comma from a method
+                if parameters[2].string == ',':
+                    parameters = parameters[:1] + parameters[3:]
                 else:
-                    print(cleaned)
+                    parameters = parameters[:1] + parameters[2:]
+            if name == '__init__':
+                name = 'constructor'
+            return name + _translate_expression(parameters, depth)
+        return 'function {}{}'.format(
+            name, _translate_expression(parameters, depth))
+    if first == 'for':
+        level = 0
+        for i, token in enumerate(rest):
+            if token.string in ('(', '[', '{'):
+                level += 1
+            elif token.string in (')', ']', '}'):
+                level -= 1
+            elif (token.string == 'in') and (level <= 0):
+                target = _translate_expression(rest[:i], depth).strip()
+                iterable = rest[i+1:]
+                break
+        else:
+            return 'for ({})'.format(_translate_expression(rest, depth))
+        if any(t.string == ',' for t in rest[:i]):
+            # Unpack tuples with array destructuring
+            target = '[{}]'.format(target)
+        arguments = _range_arguments(iterable)
+        if arguments is not None:
+            start, stop, step = [_translate_expression(a, depth).strip()
+                                 for a in arguments]
+            if step == '1':
+                step = '{}++'.format(target)
             else:
-                print('  ' * indent, end='')
-                if cleaned.startswith('def '):
-                    print(cleaned[4:])
+                step = '{} += {}'.format(target, step)
+            return 'for (let {0} = {1}; {0} < {2}; {3})'.format(
+                target, start, stop, step)
+        return 'for (let {} of {})'.format(
+            target, _translate_expression(iterable, depth).strip())
+    return _translate_expression(tokens, depth)
+
+def _drop_annotations(parameters):
+    """Return the tokens of parameters without any type annotations.
+
+    Args:
+        parameters: List of tokenize.TokenInfo of a parenthesized list of
+            parameters.
+    Returns:
+        List of tokenize.TokenInfo.
+    """
+    result = []
+    level = 0
+    annotation = False
+    for token in parameters:
+        if token.string in ('(', '[', '{'):
+            level += 1
+        elif token.string in (')', ']', '}'):
+            level -= 1
+        if level <= 1:
+            if (token.string == ':') and (level == 1):
+                annotation = True
+                continue
+            if token.string in (',', '=') or (level <= 0):
+                annotation = False
+        if not annotation:
+            result.append(token)
+    return result
+
+def _range_arguments(tokens):
+    """Return the start, stop and step tokens if tokens is a range() call.
+
+    Returns:
+        Tuple of the lists of tokenize.TokenInfo of the start, stop and step
+        arguments of range() in tokens or None if tokens is not a simple call
+        of range().
+    """
+    if ((len(tokens) < 4) or (tokens[0].string != 'range') or
+        (tokens[1].string != '(') or (tokens[-1].string != ')')):
+        return None
+    arguments = [[]]
+    level = 0
+    for token in tokens[2:-1]:
+        if token.string in ('(', '[', '{'):
+            level += 1
+        elif token.string in (')', ']', '}'):
+            level -= 1
+            if level < 0:
+                # The call of range() ended before the last token
+                return None
+        elif (token.string == ',') and (level <= 0):
+            arguments.append([])
+            continue
+        arguments[-1].append(token)
+    one = [tokenize.TokenInfo(tokenize.NUMBER, '1', (0, 0), (0, 1), '')]
+    zero = [tokenize.TokenInfo(tokenize.NUMBER, '0', (0, 0), (0, 1), '')]
+    if (len(arguments) == 1) and (len(arguments[0]) > 0):
+        return (zero, arguments[0], one)
+    if len(arguments) == 2:
+        return (arguments[0], arguments[1], one)
+    if len(arguments) == 3:
+        return tuple(arguments)
+    return None
+
+NAME_TRANSLATIONS = {
+    'True': 'true',
+    'False': 'false',
+    'None': 'null',
+    'and': '&&',
+    'or': '||',
+    'not': '!',
+    'is': '===',
+    'self': 'this',
+    'print': 'console.log',
+    'raise': 'throw',
+    'del': 'delete'
+}
+"""Dictionary mapping Python names to their JavaScript equivalents."""
+
+OPERATOR_TRANSLATIONS = {
+    '==': '===',
+    '!=': '!==',
+    '//': '/',
+    '//=': '/=',
+    '->': '=>'
+}
+"""Dictionary mapping Python operators to their JavaScript equivalents."""
+
+def _translate_expression(tokens, depth):
+    """Return the JavaScript for the tokens of an expression or statement.
+
+    Tokens separated by spaces on the same line stay separated by a space.
+    Lines continued inside brackets are indented one level deeper than the
+    statement.
+
+    Args:
+        tokens: List of tokenize.TokenInfo.
+        depth: Integer depth of the block containing the tokens.
+    Returns:
+        String JavaScript.
+    """
+    result = []
+    continuation = '\n' + ('  ' * (depth + 2))
+    # Bracket levels of the lambdas waiting for their colon
+    lambdas = []
+    level = 0
+    row, column = tokens[0].start if len(tokens) > 0 else (0, 0)
+    skip_space = False
+    count = len(tokens)
+    for i, token in enumerate(tokens):
+        kind, string, (start_row, start_column), end, _ = token
+        if kind == tokenize.NL:
+            continue
+        if start_row != row:
+            result.append(continuation)
+        elif (start_column > column) and (not skip_space):
+            if kind == tokenize.COMMENT:
+                result.append(' ' * (start_column - column))
+            else:
+                # Removed tokens such as annotations leave wider gaps
+                result.append(' ')
+        row, column = end
+        skip_space = False
+
+        if kind == tokenize.NAME:
+            if string == 'lambda':
+                lambdas.append(level)
+                result.append('(')
+                skip_space = True
+                continue
+            if (string == 'is') and (i + 1 < count) and (
+                tokens[i+1].string == 'not'):
+                result.append('!==')
+                # Skip not and the space before it
+                row, column = tokens[i+1].end
+                tokens[i+1] = tokenize.TokenInfo(tokenize.NL, '', end, end,
+                                                 '')
+                continue
+            if (string == 'not') and (i + 1 < count) and (
+                tokens[i+1].string == 'in'):
+                # There is no simple equivalent of not in
+                result.append(string)
+                continue
+            string = NAME_TRANSLATIONS.get(string, string)
+            if string == '!':
+                skip_space = True
+            result.append(string)
+        elif kind == tokenize.OP:
+            if string in '([{':
+                level += 1
+                skip_space = True
+            elif string in ')]}':
+                level -= 1
+            elif ((string == ':') and (len(lambdas) > 0) and
+                  (lambdas[-1] == level)):
+                lambdas.pop()
+                result.append(') =>')
+                continue
+            result.append(OPERATOR_TRANSLATIONS.get(string, string))
+        elif kind == tokenize.STRING:
+            result.append(_translate_string(string))
+        elif kind == tokenize.COMMENT:
+            result.append('//' + string[1:])
+        else:
+            result.append(string)
+    return ''.join(result)
+
+def _translate_string(string):
+    """Return the JavaScript for the Python string literal in string.
+
+    Triple quoted strings and f-strings become template literals.
+
+    Args:
+        string: String Python string literal including any prefix.
+    Returns:
+        String JavaScript string literal.
+    """
+    index = 0
+    while string[index] not in '\'"':
+        index += 1
+    prefix = string[:index].lower()
+    body = string[index:]
+    if body[:3] in ('"""', "\'\'\'"):
+        body = body[3:-3]
+        template = True
+    else:
+        quote = body[0]
+        body = body[1:-1]
+        template = 'f' in prefix
+    if 'r' in prefix:
+        body = body.replace('\\', '\\\\')
+    if not template:
+        return quote + body + quote
+
+    body = body.replace('`', '\\`')
+    if 'f' not in prefix:
+        return '`' + body.replace('${', '\\${') + '`'
+
+    # Replace the replacement fields of the f-string with placeholders
+    result = []
+    i = 0
+    length = len(body)
+    while i < length:
+        c = body[i]
+        if (c in '{}') and (body[i+1:i+2] == c):
+            # Escaped brace
+            result.append(c)
+            i += 2
+            continue
+        if c == '$':
+            result.append('\\$')
+        elif c == '{':
+            level = 1
+            j = i + 1
+            end = -1
+            while (j < length) and (level > 0):
+                if body[j] in '([{':
+                    level += 1
+                elif body[j] in ')]}':
+                    level -= 1
+                elif (level == 1) and (end < 0) and (
+                    (body[j] == ':') or
+                    ((body[j] == '!') and (body[j+1:j+2] != '='))):
+                    # Drop the conversion and format specification
+                    end = j
+                j += 1
+            if end < 0:
+                end = j - 1
+            expression = body[i+1:end].strip()
+            if expression.endswith('='):
+                # Self documenting expression
+                result.append(expression)
+                expression = expression[:-1]
+            result.append('${' + re.sub(r'\bself\.', 'this.', expression) +
+                          '}')
+            i = j
+            continue
+        else:
+            result.append(c)
+        i += 1
+    return '`' + ''.join(result) + '`'
+
+BENCHMARK_SCRIPT = [
+    'class Player(Actor):',
+    '    def update(self, dt):',
+    '        # Move the player',
+    '        if keyboard.left and self.x > 0:',
+    '            self.x -= SPEED * dt',
+    '        elif keyboard.right:',
+    "            self.x += SPEED * dt  # '#' is not a comment here",
+    '        for i in range(len(self.shots)):',
+    '            self.shots[i].y -= 4',
+    '        return f"{self.name}: {self.score:05d}"',
+    '',
+    'def draw():',
+    '    screen.clear()',
+    '    screen.draw.text("Score #1", (10,',
+    '                                   10))',
+    ''
+]
+"""List of string lines of Python code repeated by benchmark()."""
+
+BENCHMARK_TOLERANCE = 1.25
+"""Float ratio of the seconds translate_tokens() may take to the seconds
+translate_lines() takes for check_benchmark() to pass."""
+
+def benchmark(count=10000, repeat=3):
+    """Return the best seconds taken by each translator on count lines.
+
+    Args:
+        count: Optional integer number of lines of Python code to translate.
+            Defaults to 10000.
+        repeat: Optional integer number of times to time each translator.
+            Defaults to 3.
+    Returns:
+        Dictionary mapping the string names of the translators to the float
+        best seconds taken.
+    """
+    lines = (BENCHMARK_SCRIPT * (count // len(BENCHMARK_SCRIPT) + 1))[:count]
+    results = {}
+    for translator in [translate_lines, translate_tokens]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            translator(lines)
+            seconds = time.perf_counter() - start
+            if (best is None) or (seconds < best):
+                best = seconds
+        results[translator.__name__] = best
+    return results
+
+def check_benchmark(results):
+    """Return a list of the problems with the speed in benchmark() results.
+
+    translate_tokens() can only replace translate_lines() as the default of
+    translate() once it is as fast within BENCHMARK_TOLERANCE. Until then
+    it stays opt-in.
+
+    Args:
+        results: Dictionary returned by benchmark().
+    Returns:
+        List of string descriptions of the problems found.
+    """
+    lines = results['translate_lines']
+    tokens = results['translate_tokens']
+    if tokens > lines * BENCHMARK_TOLERANCE:
+        return ['translate_tokens() took {:.3f}s, {:.1f} times the {:.3f}s \
+of translate_lines(), so it stays opt-in'.format(
+            tokens, tokens / max(lines, 1e-9), lines)]
+    return []
+
+def _write(output, file=None):
+    """Write the list of strings in output to file in one bulk write.
+
+    Args:
+        output: List of strings to write.
+        file: Optional text stream to write to. Defaults to sys.stdout.
+    """
+    if file is None:
+        file = sys.stdout
+    file.write(''.join(output))
+
+def list_resources(parent):
+    """Return the resources found for a Pygame Zero script in parent.
+
+    Args:
+        parent: String path to the directory containing the script.
+    Returns:
+        Tuple of the lists of string filenames of the fonts, images, sounds
+        and music.
+    """
+    assets = discover_assets(parent)
+    return tuple([e.name for e in assets[d]] for d in ASSET_DIRECTORIES)
+
+def read_script(path):
+    """Return the lines of the Pygame Zero script at path.
+
+    Args:
+        path: String path to the Pygame Zero script.
+    Returns:
+        List of string lines with the trailing whitespace removed.
+    """
+    lines = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            clean = line.rstrip()
+            lines.append(clean)
+    return lines
+
+def startup_code(lines):
+    """Return the lines of the Python code in lines that run at the start.
+
+    This is every top level statement outside of function and class
+    definitions followed by the body of reset() if the script defines one.
+    The bodies of the module level functions and classes they call follow,
+    along with the ones those call in turn.
+
+    Args:
+        lines: List of string lines of the Python code.
+    Returns:
+        List of string lines of the code that runs at the start.
+    """
+    # Split the top level statements from the bodies of the definitions
+    top = []
+    bodies = {}
+    body = top
+    for line in lines:
+        if (len(line) > 0) and (not line[0].isspace()):
+            match = re.match(r'(?:async\s+)?(?:def|class)\s+(\w+)', line)
+            if match is not None:
+                body = bodies.setdefault(match.group(1), [])
+                continue
+            if line.startswith('@'):
+                # Decorators are skipped along with the definitions after them
+                body = []
+                continue
+            body = top
+        body.append(line)
+
+    # Top level statements run before reset() when the page loads
+    result = top + bodies.get('reset', [])
+    called = {'reset'}
+    i = 0
+    while i < len(result):
+        for name in re.findall(r'(\w+)\s*\(', result[i]):
+            if (name in bodies) and (name not in called):
+                called.add(name)
+                result.extend(bodies[name])
+        i += 1
+    return result
+
+def deferred_assets(lines, assets):
+    """Return the assets that are not needed to start the game.
+
+    An asset is needed to start the game if its name appears in
+    startup_code(), including the functions it calls. Fonts are always
+    needed.
+
+    Args:
+        lines: List of string lines of the Python code.
+        assets: Dictionary returned by discover_assets().
+    Returns:
+        Set of string filenames of the images, sounds and music to defer.
+    """
+    words = set(re.findall(r'\w+', '\n'.join(startup_code(lines))))
+    result = set()
+    for directory in ['images', 'sounds', 'music']:
+        for e in assets[directory]:
+            name, _ = os.path.splitext(e.name)
+            if name not in words:
+                result.add(e.name)
+    return result
+
+def print_section(path, section, file=None, assets=None, urls=None,
+                  lazy=False, tokens=False):
+    """Print a section of the HTML page for the Pygame Zero script at path.
+
+    Args:
+        path: String path to the Pygame Zero script.
+        section: String name of the section in PAGE_SECTIONS.
+        file: Optional text stream to write to. Defaults to sys.stdout.
+        assets: Optional dictionary returned by discover_assets() for the
+            directory containing path. Defaults to None which discovers them.
+        urls: Optional dictionary returned by asset_urls().
+            Defaults to None which loads every asset from its path.
+        lazy: Optional boolean whether to load the assets returned by
+            deferred_assets() after the game starts. Defaults to False.
+        tokens: Optional boolean passed to translate(). Defaults to False.
+    """
+    if file is None:
+        file = sys.stdout
+    name, _ = os.path.splitext(os.path.basename(path))
+    if (assets is None) and (section != 'code'):
+        assets = discover_assets(os.path.dirname(path))
+    if section == 'head':
+        file.write(HTML_TO_FONT.format(title=name))
+        print_font_load([e.name for e in assets['fonts']], file, urls)
+        file.write(HTML_TO_RESOURCE)
+    elif section == 'resources':
+        deferred = ()
+        if lazy:
+            deferred = deferred_assets(read_script(path), assets)
+        print_image_load([e.name for e in assets['images']], file, urls,
+                         deferred)
+        print_audio_load([e.name for e in assets['sounds']],
+                         'soundLoader', 'sounds', file, urls, deferred)
+        print_audio_load([e.name for e in assets['music']],
+                         'musicLoader', 'music', file, urls, deferred)
+    elif section == 'code':
+        lines = read_script(path)
+        html_safe = '\n'.join([html.escape(line) for line in lines])
+        file.write(HTML_WITH_CODE.format(title=name, code=html_safe))
+        print_javascript(lines, file, tokens)
+        file.write(HTML_TO_END)
+    else:
+        raise ValueError('Unknown page section {!r}.'.format(section))
+
+def render_page(path, out, inline=None, lazy=False, tokens=False):
+    """Write the HTML page for the Pygame Zero script at path to out.
+
+    Each stage of the page is written to out with a single bulk write so out
+    can be any file-like object, such as a file, an io.StringIO or a
+    gzip.open() stream in text mode.
+
+    Args:
+        path: String path to the Pygame Zero script.
+        out: Text stream to write the page to.
+        inline: Optional integer size in bytes. Assets of at most this size
+            are inlined into the page as data URIs.
+            Defaults to None which inlines nothing.
+        lazy: Optional boolean whether to load the assets not needed to
+            start the game after it starts. Defaults to False.
+        tokens: Optional boolean passed to translate(). Defaults to False.
+    """
+    assets = discover_assets(os.path.dirname(path))
+    urls = asset_urls(assets, inline)
+    for section in PAGE_SECTIONS:
+        print_section(path, section, out, assets, urls, lazy, tokens)
+
+def data_uri(path):
+    """Return a data URI with the contents of the file at path.
+
+    Args:
+        path: String path to the file.
+    Returns:
+        String base64 encoded data URI with the media type guessed from the
+        extension of path.
+    """
+    media_type, _ = mimetypes.guess_type(path, strict=False)
+    if media_type is None:
+        media_type = 'application/octet-stream'
+    with open(path, 'rb') as f:
+        data = base64.b64encode(f.read()).decode('ascii')
+    return 'data:{};base64,{}'.format(media_type, data)
+
+def hashed_filename(path):
+    """Return the filename of path with a hash of its contents added.
+
+    Args:
+        path: String path to the file.
+    Returns:
+        String filename like "{name}.{hash}{extension}".
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    name, extension = os.path.splitext(os.path.basename(path))
+    return '{}.{}{}'.format(name, digest.hexdigest()[:HASH_LENGTH], extension)
+
+def asset_urls(assets, inline=None, directory=None):
+    """Return the URLs to load assets from.
+
+    Inlining small assets as data URIs saves the browser one request each
+    before the game can start. Copying assets to content hashed filenames
+    lets them be served with long lived caching because an edited asset
+    gets a new URL.
+
+    Args:
+        assets: Dictionary returned by discover_assets().
+        inline: Optional integer size in bytes. Assets of at most this size
+            are inlined as data URIs. Defaults to None which inlines nothing.
+        directory: Optional string path to the directory of the page.
+            The assets not inlined are copied under it to content hashed
+            filenames. Defaults to None which copies nothing.
+    Returns:
+        Dictionary mapping string paths like "images/{name}" to the string
+        URLs to load them from. Assets loaded from their paths are omitted.
+    """
+    urls = {}
+    for asset_directory, entries in assets.items():
+        for e in entries:
+            path = '{}/{}'.format(asset_directory, e.name)
+            if (inline is not None) and (e.stat().st_size <= inline):
+                urls[path] = data_uri(e.path)
+            elif directory is not None:
+                url = '{}/{}'.format(asset_directory, hashed_filename(e.path))
+                target = os.path.join(directory, *url.split('/'))
+                if not os.path.isfile(target):
+                    # Hashed filenames never change content once written
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copyfile(e.path, target)
+                urls[path] = url
+    return urls
+
+def fingerprint_assets(entries):
+    """Return a fingerprint of the files in entries.
+
+    The fingerprint is built from the name, modification time and size of
+    each file so it is cheap to compute without reading the files.
+
+    Args:
+        entries: List of os.DirEntry of files sorted by name.
+    Returns:
+        String hexadecimal fingerprint.
+    """
+    digest = hashlib.sha256()
+    for entry in entries:
+        stat = entry.stat()
+        digest.update('{}\0{}\0{}\n'.format(
+            entry.name, stat.st_mtime_ns, stat.st_size).encode('utf-8'))
+    return digest.hexdigest()
+
+def page_keys(path, assets=None, inline=None, hashed=False, lazy=False,
+              tokens=False):
+    """Return the keys of the inputs of each section of the page for path.
+
+    A section only needs to be generated again when its key changes.
+
+    Args:
+        path: String path to the Pygame Zero script.
+        assets: Optional dictionary returned by discover_assets() for the
+            directory containing path. Defaults to None which discovers them.
+        inline: Optional integer size in bytes passed to asset_urls().
+            Defaults to None which inlines nothing.
+        hashed: Optional boolean whether assets are copied to content hashed
+            filenames. Defaults to False.
+        lazy: Optional boolean whether assets are deferred based on the
+            script. Defaults to False.
+        tokens: Optional boolean whether the code is translated with
+            translate_tokens(). Defaults to False.
+    Returns:
+        Dictionary mapping the string section in PAGE_SECTIONS to its
+        string key.
+    """
+    if assets is None:
+        assets = discover_assets(os.path.dirname(path))
+    name, _ = os.path.splitext(os.path.basename(path))
+    with open(path, 'rb') as f:
+        script = hashlib.sha256(f.read()).hexdigest()
+    return {
+        'head': '{}:{}:{}:{}'.format(name, inline, hashed,
+                                     fingerprint_assets(assets['fonts'])),
+        'resources': ':'.join([str(inline), str(hashed),
+                               # Deferred assets depend on the script
+                               script if lazy else ''] + [
+            fingerprint_assets(assets[d])
+            for d in ['images', 'sounds', 'music']]),
+        'code': '{}:{}:{}'.format(name, tokens, script)
+    }
+
+
+class BuildCache:
+
+    """Persistent cache of the sections of the pages built.
+
+    The cache is stored as one JSON file. Entries are kept in least recently
+    used order and evicted from the front once the total size of the stored
+    sections exceeds the size cap.
+    """
+
+    def __init__(self, path, size=CACHE_SIZE):
+        self.path = path
+        """String path to the cache file."""
+
+        self.size = size
+        """Integer maximum number of characters of sections to store."""
+
+        self.entries = collections.OrderedDict()
+        """OrderedDict mapping string page paths to their entries."""
+
+        self.load()
+
+    def load(self):
+        """Load the entries from the cache file if it is still valid."""
+        self.entries.clear()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get('version') == _generator_version():
+            self.entries.update(stored.get('entries', []))
+
+    def save(self):
+        """Evict the least recently used entries and write the cache file."""
+        total = sum(_entry_size(e) for e in self.entries.values())
+        while (total > self.size) and (len(self.entries) > 0):
+            _, entry = self.entries.popitem(last=False)
+            total -= _entry_size(entry)
+
+        parent = os.path.dirname(self.path)
+        if len(parent) > 0:
+            os.makedirs(parent, exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'version': _generator_version(),
+                       'entries': list(self.entries.items())}, f)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        """Remove all the entries and the cache file."""
+        self.entries.clear()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def get(self, key):
+        """Return the entry for key and mark it as recently used.
+
+        Returns:
+            Dictionary entry or None if key is not in the cache.
+        """
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, entry):
+        """Store entry for key as the most recently used."""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+def _entry_size(entry):
+    """Return the integer number of characters stored in a cache entry."""
+    return sum(len(s) for s in entry['sections'].values())
+
+@functools.lru_cache(maxsize=None)
+def _generator_version():
+    """Return a string hash of this module so edits invalidate the cache."""
+    with open(__file__, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _output_stat(output):
+    """Return a list of the modification time and size of output or None."""
+    try:
+        stat = os.stat(output)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _copied_assets(urls):
+    """Return the dictionary of the urls from asset_urls() that are files."""
+    return {path: url for path, url in urls.items()
+            if not url.startswith('data:')}
+
+def find_scripts(path):
+    """Return the Pygame Zero scripts found at path.
+
+    Args:
+        path: String path to a directory tree or a manifest file.
+            A directory tree is searched recursively for Pygame Zero scripts.
+            A manifest file lists one script per line relative to the
+            directory containing the manifest. Empty lines and lines starting
+            with "#" are ignored.
+    Returns:
+        Sorted list of string paths to the Pygame Zero scripts.
+    """
+    result = []
+    if os.path.isdir(path):
+        for parent, directories, filenames in os.walk(path):
+            # Skip hidden directories and caches
+            directories[:] = [d for d in directories
+                              if not d.startswith(('.', '__'))]
+            for f in filenames:
+                if f.endswith(SCRIPT_EXTENSION):
+                    result.append(os.path.join(parent, f))
+    elif os.path.isfile(path):
+        parent = os.path.dirname(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                clean = line.strip()
+                if (len(clean) > 0) and (not clean.startswith('#')):
+                    result.append(os.path.join(parent, clean))
+    return sorted(result)
+
+def page_path(script, root, directory):
+    """Return the path to the HTML page for script in directory.
+
+    The page mirrors the location of script relative to root. Scripts outside
+    of root are placed at the top of directory.
+
+    Args:
+        script: String path to the Pygame Zero script.
+        root: String path to the root of the scripts.
+        directory: String path to the output directory.
+    Returns:
+        String path to the HTML page.
+    """
+    relative = os.path.relpath(script, root)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(script)
+    name, _ = os.path.splitext(relative)
+    return os.path.join(directory, name + PAGE_EXTENSION)
+
+def build_page(script, output, entry=None, inline=None, hashed=False,
+               lazy=False, tokens=False):
+    """Write the HTML page for script to output.
+
+    Only the sections whose keys differ from those in entry are generated.
+    The page is not written at all if nothing changed since entry was made.
+
+    Args:
+        script: String path to the Pygame Zero script.
+        output: String path to the HTML page to write.
+        entry: Optional dictionary cache entry from a previous build.
+            Defaults to None which generates every section.
+        inline: Optional integer size in bytes passed to asset_urls().
+            Defaults to None which inlines nothing.
+        hashed: Optional boolean whether to copy the assets next to output
+            with content hashed filenames. Defaults to False.
+        lazy: Optional boolean whether to load the assets not needed to
+            start the game after it starts. Defaults to False.
+        tokens: Optional boolean passed to translate(). Defaults to False.
+    Returns:
+        Tuple of script, output, the float seconds taken, the dictionary
+        cache entry for the new page and the tuple of string sections
+        generated.
+    """
+    start = time.perf_counter()
+    parent = os.path.dirname(output)
+    assets = discover_assets(os.path.dirname(script))
+    keys = page_keys(script, assets, inline, hashed, lazy, tokens)
+    if entry is None:
+        entry = {'keys': {}, 'sections': {}, 'output': None, 'assets': {}}
+    urls = None
+    copied = entry['assets']
+    if not all(os.path.isfile(os.path.join(parent, *url.split('/')))
+               for url in copied.values()):
+        # Copy the missing assets again with the same hashed filenames
+        urls = asset_urls(assets, inline, parent if hashed else None)
+        copied = _copied_assets(urls)
+    if ((entry['keys'] == keys) and
+        (entry['output'] is not None) and
+        (entry['output'] == _output_stat(output))):
+        entry = dict(entry, assets=copied)
+        return (script, output, time.perf_counter() - start, entry, ())
+
+    sections = {}
+    generated = []
+    for section in PAGE_SECTIONS:
+        if ((entry['keys'].get(section) == keys[section]) and
+            (section in entry['sections'])):
+            sections[section] = entry['sections'][section]
+        else:
+            if (urls is None) and (section != 'code'):
+                urls = asset_urls(assets, inline, parent if hashed else None)
+                copied = _copied_assets(urls)
+            with io.StringIO() as f:
+                print_section(script, section, f, assets, urls, lazy,
+                              tokens)
+                sections[section] = f.getvalue()
+            generated.append(section)
+
+    if len(parent) > 0:
+        os.makedirs(parent, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        for section in PAGE_SECTIONS:
+            f.write(sections[section])
+    entry = {'keys': keys, 'sections': sections,
+             'output': _output_stat(output), 'assets': copied}
+    return (script, output, time.perf_counter() - start, entry,
+            tuple(generated))
+
+def build(scripts, root, directory, jobs=None, cache=None, inline=None,
+          hashed=False, lazy=False, tokens=False):
+    """Write the HTML pages for scripts to directory using a process pool.
+
+    Args:
+        scripts: Iterable of string paths to the Pygame Zero scripts.
+        root: String path to the root of the scripts.
+        directory: String path to the output directory.
+        jobs: Optional integer number of worker processes.
+            Defaults to None which uses the number of processors.
+            1 builds the pages in this process without a pool.
+        cache: Optional BuildCache to skip the pages that did not change.
+            Defaults to None which builds every page from scratch.
+        inline: Optional integer size in bytes passed to asset_urls().
+            Defaults to None which inlines nothing.
+        hashed: Optional boolean whether to copy the assets to content hashed
+            filenames next to each page and write a manifest mapping their
+            paths to the hashed paths to MANIFEST_FILENAME in directory.
+            Defaults to False.
+        lazy: Optional boolean whether to load the assets not needed to
+            start each game after it starts. Defaults to False.
+        tokens: Optional boolean passed to translate(). Defaults to False.
+    Yields:
+        Tuple of script, output, the float seconds taken and the tuple of
+        string sections generated as each page is finished. Unchanged pages
+        have no sections generated.
+    """
+    tasks = []
+    for s in scripts:
+        output = page_path(s, root, directory)
+        entry = None
+        if cache is not None:
+            entry = cache.get(os.path.relpath(output, directory))
+        tasks.append((s, output, entry, inline, hashed, lazy, tokens))
+
+    manifest = {}
+    def finish(result):
+        script, output, seconds, entry, generated = result
+        if cache is not None:
+            cache.put(os.path.relpath(output, directory), entry)
+        page = os.path.dirname(os.path.relpath(output, directory))
+        for path, url in entry['assets'].items():
+            # Paths in the manifest are relative to directory
+            manifest[posixpath.join(page.replace(os.sep, '/'), path)] = (
+                posixpath.join(page.replace(os.sep, '/'), url))
+        return (script, output, seconds, generated)
+
+    try:
+        if jobs == 1:
+            for task in tasks:
+                yield finish(build_page(*task))
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            futures = [executor.submit(build_page, *task) for task in tasks]
+            for future in concurrent.futures.as_completed(futures):
+                yield finish(future.result())
+    finally:
+        if cache is not None:
+            cache.save()
+        if hashed:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, MANIFEST_FILENAME), 'w',
+                      encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+
+WATCH_INTERVAL = 0.05
+"""Float seconds between checks for changes in watch mode."""
+
+RELOAD_SCRIPT = """<script>
+new EventSource('/events').addEventListener('message', (event) => {{
+  if (event.data !== '{version}') {{
+    window.location.reload();
+  }}
+}});
+</script>
+"""
+"""String script reloading a page served by watch() when it changes."""
+
+class PageWatcher:
+
+    """Keep the HTML page for a Pygame Zero script up to date in memory.
+
+    inotify is not in the standard library, so poll() compares the
+    modification time and size of the script, the assets and the JavaScript
+    ports next to the script. Only the sections of the page whose inputs
+    changed are generated again and only the ports that changed are checked
+    again.
+    """
+
+    def __init__(self, path, inline=None, lazy=False, check=None,
+                 tokens=False):
+        """Initialize the watcher and generate the page.
+
+        Args:
+            path: String path to the Pygame Zero script.
+            inline: Optional integer size in bytes passed to asset_urls().
+                Defaults to None which inlines nothing.
+            lazy: Optional boolean whether to load the assets not needed to
+                start the game after it starts. Defaults to False.
+            check: Optional module with check_html() and check_file() like
+                portlint to check the page and the ports that change.
+                Defaults to None which checks nothing.
+            tokens: Optional boolean passed to translate().
+                Defaults to False.
+        """
+        self.path = path
+        """String path to the Pygame Zero script."""
+
+        self.inline = inline
+        """Integer size in bytes of the assets to inline or None."""
+
+        self.lazy = lazy
+        """Boolean whether to load the assets not needed at the start later."""
+
+        self.check = check
+        """Module to check the page and ports with or None."""
+
+        self.tokens = tokens
+        """Boolean whether to translate the code with translate_tokens()."""
+
+        self.keys = {}
+        """Dictionary mapping the string sections to their page_keys()."""
+
+        self.sections = {}
+        """Dictionary mapping the string sections to their HTML."""
+
+        self.problems = {}
+        """Dictionary mapping the string paths of the page and the ports to
+        their lists of problems."""
+
+        self.ports = None
+        """Dictionary mapping the string paths of the ports to their
+        modification times and sizes or None before the first poll()."""
+
+        self.stat = None
+        """List of the modification time and size of the script or None."""
+
+        self.fingerprints = None
+        """List of the fingerprint_assets() of each asset directory or None."""
+
+        self.version = 0
+        """Integer incremented whenever the page or a port changes."""
+
+        self.condition = threading.Condition()
+        """threading.Condition notified when version changes."""
+
+        self.poll()
+
+    def poll(self):
+        """Generate the sections and check the ports that changed.
+
+        Returns:
+            Tuple of the string sections generated and the string paths of
+            the ports checked.
+        """
+        directory = os.path.dirname(self.path)
+        try:
+            script = _output_stat(self.path)
+            assets = discover_assets(directory)
+            fingerprints = [fingerprint_assets(assets[d])
+                            for d in ASSET_DIRECTORIES]
+            ports = {}
+            with os.scandir(directory or os.curdir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(('.html', '.js')):
+                        stat = entry.stat()
+                        ports[entry.path] = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            # A file may be in the middle of being saved so try again later
+            return ()
+        if script is None:
+            return ()
+
+        changed = []
+        if (script != self.stat) or (fingerprints != self.fingerprints):
+            keys = page_keys(self.path, assets, self.inline, False,
+                             self.lazy, self.tokens)
+            urls = None
+            for section in PAGE_SECTIONS:
+                if keys[section] == self.keys.get(section):
+                    continue
+                if (urls is None) and (section != 'code'):
+                    urls = asset_urls(assets, self.inline)
+                with io.StringIO() as f:
+                    print_section(self.path, section, f, assets, urls,
+                                  self.lazy, self.tokens)
+                    self.sections[section] = f.getvalue()
+                changed.append(section)
+            self.keys = keys
+            self.stat = script
+            self.fingerprints = fingerprints
+            if (len(changed) > 0) and (self.check is not None):
+                self.problems[self.path] = self.check.check_html(
+                    ''.join(self.sections[s] for s in PAGE_SECTIONS))
+
+        if self.ports is not None:
+            for path, port in sorted(ports.items()):
+                if port != self.ports.get(path):
+                    if self.check is not None:
+                        self.problems[path] = self.check.check_file(path)[1]
+                    changed.append(path)
+        self.ports = ports
+
+        if len(changed) > 0:
+            with self.condition:
+                self.version += 1
+                self.condition.notify_all()
+        return tuple(changed)
+
+    def page(self):
+        """Return the string HTML page reloading itself when it changes."""
+        page = ''.join(self.sections[s] for s in PAGE_SECTIONS)
+        index = page.rfind('</body>')
+        return (page[:index] + RELOAD_SCRIPT.format(version=self.version) +
+                page[index:])
+
+    def wait(self, version, timeout=None):
+        """Wait until the integer version changes or timeout seconds pass.
+
+        Returns:
+            Integer current version.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class _WatchHandler(http.server.SimpleHTTPRequestHandler):
+
+    """Serve the page of a PageWatcher and the files next to its script."""
+
+    def __init__(self, *args, watcher=None, **kwargs):
+        self.watcher = watcher
+        """PageWatcher of the page to serve."""
+
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        """Serve the page, its change events or a file."""
+        path = urllib.parse.urlsplit(self.path).path
+        name, _ = os.path.splitext(os.path.basename(self.watcher.path))
+        if path in ('/', '/' + name + PAGE_EXTENSION):
+            body = self.watcher.page().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == '/events':
+            self.send_events()
+        else:
+            super().do_GET()
+
+    def send_events(self):
+        """Send the version of the page as server-sent events."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        version = None
+        try:
+            while True:
+                current = self.watcher.wait(version, 15)
+                if current == version:
+                    # Keep the connection open
+                    self.wfile.write(b': keep-alive\n\n')
                 else:
-                    print(cleaned.replace('self.', 'this.'))
+                    self.wfile.write('data: {}\n\n'.format(current).encode())
+                    version = current
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
 
-        last_indent = indent
+    def translate_path(self, path):
+        """Fall back to the JavaScript files next to this module."""
+        result = super().translate_path(path)
+        if (not os.path.exists(result)) and result.endswith('.js'):
+            fallback = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    os.path.basename(result))
+            if os.path.isfile(fallback):
+                return fallback
+        return result
 
-    # Close outstanding blocks
-    while 0 < last_indent:
-        last_indent -= 1
-        print(('  ' * last_indent) + '}')
+    def log_message(self, format, *args):
+        """Do not log every request."""
+
+def serve(watcher, port=0):
+    """Return an HTTP server for watcher serving in a daemon thread.
+
+    Args:
+        watcher: PageWatcher of the page to serve.
+        port: Optional integer port to listen on on localhost.
+            Defaults to 0 which picks a free port.
+    Returns:
+        http.server.ThreadingHTTPServer. Call its shutdown() to stop it.
+    """
+    handler = functools.partial(
+        _WatchHandler, watcher=watcher,
+        directory=os.path.dirname(os.path.abspath(watcher.path)))
+    server = http.server.ThreadingHTTPServer(('localhost', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def watch(path, port=8000, inline=None, lazy=False, check=None,
+          tokens=False):
+    """Serve the page for path and reload it on changes until interrupted.
+
+    Args:
+        path: String path to the Pygame Zero script.
+        port: Optional integer port to listen on on localhost.
+            Defaults to 8000.
+        inline: Optional integer size in bytes passed to asset_urls().
+            Defaults to None which inlines nothing.
+        lazy: Optional boolean whether to load the assets not needed to
+            start the game after it starts. Defaults to False.
+        check: Optional module like portlint passed to PageWatcher.
+            Defaults to None which checks nothing.
+        tokens: Optional boolean passed to translate(). Defaults to False.
+    """
+    watcher = PageWatcher(path, inline, lazy, check, tokens)
+    server = serve(watcher, port)
+    print('Serving {} at http://localhost:{}/'.format(
+        path, server.server_address[1]))
+    changed = [path]
+    try:
+        while True:
+            for p in changed:
+                for line, column, rule, message in watcher.problems.get(p,
+                                                                        []):
+                    print('{}:{}:{}: {}'.format(p, line, column, message))
+            time.sleep(WATCH_INTERVAL)
+            start = time.perf_counter()
+            changed = watcher.poll()
+            if len(changed) > 0:
+                print('{:8.3f}s  {}'.format(time.perf_counter() - start,
+                                           ', '.join(changed)))
+                if any(s in PAGE_SECTIONS for s in changed):
+                    changed = (path,) + changed
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+TRACE_PERCENTILES = ['p50', 'p95', 'p99']
+"""List of the string percentiles compare_traces() compares."""
+
+def compare_traces(old, new):
+    """Return lines comparing the statistics of 2 profiler traces.
+
+    Args:
+        old: Dictionary of the trace from profiler.trace() in jsgame0.js
+            of the baseline build.
+        new: Dictionary of the trace of the build to compare.
+    Returns:
+        List of string lines with the old and new milliseconds of each
+        percentile of each phase, the whole frame and the interval between
+        frames, followed by the old and new counts of dropped frames.
+    """
+    lines = ['{:10} {:>4} {:>9} {:>9} {:>8}'.format(
+        '', '', 'old ms', 'new ms', 'change')]
+    old_stats = old.get('stats', {})
+    new_stats = new.get('stats', {})
+    names = [(phase, ('phases', phase)) for phase in old.get('phases', [])
+             if phase in new.get('phases', [])]
+    names.extend([('work', ('work',)), ('interval', ('interval',))])
+    for name, keys in names:
+        before = old_stats
+        after = new_stats
+        for key in keys:
+            before = before.get(key, {})
+            after = after.get(key, {})
+        for percentile in TRACE_PERCENTILES:
+            a = before.get(percentile, 0)
+            b = after.get(percentile, 0)
+            if a > 0:
+                change = '{:+7.1f}%'.format(100 * (b - a) / a)
+            else:
+                change = ''
+            lines.append('{:10} {:>4} {:9.3f} {:9.3f} {:>8}'.format(
+                name, percentile, a, b, change))
+    for name in ['frames', 'dropped', 'gcSuspect']:
+        lines.append('{:15} {:9d} {:9d}'.format(
+            name, old_stats.get(name, 0), new_stats.get(name, 0)))
+    return lines
 
 
 class _UnitTest(unittest.TestCase):
@@ -328,61 +1970,777 @@ class _UnitTest(unittest.TestCase):
                          SOUND_EXTENSION_SET, ('.html', '.rst'), ['.rst']]:
             self.assertEqual(list_directory('.', accepted), [])
 
+    def test_is_accepted(self):
+        """Test if a filename is valid with an accepted extension."""
+        for value in ['alien.png', 'alien.PNG', 'alien.txt', 'alien']:
+            self.assertTrue(is_accepted(value))
+        for value in ['Alien.png', '_alien.png', '.png', '']:
+            self.assertFalse(is_accepted(value))
+            self.assertFalse(is_accepted(value, IMAGE_EXTENSION_SET))
+        for value in ['alien.png', 'alien.PNG', 'alien.png ']:
+            self.assertTrue(is_accepted(value, IMAGE_EXTENSION_SET))
+        for value in ['alien.txt', 'alien', 'alien.png.txt']:
+            self.assertFalse(is_accepted(value, IMAGE_EXTENSION_SET))
+
+    def test_discover_assets(self):
+        """Test discovering the assets of a Pygame Zero script."""
+        for value in ['', 'foobar']:
+            self.assertEqual(discover_assets(value),
+                             {d: [] for d in ASSET_DIRECTORIES})
+
+        with tempfile.TemporaryDirectory() as root:
+            for name in ['alien.py', 'fonts/eunomia_regular.ttf',
+                         'images/alien_hurt.png', 'images/alien.png',
+                         'images/Alien.png', 'images/notes.txt',
+                         'images/frames.png/alien.png',
+                         'sounds/eep.wav', 'music/theme.ogg',
+                         'music/eep.png', 'videos/intro.mp4']:
+                path = os.path.join(root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(b'data')
+            assets = discover_assets(root)
+            self.assertEqual(list(assets), list(ASSET_DIRECTORIES))
+            self.assertEqual(
+                {d: [e.name for e in assets[d]] for d in assets},
+                {'fonts': ['eunomia_regular.ttf'],
+                 'images': ['alien.png', 'alien_hurt.png'],
+                 'sounds': ['eep.wav'],
+                 'music': ['theme.ogg']})
+            for d, entries in assets.items():
+                self.assertEqual(
+                    [e.name for e in entries],
+                    list_directory(os.path.join(root, d),
+                                   ASSET_DIRECTORIES[d]))
+                for e in entries:
+                    self.assertEqual(e.path, os.path.join(root, d, e.name))
+            self.assertEqual(
+                list_resources(root),
+                (['eunomia_regular.ttf'], ['alien.png', 'alien_hurt.png'],
+                 ['eep.wav'], ['theme.ogg']))
+
+            # Files that are not accepted do not change the fingerprints
+            keys = page_keys(os.path.join(root, 'alien.py'))
+            with open(os.path.join(root, 'images', 'todo.txt'), 'wb') as f:
+                f.write(b'data')
+            self.assertEqual(page_keys(os.path.join(root, 'alien.py')), keys)
+            changed = page_keys(os.path.join(root, 'alien.py'), tokens=True)
+            self.assertNotEqual(changed['code'], keys['code'])
+            self.assertEqual(changed['head'], keys['head'])
+
+    def test_print_load(self):
+        """Test printing the resource loading sections to a stream."""
+        for function, args in [
+            (print_font_load, ()), (print_image_load, ()),
+            (print_audio_load, ('musicLoader', 'music'))]:
+            with io.StringIO() as f:
+                function([], *args, file=f)
+                self.assertEqual(f.getvalue(), '')
+
+        with io.StringIO() as f:
+            print_font_load(['eunomia_regular.ttf'], f)
+            self.assertEqual(f.getvalue(), """@font-face {
+  font-family: 'eunomia_regular';
+  src: url('fonts/eunomia_regular.ttf') format('truetype');
+  font-weight: normal;
+  font-style: normal;
+}
+""")
+        with io.StringIO() as f:
+            print_image_load(['alien.png', 'alien_hurt.png'], f)
+            self.assertEqual(f.getvalue(), """\
+<section id="imageLoader" class="hidden">
+  <img class="hidden" src="images/alien.png" alt="alien" data-name="alien">
+  <img class="hidden" src="images/alien_hurt.png" alt="alien_hurt" \
+data-name="alien_hurt">
+</section>
+""")
+        with io.StringIO() as f:
+            print_audio_load(['theme.ogg'], 'musicLoader', 'music', f)
+            self.assertEqual(f.getvalue(), """\
+<section id="musicLoader" class="hidden">
+  <audio class="hidden" controls preload="auto" src="music/theme.ogg" \
+data-name="theme">Your browser does not support the audio element.</audio>
+</section>
+""")
+
+    def test_translate_tokens(self):
+        """Test translating Python code to JavaScript with tokenize."""
+        self.assertEqual(translate_tokens([]), [])
+        self.assertEqual(''.join(translate_tokens("""\
+import random  # for the enemies
+x = 'self.x # not a comment'
+y = f"{self.score:03d} {{#}}"
+shots = [1,
+         2]
+class Game(Actor):
+    \"\"\"The game.\"\"\"
+    def __init__(self, speed: int = 2) -> None:
+        self.speed = speed // 2
+    # End of Game
+
+def update():
+    for i in range(len(shots)):
+        if not shots[i] and x is not None:
+            pass
+        elif x != y: print(x)
+        else:
+            shots.sort(key=lambda s: s * 2)""".splitlines())), """\
+// import random  // for the enemies
+x = 'self.x # not a comment';
+y = `${this.score} {#}`;
+shots = [1,
+    2];
+class Game extends Actor {
+  /*The game.*/
+  constructor(speed = 2) {
+    this.speed = speed / 2;
+  }
+  // End of Game
+}
+
+function update() {
+  for (let i = 0; i < len(shots); i++) {
+    if (!shots[i] && x !== null) {
+    }
+    else if (x !== y) { console.log(x); }
+    else {
+      shots.sort(key=(s) => s * 2);
+    }
+  }
+}
+""")
+        self.assertRaises((tokenize.TokenError, SyntaxError), translate_tokens,
+                          ['def f():', '    x = 1', '  y = 2'])
+
+    def test_print_javascript(self):
+        """Test printing JavaScript with and without valid Python."""
+        with io.StringIO() as f:
+            print_javascript(['def draw():', '    screen.clear()'], f)
+            self.assertTrue(f.getvalue().endswith("""\
+ */
+function draw():
+{
+  screen.clear()
+}
+"""))
+        with io.StringIO() as f:
+            print_javascript(['def draw():', '    screen.clear()'], f, True)
+            self.assertTrue(f.getvalue().endswith("""\
+ */
+function draw() {
+  screen.clear();
+}
+"""))
+        with io.StringIO() as f:
+            # Fall back to translate_lines() if tokenize fails
+            print_javascript(['def draw(', '    self.x'], f, True)
+            self.assertTrue(f.getvalue().endswith("""\
+ */
+function draw(
+{
+  this.x
+}
+"""))
+        with io.StringIO() as f:
+            # Blank lines go inside the block of the next line
+            print_javascript(['if x:', '        y = 1', '', '    z = 2', '',
+                              'w = 3', ''], f)
+            self.assertTrue(f.getvalue().endswith("""\
+ */
+if x:
+{
+  y = 1
+}
+{
+
+  z = 2
+}
+
+w = 3
+
+"""))
+
+    def test_benchmark(self):
+        """Test comparing translate_tokens() with translate_lines()."""
+        results = benchmark(100, 1)
+        self.assertEqual(sorted(results),
+                         ['translate_lines', 'translate_tokens'])
+        self.assertEqual(check_benchmark({'translate_lines': 0.1,
+                                          'translate_tokens': 3.5}),
+                         ['translate_tokens() took 3.500s, 35.0 times the \
+0.100s of translate_lines(), so it stays opt-in'])
+        self.assertEqual(check_benchmark({'translate_lines': 0.1,
+                                          'translate_tokens': 0.12}), [])
+
+    def test_translate_lines_scaling(self):
+        """Test translate_lines() takes linear time on 50k lines."""
+        def best(count):
+            lines = (BENCHMARK_SCRIPT *
+                     (count // len(BENCHMARK_SCRIPT) + 1))[:count]
+            seconds = []
+            for _ in range(3):
+                start = time.perf_counter()
+                translate_lines(lines)
+                seconds.append(time.perf_counter() - start)
+            return min(seconds)
+
+        small = best(5000)
+        large = best(50000)
+        # 10 times the lines should take about 10 times as long
+        self.assertLess(large, 30 * max(small, 1e-4))
+
+    def test_render_page(self):
+        """Test streaming the HTML page to any file-like object."""
+        with tempfile.TemporaryDirectory() as root:
+            script = os.path.join(root, 'alien.py')
+            with open(script, 'w', encoding='utf-8') as f:
+                f.write('def draw():\n    screen.clear()\n')
+            with io.StringIO() as f:
+                render_page(script, f)
+                page = f.getvalue()
+            self.assertTrue(page.startswith('<!DOCTYPE html>'))
+            self.assertIn('<title>alien</title>', page)
+            self.assertIn('function draw():', page)
+            self.assertTrue(page.endswith('</html>\n'))
+
+            sections = []
+            for section in PAGE_SECTIONS:
+                with io.StringIO() as f:
+                    print_section(script, section, f)
+                    sections.append(f.getvalue())
+            self.assertEqual(''.join(sections), page)
+            with io.StringIO() as f:
+                self.assertRaises(ValueError, print_section, script,
+                                  'foobar', f)
+
+            compressed = os.path.join(root, 'alien.html.gz')
+            with gzip.open(compressed, 'wt', encoding='utf-8') as f:
+                render_page(script, f)
+            with gzip.open(compressed, 'rt', encoding='utf-8') as f:
+                self.assertEqual(f.read(), page)
+
+    def test_asset_urls(self):
+        """Test inlining small assets as data URIs."""
+        with tempfile.TemporaryDirectory() as root:
+            for name, data in [('alien.py', b'WIDTH = 500\n'),
+                               ('fonts/eunomia_regular.ttf', b'font'),
+                               ('images/alien.png', b'small'),
+                               ('images/alien_hurt.png', b'larger image'),
+                               ('sounds/eep.wav', b'sound')]:
+                path = os.path.join(root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(data)
+            self.assertEqual(
+                data_uri(os.path.join(root, 'images', 'alien.png')),
+                'data:image/png;base64,c21hbGw=')
+            path = os.path.join(root, 'notes.foobar')
+            with open(path, 'wb') as f:
+                f.write(b'small')
+            self.assertEqual(data_uri(path),
+                             'data:application/octet-stream;base64,c21hbGw=')
+
+            assets = discover_assets(root)
+            self.assertEqual(asset_urls(assets), {})
+            self.assertEqual(asset_urls(assets, 0), {})
+            self.assertEqual(sorted(asset_urls(assets, 5)),
+                             ['fonts/eunomia_regular.ttf', 'images/alien.png',
+                              'sounds/eep.wav'])
+            urls = asset_urls(assets, 100)
+            self.assertEqual(len(urls), 4)
+            for path, url in urls.items():
+                self.assertTrue(url.startswith('data:'))
+
+            with io.StringIO() as f:
+                render_page(os.path.join(root, 'alien.py'), f, 5)
+                page = f.getvalue()
+            self.assertIn("src: url('data:", page)
+            self.assertIn('src="data:image/png;base64,c21hbGw=" alt="alien"',
+                          page)
+            self.assertIn('src="images/alien_hurt.png"', page)
+            self.assertIn('src="data:audio/', page)
+
+    def test_startup_code(self):
+        """Test finding the code that runs at the start."""
+        self.assertEqual(startup_code([]), [])
+        lines = ['import random', '', 'alien = Actor("alien")',
+                 '@decorator', 'def draw():', '    alien.draw()', '',
+                 'class Game:', '    image = "boss"',
+                 'if WIDTH > 100:', '    sounds.intro.play()']
+        self.assertEqual(startup_code(lines),
+                         ['import random', '', 'alien = Actor("alien")',
+                          'if WIDTH > 100:', '    sounds.intro.play()'])
+        lines = ['alien = None', 'def reset():', '    global alien', '',
+                 '    alien = Actor("alien")', 'def draw():',
+                 '    alien.draw()']
+        self.assertEqual(startup_code(lines),
+                         ['alien = None', '    global alien', '',
+                          '    alien = Actor("alien")'])
+        self.assertEqual(startup_code(lines[:5]), lines[:1] + lines[2:5])
+        # Module level functions and classes called at the start are followed
+        lines = ['def make_bricks():', '    for i in range(10):',
+                 '        bricks.append(Brick(i))', 'class Brick(Actor):',
+                 '    def __init__(self, i):', '        add(i)',
+                 'def add(i):', '    sounds.ping.play()',
+                 'def draw():', '    screen.clear()',
+                 'def reset():', '    make_bricks()', '    make_bricks()']
+        self.assertEqual(startup_code(lines),
+                         ['    make_bricks()', '    make_bricks()',
+                          '    for i in range(10):',
+                          '        bricks.append(Brick(i))',
+                          '    def __init__(self, i):', '        add(i)',
+                          '    sounds.ping.play()'])
+
+    def test_lazy(self):
+        """Test deferring the assets not needed to start the game."""
+        with tempfile.TemporaryDirectory() as root:
+            for name in ['images/alien.png', 'images/alien_hurt.png',
+                         'sounds/eep.wav', 'music/theme.ogg',
+                         'music/boss.ogg']:
+                path = os.path.join(root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(b'data')
+            script = os.path.join(root, 'alien.py')
+            with open(script, 'w', encoding='utf-8') as f:
+                f.write("""def make_alien():
+    return Actor('alien')
+
+def reset():
+    alien = make_alien()
+    music.play('theme')
+
+def update():
+    sounds.eep.play()
+    alien.image = 'alien_hurt'
+""")
+            assets = discover_assets(root)
+            self.assertEqual(deferred_assets(read_script(script), assets),
+                             {'alien_hurt.png', 'eep.wav', 'boss.ogg'})
+
+            # Top level code runs at the start even if there is a reset()
+            other = os.path.join(root, 'hurt.py')
+            with open(other, 'w', encoding='utf-8') as f:
+                f.write("""player = Actor('alien_hurt')
+
+def reset():
+    music.play('theme')
+""")
+            self.assertEqual(deferred_assets(read_script(other), assets),
+                             {'alien.png', 'eep.wav', 'boss.ogg'})
+
+            with io.StringIO() as f:
+                render_page(script, f, lazy=True)
+                page = f.getvalue()
+            self.assertIn('<img class="hidden" src="images/alien.png"', page)
+            self.assertIn('<img class="hidden" \
+data-src="images/alien_hurt.png" alt="alien_hurt" data-name="alien_hurt" \
+data-defer>', page)
+            self.assertIn('preload="auto" src="music/theme.ogg"', page)
+            self.assertIn('preload="none" data-defer src="music/boss.ogg"',
+                          page)
+            self.assertIn('preload="none" data-defer src="sounds/eep.wav"',
+                          page)
+            with io.StringIO() as f:
+                render_page(script, f)
+                self.assertNotIn('data-defer', f.getvalue())
+
+    def test_find_scripts(self):
+        """Test finding the Pygame Zero scripts in a directory or manifest."""
+        for value in ['', 'foobar']:
+            self.assertEqual(find_scripts(value), [])
+
+        with tempfile.TemporaryDirectory() as root:
+            for name in ['alien.py', 'game/pong.py', 'game/images/notes.txt',
+                         '.hidden/secret.py', '__pycache__/alien.py']:
+                path = os.path.join(root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write('WIDTH = 500\n')
+            expected = [os.path.join(root, 'alien.py'),
+                        os.path.join(root, 'game', 'pong.py')]
+            self.assertEqual(find_scripts(root), expected)
+
+            manifest = os.path.join(root, 'manifest.txt')
+            with open(manifest, 'w', encoding='utf-8') as f:
+                f.write('# Comment\n\ngame/pong.py\nalien.py\n')
+            self.assertEqual(find_scripts(manifest), expected)
+
+    def test_page_path(self):
+        """Test the path to the HTML page of a Pygame Zero script."""
+        for script, expected in [
+            ('alien.py', 'alien.html'),
+            (os.path.join('game', 'pong.py'),
+             os.path.join('game', 'pong.html')),
+            (os.path.join(os.pardir, 'pong.py'), 'pong.html')]:
+            self.assertEqual(page_path(script, '', 'site'),
+                             os.path.join('site', expected))
+
+    def test_build(self):
+        """Test building the HTML pages for Pygame Zero scripts."""
+        with tempfile.TemporaryDirectory() as root:
+            scripts = []
+            for name in ['alien.py', os.path.join('game', 'pong.py')]:
+                path = os.path.join(root, 'src', name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write('def draw():\n    screen.clear()\n')
+                scripts.append(path)
+            directory = os.path.join(root, 'site')
+            for jobs in [1, 2]:
+                results = sorted(build(scripts, os.path.join(root, 'src'),
+                                       directory, jobs))
+                self.assertEqual(len(results), len(scripts))
+                for (script, output, seconds, generated), expected in zip(
+                    results, scripts):
+                    self.assertEqual(script, expected)
+                    self.assertGreaterEqual(seconds, 0)
+                    self.assertEqual(generated, PAGE_SECTIONS)
+                    with open(output, 'r', encoding='utf-8') as f:
+                        page = f.read()
+                    self.assertTrue(page.startswith('<!DOCTYPE html>'))
+                    self.assertIn('function draw():', page)
+                    self.assertTrue(page.endswith('</html>\n'))
+
+    def test_build_cache(self):
+        """Test skipping the pages that did not change with a BuildCache."""
+        with tempfile.TemporaryDirectory() as root:
+            script = os.path.join(root, 'src', 'alien.py')
+            os.makedirs(os.path.join(root, 'src', 'images'))
+            with open(script, 'w', encoding='utf-8') as f:
+                f.write('def draw():\n    screen.clear()\n')
+            directory = os.path.join(root, 'site')
+            path = os.path.join(directory, CACHE_FILENAME)
+
+            def run():
+                cache = BuildCache(path)
+                return [r[3] for r in build([script], os.path.dirname(script),
+                                            directory, 1, cache)]
+
+            self.assertEqual(run(), [PAGE_SECTIONS])
+            self.assertTrue(os.path.isfile(path))
+            with open(os.path.join(directory, 'alien.html'), 'r',
+                      encoding='utf-8') as f:
+                first = f.read()
+            self.assertEqual(run(), [()])
+
+            with open(os.path.join(root, 'src', 'images', 'alien.png'),
+                      'wb') as f:
+                f.write(b'PNG')
+            self.assertEqual(run(), [('resources',)])
+            with open(os.path.join(directory, 'alien.html'), 'r',
+                      encoding='utf-8') as f:
+                second = f.read()
+            self.assertNotIn('images/alien.png', first)
+            self.assertIn('images/alien.png', second)
+
+            with open(script, 'a', encoding='utf-8') as f:
+                f.write('# Comment\n')
+            self.assertEqual(run(), [('code',)])
+
+            # A missing page is written again from the cached sections
+            os.remove(os.path.join(directory, 'alien.html'))
+            self.assertEqual(run(), [()])
+            self.assertTrue(os.path.isfile(os.path.join(directory,
+                                                        'alien.html')))
+
+    def test_build_hashed(self):
+        """Test copying assets to content hashed filenames."""
+        with tempfile.TemporaryDirectory() as root:
+            script = os.path.join(root, 'src', 'alien.py')
+            image = os.path.join(root, 'src', 'images', 'alien.png')
+            os.makedirs(os.path.dirname(image))
+            with open(script, 'w', encoding='utf-8') as f:
+                f.write('def draw():\n    alien.draw()\n')
+            with open(image, 'wb') as f:
+                f.write(b'small')
+            filename = hashed_filename(image)
+            self.assertRegex(filename, r'^alien\.[0-9a-f]{{{}}}\.png$'.format(
+                HASH_LENGTH))
+            self.assertEqual(hashed_filename(image), filename)
+
+            directory = os.path.join(root, 'site')
+            for cache in [None, BuildCache(os.path.join(root, 'cache.json'))]:
+                list(build([script], os.path.dirname(script), directory, 1,
+                           cache, hashed=True))
+                self.assertTrue(os.path.isfile(
+                    os.path.join(directory, 'images', filename)))
+                with open(os.path.join(directory, MANIFEST_FILENAME), 'r',
+                          encoding='utf-8') as f:
+                    self.assertEqual(json.load(f), {
+                        'images/alien.png': 'images/' + filename})
+                with open(os.path.join(directory, 'alien.html'), 'r',
+                          encoding='utf-8') as f:
+                    page = f.read()
+                # The data-name stays the logical name of the image
+                self.assertIn('src="images/{}" alt="alien" data-name="alien"'
+                              .format(filename), page)
+
+            # Missing copies are restored even if the page is unchanged
+            os.remove(os.path.join(directory, 'images', filename))
+            cache = BuildCache(os.path.join(root, 'cache.json'))
+            self.assertEqual(
+                [r[3] for r in build([script], os.path.dirname(script),
+                                     directory, 1, cache, hashed=True)],
+                [()])
+            self.assertTrue(os.path.isfile(
+                os.path.join(directory, 'images', filename)))
+
+            # Editing an asset changes its hashed filename
+            with open(image, 'ab') as f:
+                f.write(b'edit')
+            self.assertNotEqual(hashed_filename(image), filename)
+            list(build([script], os.path.dirname(script), directory, 1,
+                       cache, hashed=True))
+            with open(os.path.join(directory, MANIFEST_FILENAME), 'r',
+                      encoding='utf-8') as f:
+                self.assertEqual(json.load(f), {
+                    'images/alien.png': 'images/' + hashed_filename(image)})
+
+            # A missing copy of an edited asset lists its new hashed filename
+            os.remove(os.path.join(directory, 'images',
+                                   hashed_filename(image)))
+            with open(image, 'ab') as f:
+                f.write(b'again')
+            list(build([script], os.path.dirname(script), directory, 1,
+                       cache, hashed=True))
+            self.assertEqual(cache.get('alien.html')['assets'], {
+                'images/alien.png': 'images/' + hashed_filename(image)})
+            with open(os.path.join(directory, MANIFEST_FILENAME), 'r',
+                      encoding='utf-8') as f:
+                self.assertEqual(json.load(f), {
+                    'images/alien.png': 'images/' + hashed_filename(image)})
+
+    def test_BuildCache(self):
+        """Test the least recently used eviction of the BuildCache."""
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, CACHE_FILENAME)
+            cache = BuildCache(path, 10)
+            for key in ['a', 'b', 'c']:
+                cache.put(key, {'keys': {}, 'sections': {'code': key * 4},
+                                'output': None})
+            self.assertEqual(cache.get('a')['sections'], {'code': 'aaaa'})
+            self.assertIsNone(cache.get('foobar'))
+            cache.save()
+            self.assertEqual(list(cache.entries), ['c', 'a'])
+
+            cache = BuildCache(path, 10)
+            self.assertEqual(list(cache.entries), ['c', 'a'])
+            cache.clear()
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(BuildCache(path).entries, {})
+
+    def test_compare_traces(self):
+        """Test comparing the statistics of 2 profiler traces."""
+        def trace(scale, dropped):
+            summary = {'mean': scale, 'p50': scale, 'p95': 2 * scale,
+                       'p99': 4 * scale, 'max': 8 * scale}
+            return {'version': 1, 'phases': ['clock', 'draw'], 'frames': [],
+                    'stats': {'frames': 600, 'dropped': dropped,
+                              'gcSuspect': 0,
+                              'phases': {'clock': summary, 'draw': summary},
+                              'work': summary, 'interval': summary}}
+
+        lines = compare_traces(trace(1, 3), trace(1.5, 1))
+        self.assertEqual(len(lines), 1 + (4 * len(TRACE_PERCENTILES)) + 3)
+        self.assertEqual(lines[1].split(),
+                         ['clock', 'p50', '1.000', '1.500', '+50.0%'])
+        self.assertEqual(lines[-2].split(), ['dropped', '3', '1'])
+        self.assertEqual(compare_traces({}, {})[-1].split(),
+                         ['gcSuspect', '0', '0'])
+
+    def test_PageWatcher(self):
+        """Test generating the page again when the script or assets change."""
+        class Check:
+            def check_html(source):
+                return [(1, 1, 'html', 'page')]
+            def check_file(path):
+                return (path, [(1, 1, 'file', os.path.basename(path))])
+
+        with tempfile.TemporaryDirectory() as root:
+            script = os.path.join(root, 'alien.py')
+            with open(script, 'w', encoding='utf-8') as f:
+                f.write('def draw():\n    screen.clear()\n')
+            watcher = PageWatcher(script, check=Check, tokens=True)
+            self.assertEqual(set(watcher.sections), set(PAGE_SECTIONS))
+            self.assertEqual(watcher.version, 1)
+            self.assertEqual(watcher.problems,
+                             {script: [(1, 1, 'html', 'page')]})
+            self.assertEqual(watcher.poll(), ())
+            self.assertEqual(watcher.wait(1, 0), 1)
+
+            with open(script, 'w', encoding='utf-8') as f:
+                f.write('def draw():\n    screen.fill((0, 0, 0))\n')
+            self.assertEqual(watcher.poll(), ('code',))
+            self.assertIn('screen.fill((0, 0, 0));', watcher.page())
+
+            os.makedirs(os.path.join(root, 'images'))
+            with open(os.path.join(root, 'images', 'alien.png'), 'wb') as f:
+                f.write(b'data')
+            self.assertIn('resources', watcher.poll())
+            self.assertIn('src="images/alien.png"', watcher.page())
+
+            port = os.path.join(root, 'alien.js')
+            with open(port, 'w', encoding='utf-8') as f:
+                f.write('let a = 1;\n')
+            self.assertEqual(watcher.poll(), (port,))
+            self.assertEqual(watcher.problems[port],
+                             [(1, 1, 'file', 'alien.js')])
+            self.assertEqual(watcher.version, 4)
+
+            server = serve(watcher)
+            try:
+                url = 'http://localhost:{}/'.format(server.server_address[1])
+                with urllib.request.urlopen(url) as response:
+                    page = response.read().decode('utf-8')
+                self.assertIn("new EventSource('/events')", page)
+                self.assertIn('screen.fill((0, 0, 0));', page)
+                with urllib.request.urlopen(url + 'events') as response:
+                    self.assertEqual(response.readline(), b'data: 4\n')
+                with urllib.request.urlopen(url + 'jsgame0.js') as response:
+                    self.assertEqual(response.status, 200)
+            finally:
+                server.shutdown()
+                server.server_close()
+
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--benchmark', metavar='LINES', type=int, default=None,
+        help='time translating LINES lines of Python code to JavaScript. \
+Fails while the --tokens translator is slower than the default line \
+translator, which is why it stays opt-in')
+    parser.add_argument(
+        '-b', '--build', metavar='DIRECTORY',
+        help='write the HTML pages for every Pygame Zero script found in the \
+directory tree or manifest at path to DIRECTORY')
     parser.add_argument(
         '-c', '--code', action='store_true',
         help='only modify the Python code')
+    parser.add_argument(
+        '--compare-traces', nargs=2, metavar=('OLD', 'NEW'),
+        help='compare the JSON traces saved from profiler.trace() in \
+jsgame0.js for 2 builds of a game')
+    parser.add_argument(
+        '--clean', action='store_true',
+        help='discard the build cache before running --build')
+    parser.add_argument(
+        '--hash', action='store_true',
+        help='copy the assets next to each page built by --build with \
+content hashed filenames and write a manifest of them to {}'.format(
+    MANIFEST_FILENAME))
+    parser.add_argument(
+        '-i', '--inline', metavar='BYTES', type=int, default=None,
+        help='inline fonts, images, sounds and music of at most BYTES into \
+the page as data URIs')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes for --build. \
+Defaults to the number of processors')
     parser.add_argument(
         '-l', '--list', action='store_true',
         help='only list the resources found for the Pygame Zero script')
+    parser.add_argument(
+        '--lazy', action='store_true',
+        help='load the images, sounds and music not named in reset() or the \
+top level code after the game starts')
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='build every page from scratch without using a build cache')
+    parser.add_argument(
+        '-p', '--port', type=int, default=8000,
+        help='port for --watch to serve the page on. Defaults to 8000')
+    parser.add_argument(
+        '--tokens', action='store_true',
+        help='translate the Python code with the opt-in tokenize based \
+translator, which converts more of the syntax but is many times slower \
+than the default line translator')
+    parser.add_argument(
+        '-w', '--watch', action='store_true',
+        help='serve the page on localhost, generate it again when the script \
+or its assets change and reload it in the browser')
     parser.add_argument(
         'path', nargs='?', default='',
         help='path to the Pygame Zero script')
     args = parser.parse_args()
+    if args.hash and (args.build is None):
+        parser.error('--hash requires --build')
 
-    if os.path.isfile(args.path):
-        parent = os.path.dirname(args.path)
-        fonts = list_directory(os.path.join(parent, 'fonts'),
-                               FONT_EXTENSION_SET)
-        images = list_directory(os.path.join(parent, 'images'),
-                                IMAGE_EXTENSION_SET)
-        sounds = list_directory(os.path.join(parent, 'sounds'),
-                                SOUND_EXTENSION_SET)
-        music = list_directory(os.path.join(parent, 'music'),
-                               SOUND_EXTENSION_SET)
+    if args.compare_traces is not None:
+        traces = []
+        for path in args.compare_traces:
+            with open(path, 'r', encoding='utf-8') as f:
+                traces.append(json.load(f))
+        for line in compare_traces(*traces):
+            print(line)
+    elif args.benchmark is not None:
+        results = benchmark(args.benchmark)
+        for name, seconds in results.items():
+            print('{:8.3f}s  {} ({:.0f} lines/s)'.format(
+                seconds, name, args.benchmark / max(seconds, 1e-9)))
+        problems = check_benchmark(results)
+        if len(problems) > 0:
+            parser.exit(1, ''.join(p + '\n' for p in problems))
+    elif args.build is not None:
+        if args.path.endswith(SCRIPT_EXTENSION):
+            scripts = [args.path]
+        else:
+            scripts = find_scripts(args.path)
+        if os.path.isdir(args.path):
+            root = args.path
+        else:
+            root = os.path.dirname(args.path)
+
+        cache = None
+        if not args.no_cache:
+            cache = BuildCache(os.path.join(args.build, CACHE_FILENAME))
+            if args.clean:
+                cache.clear()
+
+        start = time.perf_counter()
+        total = 0
+        cached = 0
+        for script, output, seconds, generated in build(
+            scripts, root, args.build, args.jobs, cache, args.inline,
+            args.hash, args.lazy, args.tokens):
+            if len(generated) <= 0:
+                cached += 1
+            print('{:8.3f}s  {} -> {} ({})'.format(
+                seconds, script, output, ', '.join(generated) or 'cached'))
+            total += seconds
+        elapsed = time.perf_counter() - start
+        print('Built {} pages ({} cached) in {:.3f}s ({:.1f} pages/s) \
+with {} workers'.format(
+            len(scripts), cached, elapsed,
+            len(scripts) / max(elapsed, 1e-9), args.jobs or os.cpu_count()))
+        print('Speedup over one worker: {:.2f}x'.format(
+            total / max(elapsed, 1e-9)))
+    elif args.watch and os.path.isfile(args.path):
+        try:
+            import portlint
+        except ImportError:
+            # Watch without checking the ports
+            portlint = None
+        watch(args.path, args.port, args.inline, args.lazy, portlint,
+              args.tokens)
+    elif os.path.isfile(args.path):
         if args.list:
-            for header, filenames in [
-                ('Fonts:', fonts),
-                ('Images:', images),
-                ('Sounds:', sounds),
-                ('Music:', music)]:
+            for header, filenames in zip(
+                ['Fonts:', 'Images:', 'Sounds:', 'Music:'],
+                list_resources(os.path.dirname(args.path))):
                 print(header)
                 for f in filenames:
                     print('\t{}'.format(f))
             parser.exit()
 
-        name, _ = os.path.splitext(os.path.basename(args.path))
-        lines = []
-        with open(args.path, 'r', encoding='utf-8') as f:
-            for line in f:
-                clean = line.rstrip()
-                lines.append(clean)
         if args.code:
-            print_javascript(lines)
+            print_javascript(read_script(args.path), sys.stdout, args.tokens)
             parser.exit()
 
-        html_safe = '\n'.join([html.escape(line) for line in lines])
-        print(HTML_TO_FONT.format(title=name), end='')
-        print_font_load(fonts)
-        print(HTML_TO_RESOURCE, end='')
-        print_image_load(images)
-        print_audio_load(sounds, 'soundLoader', 'sounds')
-        print_audio_load(music, 'musicLoader', 'music')
-        print(HTML_WITH_CODE.format(title=name, code=html_safe), end='')
-        print_javascript(lines)
-        print(HTML_TO_END, end='')
+        render_page(args.path, sys.stdout, args.inline, args.lazy,
+                    args.tokens)
     else:
         suite = unittest.defaultTestLoader.loadTestsFromTestCase(_UnitTest)
         unittest.TextTestRunner(verbosity=2).run(suite)
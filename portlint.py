@@ -1,8 +1,32 @@
 """Check a JavaScript port for common errors."""
 
+import bisect
+import collections
+import concurrent.futures
+import hashlib
 import html.parser
+import itertools
+import json
+import multiprocessing
+import os
+import os.path
+import re
+import tempfile
+import time
 import unittest
 
+EXTENSIONS = ('.html', '.js')
+"""Tuple of string extensions of the files to check."""
+
+CHUNK_SIZE = 64 * 1024
+"""Integer number of characters read from a file at a time."""
+
+CACHE_FILENAME = '.portlint_cache.json'
+"""String default filename of the cache of the problems found."""
+
+CACHE_SIZE = 16 * 1024 * 1024
+"""Integer maximum number of characters of messages in the cache."""
+
 LINE_ENDINGS = ('*/', '{', '}', '[', ']', ';', ',', '||', '&&')
 """Tuple of accepted string line endings in JavaScript excluding whitespace."""
 
@@ -19,8 +43,378 @@ TRICKY_CASES = ['self.', '.image',
                 '.toFixed(0)']
 """List of string elements that should not be in the JavaScript."""
 
+RULES = {
+    'tricky-case': 'Python code or legacy calls left in the JavaScript',
+    'trailing-whitespace': 'Trailing whitespace in a line',
+    'line-ending': 'Line does not end with an accepted line ending',
+    'title-mismatch': 'h1 tag does not match title tag'
+}
+"""Dictionary mapping string rule IDs to string descriptions."""
+
+_PATTERN_RULES = []
+"""List of tuples of the string rule ID, compiled regular expression and
+string error message of each registered rule."""
+
+_matchers = None
+"""Tuple of the compiled matchers for _PATTERN_RULES from _compile_rules()
+or None if the rules changed since they were compiled."""
+
+def register_rule(rule, pattern, message, description=None):
+    """Register a rule that reports message wherever pattern matches.
+
+    Patterns should not match line endings since they are reported on the
+    line where they start.
+
+    Args:
+        rule: String rule ID.
+        pattern: String regular expression.
+        message: String error message.
+        description: Optional string description of the rule for RULES.
+            Defaults to None which keeps any existing description or uses
+            message.
+    Raises:
+        re.error: If pattern is not a valid regular expression.
+    """
+    global _matchers
+    # Compile first so a bad pattern fails here and not in every Checker
+    regex = re.compile(pattern)
+    _PATTERN_RULES.append((rule, regex, message))
+    if description is not None:
+        RULES[rule] = description
+    else:
+        RULES.setdefault(rule, message)
+    _matchers = None
+
+def unregister_rule(rule):
+    """Remove every pattern registered for rule and its description."""
+    global _matchers
+    _PATTERN_RULES[:] = [r for r in _PATTERN_RULES if r[0] != rule]
+    RULES.pop(rule, None)
+    _matchers = None
+
+def _literal_prefix(pattern):
+    """Return the literal text every match of pattern starts with."""
+    if '|' in pattern:
+        # Alternatives may start differently
+        return ''
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            if (i + 1 >= len(pattern)) or pattern[i+1].isalnum():
+                break
+            c = pattern[i+1]
+            i += 1
+        elif c in '.^$*+?{}[]()':
+            break
+        prefix.append(c)
+        i += 1
+    if (i < len(pattern)) and (pattern[i] in '*+?{'):
+        # The last character may not be repeated exactly once
+        prefix.pop()
+    return ''.join(prefix)
+
+def _compile_rules():
+    """Return the matchers for the rules in _PATTERN_RULES.
+
+    Rules starting with literal text are found with str.find(), which is
+    much faster than a regular expression, and then confirmed with their
+    regular expression. The other rules are searched with their own regular
+    expression since matches of different rules may overlap.
+
+    Returns:
+        Tuple of the list of tuples of the integer index into _PATTERN_RULES
+        and the string prefix of each literal rule, and the list of integer
+        indices into _PATTERN_RULES of the other rules.
+    """
+    literals = []
+    others = []
+    for index, (rule, regex, message) in enumerate(_PATTERN_RULES):
+        prefix = _literal_prefix(regex.pattern)
+        if len(prefix) > 0:
+            literals.append((index, prefix))
+        else:
+            others.append(index)
+    return (literals, others)
+
+_LINE_BREAKS = '\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+"""String line breaks of str.splitlines() other than carriage returns and
+line feeds."""
+
+def _compile_bad_ending():
+    """Return a regular expression finding lines without a line ending.
+
+    It matches the line feed after each line that does not end with one of
+    LINE_ENDINGS, including lines with trailing whitespace but not empty
+    lines.
+    """
+    characters = ''.join(e for e in LINE_ENDINGS if len(e) == 1) + '\n'
+    lookbehinds = []
+    for newline in ['\n', '\r\n']:
+        lookbehinds.append('(?<![{}]{})'.format(re.escape(characters),
+                                                re.escape(newline)))
+        for ending in LINE_ENDINGS:
+            if len(ending) > 1:
+                lookbehinds.append('(?<!{})'.format(
+                    re.escape(ending + newline)))
+    return re.compile('\n' + ''.join(lookbehinds))
+
+_BAD_ENDING = _compile_bad_ending()
+"""Compiled regular expression from _compile_bad_ending()."""
+
+def _register_tricky_cases():
+    """Register a tricky-case rule for each of TRICKY_CASES."""
+    for case in TRICKY_CASES:
+        if '=' in case:
+            # Ignore comparisons to null that are not strict
+            register_rule('tricky-case', re.escape(case) + '(?!null)',
+                          '"{}" found in JavaScript!'.format(case))
+        else:
+            register_rule('tricky-case', re.escape(case),
+                          '"{}" found in JavaScript!'.format(case))
+
+_register_tricky_cases()
+
 def check_javascript(code):
     """Return a list of errors in the Javascript in code."""
+    checker = Checker()
+    checker.check(code)
+    return checker.get_errors()
+
+def find_problems(code, first_line=1):
+    """Return a list of problems in the JavaScript in code.
+
+    Args:
+        code: String JavaScript.
+        first_line: Optional integer line number of the first line of code.
+            Defaults to 1.
+    Returns:
+        List of problems like Checker.get_problems().
+    """
+    checker = Checker(first_line)
+    checker.check(code)
+    return checker.get_problems()
+
+
+class Checker:
+
+    """Check JavaScript for every registered rule and the line endings.
+
+    Each block of lines is searched once for each rule, with str.find() for
+    the rules starting with literal text. The line endings are
+    checked with one more regular expression so only the lines with comments
+    or errors are checked in Python.
+    """
+
+    def __init__(self, first_line=1):
+        """Initialize the checker.
+
+        Args:
+            first_line: Optional integer line number of the first line.
+                Defaults to 1.
+        """
+        global _matchers
+        if _matchers is None:
+            _matchers = _compile_rules()
+        self.matchers = _matchers
+        """Tuple of the matchers from _compile_rules()."""
+
+        self.rules = list(_PATTERN_RULES)
+        """List of the registered rules when the checker was created."""
+
+        self.line_number = first_line
+        """Integer line number of the next line."""
+
+        self.in_comment = False
+        """Boolean whether the next line is inside a block comment."""
+
+        self.hits = []
+        """List of tuples of the integer index into rules and the problem of
+        each pattern match."""
+
+        self.problems = []
+        """List of the problems that are not pattern matches."""
+
+        self.pending = []
+        """List of string data of the line not finished by feed()."""
+
+    def feed(self, data):
+        """Check the lines finished by the string data.
+
+        Data can be split anywhere. Only the unfinished last line is kept
+        until the data finishing it or close().
+        """
+        index = data.rfind('\n')
+        if index < 0:
+            self.pending.append(data)
+            return
+        self.pending.append(data[:index+1])
+        self.check(''.join(self.pending))
+        self.pending = [data[index+1:]]
+
+    def close(self):
+        """Check the unfinished last line given to feed()."""
+        code = ''.join(self.pending)
+        self.pending = []
+        if len(code) > 0:
+            self.check(code)
+
+    def check(self, code):
+        """Check the next block of whole lines of JavaScript in code."""
+        first_line = self.line_number
+        rules = self.rules
+        literals, others = self.matchers
+
+        # Find the offset and rule index of every pattern match
+        offsets = []
+        for index, prefix in literals:
+            regex = rules[index][1]
+            offset = code.find(prefix)
+            while offset >= 0:
+                if regex.match(code, offset) is not None:
+                    offsets.append((offset, index))
+                offset = code.find(prefix, offset + 1)
+        for index in others:
+            for match in rules[index][1].finditer(code):
+                offsets.append((match.start(), index))
+        offsets.sort()
+
+        if (any(c in code for c in _LINE_BREAKS) or
+            (code.count('\r') != code.count('\r\n'))):
+            # Counting "\n" does not give the line numbers so split the lines
+            lines = code.splitlines(True)
+            starts = list(itertools.accumulate(
+                [len(line) for line in lines], initial=0))
+            for offset, index in offsets:
+                i = bisect.bisect_right(starts, offset) - 1
+                rule, regex, message = rules[index]
+                self.hits.append((index, (first_line + i,
+                                          offset - starts[i] + 1, rule,
+                                          message)))
+            self.line_number += len(lines)
+            for number, line in enumerate(code.splitlines(), first_line):
+                self.check_line(number, line)
+            return
+
+        line = first_line
+        last = 0
+        start = 0
+        for offset, index in offsets:
+            count = code.count('\n', last, offset)
+            if count > 0:
+                line += count
+                start = code.rfind('\n', 0, offset) + 1
+            last = offset
+            rule, regex, message = rules[index]
+            self.hits.append((index, (line, offset - start + 1, rule,
+                                      message)))
+
+        self.line_number += code.count('\n')
+        if (len(code) > 0) and (not code.endswith('\n')):
+            self.line_number += 1
+        # Only lines with comments or without a line ending can have errors
+        starts = set()
+        offset = code.find('/')
+        while offset >= 0:
+            starts.add(code.rfind('\n', 0, offset) + 1)
+            end = code.find('\n', offset)
+            if end < 0:
+                break
+            offset = code.find('/', end)
+        for match in _BAD_ENDING.finditer(code):
+            starts.add(code.rfind('\n', 0, match.start()) + 1)
+        if (len(code) > 0) and (not code.endswith('\n')):
+            starts.add(code.rfind('\n') + 1)
+        line = first_line
+        last = 0
+        starts = sorted(starts)
+        i = 0
+        while i < len(starts):
+            start = starts[i]
+            i += 1
+            line += code.count('\n', last, start)
+            last = start
+            end = code.find('\n', start)
+            if end < 0:
+                end = len(code)
+            elif (end > start) and (code[end-1] == '\r'):
+                end -= 1
+            self.check_line(line, code[start:end])
+            if self.in_comment:
+                # Skip to the line ending the block comment
+                close = code.find('*/', end)
+                if close < 0:
+                    break
+                i = bisect.bisect_left(starts, code.rfind('\n', 0, close) + 1,
+                                       i)
+
+    def check_line(self, number, line):
+        """Check the line endings of one line of JavaScript.
+
+        Args:
+            number: Integer line number of line.
+            line: String line of JavaScript without its line ending.
+        """
+        # This block comment check only catches when they are on own lines
+        if '/*' in line:
+            # Start of a block comment
+            self.in_comment = True
+        if '*/' in line:
+            # End of a block comment
+            self.in_comment = False
+        if self.in_comment:
+            return
+        index = line.find('//')
+        if index >= 0:
+            # Remove the inline comment
+            line = line[:index].rstrip()
+        # Check the endings of lines that are not comments
+        cleaned = line.rstrip()
+        if len(cleaned) != len(line):
+            self.problems.append((number, len(cleaned) + 1,
+                                  'trailing-whitespace',
+                                  '''Trailing whitespace in line:
+{}'''.format(cleaned)))
+        if len(cleaned) > 0:
+            if not cleaned.endswith(LINE_ENDINGS):
+                self.problems.append((number, len(cleaned), 'line-ending',
+                                      '''Line does not end correctly:
+{}'''.format(cleaned)))
+
+    def get_problems(self):
+        """Return a list of every problem found so far.
+
+        Returns:
+            List of tuples of the integer line number, integer column, string
+            rule ID and string error message of each problem. The pattern
+            matches come first in the order of the rules and then the other
+            problems in the order of the lines.
+        """
+        hits = sorted(self.hits, key=lambda hit: hit[0])
+        return [problem for index, problem in hits] + self.problems
+
+    def get_errors(self):
+        """Return a list of string errors like check_javascript().
+
+        Each pattern rule is only reported once for its first match.
+        """
+        errors = []
+        seen = set()
+        for index, problem in sorted(self.hits, key=lambda hit: hit[0]):
+            if index not in seen:
+                seen.add(index)
+                errors.append(problem[3])
+        errors.extend(problem[3] for problem in self.problems)
+        return errors
+
+def _check_javascript_reference(code):
+    """Return a list of errors in the Javascript in code.
+
+    This is the original implementation of check_javascript() scanning code
+    once for each of TRICKY_CASES. It is kept to test and benchmark the
+    Checker against.
+    """
     errors = []
 
     for case in TRICKY_CASES:
@@ -59,10 +453,73 @@ def check_javascript(code):
 
     return errors
 
+BENCHMARK_CODE = '''\
+class Game {
+  constructor() {
+    this.score = 0;
+    this.actor = new Actor('alien');
+  }
+
+  update(dt) {
+    // Move the alien
+    if (keyboard.left && this.actor.left > 0) {
+      this.actor.left -= 2 * dt;
+    }
+    if (this.score === null) {
+      this.score = 0;
+    }
+    screen.draw.text(`Score ${this.score.toFixed(1)}`, [10, 10]);
+  }
+}
+'''
+"""String JavaScript repeated by benchmark()."""
+
+def benchmark(size=1000000, repeat=3):
+    """Return the best seconds taken by each checker on size characters.
+
+    Args:
+        size: Optional integer approximate number of characters of
+            JavaScript to check. Defaults to 1000000.
+        repeat: Optional integer number of times to time each checker.
+            Defaults to 3.
+    Returns:
+        Dictionary mapping the string names of the checkers to the float
+        best seconds taken.
+    """
+    code = BENCHMARK_CODE * max(1, size // len(BENCHMARK_CODE))
+    results = {}
+    for checker in [_check_javascript_reference, check_javascript]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            checker(code)
+            seconds = time.perf_counter() - start
+            if (best is None) or (seconds < best):
+                best = seconds
+        results[checker.__name__] = best
+    return results
+
+
+_RAW_TEXT_TAGS = ('script', 'style')
+"""Tuple of the string tags whose content HTMLParser keeps as text."""
+
+_SCRIPT_START = re.compile(r'<script(?=[\s/>])', re.IGNORECASE)
+"""Compiled regular expression matching the start of a script start tag."""
+
+_SCRIPT_END = re.compile(r'</script', re.IGNORECASE)
+"""Compiled regular expression matching the start of a script end tag."""
+
 
 class _PortParser(html.parser.HTMLParser):
 
-    """HTMLParser to parse the JavaScript port HTML webpage."""
+    """HTMLParser to parse the JavaScript port HTML webpage.
+
+    The page can be fed in chunks of any size. Script content is checked as
+    it arrives instead of waiting in HTMLParser for the end tag, so only the
+    unfinished line of a script is kept in memory. Other data waits for the
+    end of its tag instead of being parsed again for every chunk, and the
+    middle of a tag longer than a chunk is skipped except for its newlines.
+    """
 
     def reset(self):
         super().reset()
@@ -73,31 +530,482 @@ class _PortParser(html.parser.HTMLParser):
         self.errors = []
         """List of errors in the JavaScript port HTML webpage."""
 
+        self.problems = []
+        """List of problems in the JavaScript port HTML webpage like
+        Checker.get_problems()."""
+
         self.title = ''
         """String title of the page."""
 
+        self.heading = None
+        """Tuple of the integer line, integer column and list of string data
+        of the h1 tag being processed or None."""
+
+        self.checker = None
+        """Checker of the script being processed or None."""
+
+        self.waiting = []
+        """List of string data waiting for the end of a tag."""
+
+        self.tag_length = None
+        """Integer number of characters of the unfinished tag or None."""
+
+        self.in_script = False
+        """Boolean whether the data fed is script content."""
+
+        self.script_tail = ''
+        """String end of the script content that may start its end tag."""
+
+        self.script_lines = 0
+        """Integer number of newlines in the script content handled."""
+
+    def feed(self, data):
+        """Feed the string data to the parser."""
+        position = 0
+        while position < len(data):
+            if self.in_script:
+                data, position = self.feed_script(data, position)
+            else:
+                data, position = self.feed_markup(data, position)
+
+    def feed_markup(self, data, position):
+        """Feed the string data from position outside of a script.
+
+        Returns:
+            Tuple of the string data and the integer position in it where a
+            script starts or the length of data.
+        """
+        if ((self.current_tag not in _RAW_TEXT_TAGS) and
+            (data.find('>', position) < 0)):
+            data = data[position:]
+            index = data.rfind('<')
+            if index >= 0:
+                self.tag_length = len(data) - index
+            elif self.tag_length is not None:
+                if ((self.tag_length >= CHUNK_SIZE) and
+                    ('"' not in data) and ("'" not in data)):
+                    # Skip the middle of a long tag like a data URI since the
+                    # attributes are not checked but keep the line numbers
+                    data = '\n' * data.count('\n')
+                else:
+                    self.tag_length += len(data)
+            # Wait for the end of the tag instead of parsing it again
+            self.waiting.append(data)
+            return ('', 0)
+        if len(self.waiting) > 0:
+            self.waiting.append(data[position:])
+            data = ''.join(self.waiting)
+            position = 0
+            self.waiting = []
+        match = _SCRIPT_START.search(data, position)
+        end = -1 if match is None else data.find('>', match.end())
+        if end >= 0:
+            # Stop after the start tag so the script content is not kept by
+            # HTMLParser until its end tag
+            end += 1
+        else:
+            # Keep an unfinished tag back until it is complete so a script
+            # start tag is always seen whole
+            end = len(data)
+            index = data.rfind('<', position) if match is None else match.start()
+            if (index >= 0) and (data.find('>', index) < 0):
+                self.waiting.append(data[index:])
+                super().feed(data[position:index])
+            else:
+                super().feed(data[position:])
+            self.tag_length = None
+            if len(self.waiting) > 0:
+                self.tag_length = len(self.waiting[0])
+            return (data, end)
+        super().feed(data[position:end])
+        self.tag_length = None
+        return (data, end)
+
+    def feed_script(self, data, position):
+        """Handle the string data from position as script content.
+
+        Returns:
+            Tuple of the string data and the integer position in it of the
+            script end tag or the length of data.
+        """
+        if len(self.script_tail) > 0:
+            data = self.script_tail + data[position:]
+            position = 0
+            self.script_tail = ''
+        match = _SCRIPT_END.search(data, position)
+        if match is None:
+            # Keep what may be the start of the end tag for the next data
+            end = len(data)
+            index = data.rfind('<', max(end - len('</script'), position))
+            if ((index >= 0) and
+                '</script'.startswith(data[index:].lower())):
+                self.script_tail = data[index:]
+                end = index
+        else:
+            end = match.start()
+        if end > position:
+            self.script_lines += data.count('\n', position, end)
+            self.handle_data(data[position:end])
+        if match is None:
+            return (data, len(data))
+        # HTMLParser only needs the newlines of the content to count lines
+        self.in_script = False
+        super().feed('\n' * self.script_lines)
+        self.script_lines = 0
+        return (data, end)
+
+    def close(self):
+        """Handle any remaining data and finish the last tag."""
+        if len(self.script_tail) > 0:
+            self.handle_data(self.script_tail)
+            self.script_tail = ''
+        if len(self.waiting) > 0:
+            data = ''.join(self.waiting)
+            self.waiting = []
+            super().feed(data)
+        super().close()
+        self.finish_tag()
+
     def get_errors(self):
         """Return a list of string errors in the JavaScript port."""
         return list(self.errors)
 
+    def get_problems(self):
+        """Return a list of problems in the JavaScript port.
+
+        Returns:
+            List of problems like Checker.get_problems().
+        """
+        return list(self.problems)
+
+    def finish_tag(self):
+        """Check the data of the tag that just ended."""
+        if self.heading is not None:
+            line, column, data = self.heading
+            self.heading = None
+            if ''.join(data) != self.title:
+                self.errors.append('h1 tag does not match title tag!')
+                self.problems.append((line, column, 'title-mismatch',
+                                      'h1 tag does not match title tag!'))
+        if self.checker is not None:
+            checker = self.checker
+            self.checker = None
+            checker.close()
+            self.errors.extend(checker.get_errors())
+            self.problems.extend(checker.get_problems())
+
     def handle_starttag(self, tag, attrs):
         """Mark when we enter a tag."""
+        self.finish_tag()
         self.current_tag = tag
+        self.in_script = (tag == 'script')
+        if tag == 'title':
+            self.title = ''
 
     def handle_endtag(self, tag):
         """Mark when we exit a tag."""
+        self.finish_tag()
         self.current_tag = ''
+        self.in_script = False
 
     def handle_data(self, data):
         """Handle the data of the current tag."""
         if self.current_tag == 'title':
-            self.title = data
+            self.title += data
         elif self.current_tag == 'h1':
-            if data != self.title:
-                self.errors.append('h1 tag does not match title tag!')
-        elif self.current_tag == 'script':
+            if self.heading is None:
+                line, offset = self.getpos()
+                self.heading = (line, offset + 1, [])
+            self.heading[2].append(data)
+        elif (self.current_tag == 'script') and self.in_script:
             # Check the JavaScript port
-            self.errors.extend(check_javascript(data))
+            if self.checker is None:
+                self.checker = Checker(self.getpos()[0])
+            self.checker.feed(data)
+
+
+def find_files(path):
+    """Return a sorted list of the paths to the files to check under path.
+
+    Directories starting with "." or "__" are skipped.
+
+    Args:
+        path: String path to a file or a directory to search recursively.
+    Returns:
+        List of string paths.
+    """
+    if os.path.isfile(path):
+        return [path]
+    paths = []
+    for parent, directories, filenames in os.walk(path):
+        directories[:] = [d for d in directories
+                          if not d.startswith(('.', '__'))]
+        for filename in filenames:
+            if filename.endswith(EXTENSIONS):
+                paths.append(os.path.join(parent, filename))
+    return sorted(paths)
+
+def check_html(source):
+    """Return the problems in the string port HTML webpage in source.
+
+    Returns:
+        List of problems like Checker.get_problems().
+    """
+    port_parser = _PortParser()
+    port_parser.feed(source)
+    port_parser.close()
+    return port_parser.get_problems()
+
+def check_file(path):
+    """Return the problems in the JavaScript or port HTML webpage at path.
+
+    Args:
+        path: String path to the JavaScript or port HTML webpage.
+    Returns:
+        Tuple of path and the list of problems like find_problems().
+    """
+    if path.endswith('.js'):
+        checker = Checker()
+    else:
+        checker = _PortParser()
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if len(data) <= 0:
+                break
+            checker.feed(data)
+    checker.close()
+    return (path, checker.get_problems())
+
+def check_files(paths, jobs=None, cache=None):
+    """Check the files at paths using a process pool.
+
+    Args:
+        paths: List of string paths to the files to check.
+        jobs: Optional integer number of worker processes.
+            Defaults to None which uses the number of processors.
+            1 checks the files in this process without a pool.
+        cache: Optional LintCache to skip the files checked before.
+            Defaults to None which checks every file.
+    Yields:
+        Tuple of path and the list of problems like check_file() in the
+        order of paths.
+    """
+    keys = {}
+    cached = {}
+    misses = []
+    for path in paths:
+        if cache is not None:
+            keys[path] = content_key(path)
+            problems = cache.get(keys[path])
+            if problems is not None:
+                cached[path] = problems
+                continue
+        misses.append(path)
+
+    checked = _check_paths(misses, jobs)
+    for path in paths:
+        if path in cached:
+            yield (path, cached[path])
+            continue
+        result = next(checked)
+        if cache is not None:
+            cache.put(keys[path], result[1])
+        yield result
+
+def _check_paths(paths, jobs):
+    """Yield check_file() of each of paths in order using a process pool."""
+    if (jobs == 1) or (len(paths) <= 1):
+        for path in paths:
+            yield check_file(path)
+        return
+
+    # Workers may not be forked from this process so send them the rules
+    # registered at runtime, which ruleset_version() includes
+    with concurrent.futures.ProcessPoolExecutor(
+        jobs, initializer=_load_rules, initargs=_dump_rules()) as executor:
+        # Send the paths in batches to keep the overhead per file small
+        chunksize = max(1, len(paths) // (4 * (jobs or os.cpu_count() or 1)))
+        yield from executor.map(check_file, paths, chunksize=chunksize)
+
+def _dump_rules():
+    """Return a tuple of the registered rules for _load_rules()."""
+    return ([(rule, regex.pattern, message)
+             for rule, regex, message in _PATTERN_RULES], dict(RULES))
+
+def _load_rules(rules, descriptions):
+    """Replace the registered rules with those from _dump_rules()."""
+    global _matchers
+    _PATTERN_RULES[:] = [(rule, re.compile(pattern), message)
+                         for rule, pattern, message in rules]
+    RULES.clear()
+    RULES.update(descriptions)
+    _matchers = None
+
+def content_key(path):
+    """Return a string key for the contents and kind of the file at path."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if len(data) <= 0:
+                break
+            digest.update(data)
+    return '{}{}'.format(digest.hexdigest(), os.path.splitext(path)[1])
+
+def ruleset_version():
+    """Return a string hash of the rules so changes invalidate the cache."""
+    digest = hashlib.sha256()
+    with open(__file__, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps([
+        TRICKY_CASES, LINE_ENDINGS,
+        [[rule, regex.pattern, message]
+         for rule, regex, message in _PATTERN_RULES]]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LintCache:
+
+    """Persistent cache of the problems found in files by their contents.
+
+    The cache is stored as one JSON file. Entries are kept in least recently
+    used order and evicted from the front once the total size of the stored
+    messages exceeds the size cap. The whole cache is discarded when
+    ruleset_version() changes.
+    """
+
+    def __init__(self, path, size=CACHE_SIZE):
+        self.path = path
+        """String path to the cache file."""
+
+        self.size = size
+        """Integer maximum number of characters of messages to store."""
+
+        self.version = ruleset_version()
+        """String version of the rules the entries were found with."""
+
+        self.entries = collections.OrderedDict()
+        """OrderedDict mapping string content keys to lists of problems."""
+
+        self.hits = 0
+        """Integer number of keys found by get()."""
+
+        self.misses = 0
+        """Integer number of keys not found by get()."""
+
+        self.load()
+
+    def load(self):
+        """Load the entries from the cache file if it is still valid."""
+        self.entries.clear()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get('version') == self.version:
+            for key, problems in stored.get('entries', []):
+                self.entries[key] = [tuple(p) for p in problems]
+
+    def save(self):
+        """Evict the least recently used entries and write the cache file."""
+        total = sum(_entry_size(k, e) for k, e in self.entries.items())
+        while (total > self.size) and (len(self.entries) > 0):
+            key, problems = self.entries.popitem(last=False)
+            total -= _entry_size(key, problems)
+
+        parent = os.path.dirname(self.path)
+        if len(parent) > 0:
+            os.makedirs(parent, exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.version,
+                       'entries': list(self.entries.items())}, f)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        """Remove all the entries and the cache file."""
+        self.entries.clear()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def get(self, key):
+        """Return the problems for key and mark it as recently used.
+
+        Returns:
+            List of problems or None if key is not in the cache.
+        """
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, problems):
+        """Store problems for key as the most recently used."""
+        self.entries[key] = list(problems)
+        self.entries.move_to_end(key)
+
+def _entry_size(key, problems):
+    """Return the integer number of characters stored in a cache entry."""
+    return len(key) + sum(len(p[3]) for p in problems)
+
+def format_json(results):
+    """Return a JSON string of the problems in results.
+
+    Args:
+        results: Iterable of tuples of path and the list of problems.
+    Returns:
+        String JSON array of objects with the file, line, column, rule and
+        message of each problem.
+    """
+    return json.dumps([
+        {'file': path, 'line': line, 'column': column, 'rule': rule,
+         'message': message}
+        for path, problems in results
+        for line, column, rule, message in problems], indent=2)
+
+def format_sarif(results):
+    """Return a SARIF 2.1.0 log string of the problems in results.
+
+    Args:
+        results: Iterable of tuples of path and the list of problems.
+    Returns:
+        String JSON SARIF log.
+    """
+    sarif = []
+    for path, problems in results:
+        uri = path.replace(os.sep, '/')
+        for line, column, rule, message in problems:
+            sarif.append({
+                'ruleId': rule,
+                'level': 'error',
+                'message': {'text': message},
+                'locations': [{
+                    'physicalLocation': {
+                        'artifactLocation': {'uri': uri},
+                        'region': {'startLine': line,
+                                   'startColumn': column}
+                    }
+                }]
+            })
+    return json.dumps({
+        'version': '2.1.0',
+        '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+        'runs': [{
+            'tool': {
+                'driver': {
+                    'name': 'portlint',
+                    'rules': [{'id': rule,
+                               'shortDescription': {'text': description}}
+                              for rule, description in RULES.items()]
+                }
+            },
+            'results': sarif
+        }]
+    }, indent=2)
 
 
 class _UnitTest(unittest.TestCase):
@@ -353,39 +1261,366 @@ console.log(foobar.toFixed(0));
                 self.assertTrue(
                     error.startswith('Line does not end correctly:'))
 
+    def test_find_problems(self):
+        """Test the line numbers and rule IDs of problems."""
+        self.assertEqual(find_problems(''), [])
+        code = '\n'.join(['let a = null;',
+                          'if (a == null) {',
+                          '}',
+                          "if (a == 'foobar') {",
+                          '  a.x = 42  ',
+                          '  a.x = 43;',
+                          '}'])
+        # Tricky cases come first in the order of TRICKY_CASES
+        expected = [(5, 4, 'tricky-case', '".x" found in JavaScript!'),
+                    (6, 4, 'tricky-case', '".x" found in JavaScript!'),
+                    (4, 6, 'tricky-case', '" == " found in JavaScript!'),
+                    (5, 11, 'trailing-whitespace',
+                     'Trailing whitespace in line:\n  a.x = 42'),
+                    (5, 10, 'line-ending',
+                     'Line does not end correctly:\n  a.x = 42')]
+        self.assertEqual(find_problems(code), expected)
+        # Only the first match of each tricky case is an error
+        self.assertEqual(check_javascript(code),
+                         [expected[0][3]] + [p[3] for p in expected[2:]])
+        self.assertEqual(find_problems(code, 10)[0][0], 14)
+        self.assertEqual(find_problems(code.replace('\n', '\r\n')),
+                         expected)
+        self.assertEqual(find_problems(code.replace('\n', '\r')), expected)
+
+        parser = _PortParser()
+        parser.feed("""<html>
+<head>
+  <title>Foobar</title>
+</head>
+<body>
+<h1>Baz</h1>
+<script>
+if (this != 'foobar') {
+}
+</script>
+</body>
+</html>""")
+        self.assertEqual(parser.get_problems(), [
+            (6, 5, 'title-mismatch', 'h1 tag does not match title tag!'),
+            (8, 9, 'tricky-case', '" != " found in JavaScript!')])
+        for line, column, rule, message in parser.get_problems():
+            self.assertIn(rule, RULES)
+
+    def test_streaming(self):
+        """Test checking pages fed in chunks of any size."""
+        code = '''let a = null;
+if (a == 'foobar') {  // a == null
+  this.x = 42;\r
+  self.y = 42 \r
+}
+''' * 3
+        checker = Checker()
+        for c in code:
+            checker.feed(c)
+        checker.close()
+        self.assertEqual(checker.get_problems(), find_problems(code))
+        self.assertEqual(checker.get_errors(), check_javascript(code))
+
+        page = """<html>
+<head>
+  <title>Foo &amp; Bar</title>
+</head>
+<body>
+<h1>Foo &amp; Baz</h1>
+<img src="data:image/png;base64,AAAA" alt="foo">
+<script>
+{}</script>
+<script>if (a < b) {{ a = b }}</script>
+</body>
+</html>""".format(code)
+        parser = _PortParser()
+        parser.feed(page)
+        parser.close()
+        expected = parser.get_problems()
+        self.assertEqual(check_html(page), expected)
+        self.assertEqual(expected[0], (6, 5, 'title-mismatch',
+                                       'h1 tag does not match title tag!'))
+        self.assertEqual(len(parser.get_errors()), 11)
+        for size in [1, 2, 7, 100]:
+            parser = _PortParser()
+            for i in range(0, len(page), size):
+                parser.feed(page[i:i+size])
+            parser.close()
+            self.assertEqual(parser.get_problems(), expected)
+            self.assertEqual(parser.title, 'Foo & Bar')
+
+        # Only about a chunk of an unfinished tag is kept
+        parser = _PortParser()
+        parser.feed('<img src="data:image/png;base64,')
+        for _ in range(4 * CHUNK_SIZE // 1000):
+            parser.feed('A' * 1000)
+            self.assertLess(sum(len(w) for w in parser.waiting),
+                            CHUNK_SIZE + 1000)
+        parser.feed('" alt="foo"><script>\n')
+        for _ in range(1000):
+            parser.feed('let a = 1;\nlet b')
+            parser.feed(' = 2;\n')
+            # Only the unfinished line of the script is kept
+            self.assertEqual(parser.waiting, [])
+            self.assertLess(sum(len(p) for p in parser.checker.pending), 100)
+        parser.feed('</scr')
+        parser.feed('ipt>')
+        parser.close()
+        self.assertEqual(parser.get_problems(), [])
+
+        # Skipping the middle of a long tag keeps the line numbers
+        page = ('<img src="data:image/png;base64,' +
+                ('A' * 999 + '\n') * (4 * CHUNK_SIZE // 1000) +
+                '" alt="foo">\n<SCRIPT type="module">\nlet a = 1\n</script>\n'
+                '<script>let b = 2\n</script>\n')
+        expected = check_html(page)
+        self.assertEqual([p[:3] for p in expected],
+                         [(4 * CHUNK_SIZE // 1000 + 3, 9, 'line-ending'),
+                          (4 * CHUNK_SIZE // 1000 + 5, 9, 'line-ending')])
+        for size in [1000, 4099]:
+            parser = _PortParser()
+            for i in range(0, len(page), size):
+                parser.feed(page[i:i+size])
+            parser.close()
+            self.assertEqual(parser.get_problems(), expected)
+
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'page.html')
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(page)
+            self.assertEqual(check_file(path), (path, expected))
+
+    def test_check_files(self):
+        """Test checking a directory tree of files."""
+        with tempfile.TemporaryDirectory() as root:
+            for directory in ['ports', os.path.join('ports', 'sub'), '.git']:
+                os.makedirs(os.path.join(root, directory), exist_ok=True)
+                for filename, code in [('good.js', 'let a = 1;\n'),
+                                       ('bad.js', 'let a = 1\n'),
+                                       ('notes.txt', 'let a = 1\n')]:
+                    with open(os.path.join(root, directory, filename), 'w',
+                              encoding='utf-8') as f:
+                        f.write(code)
+            paths = find_files(root)
+            self.assertEqual(paths, [
+                os.path.join(root, 'ports', 'bad.js'),
+                os.path.join(root, 'ports', 'good.js'),
+                os.path.join(root, 'ports', 'sub', 'bad.js'),
+                os.path.join(root, 'ports', 'sub', 'good.js')])
+            self.assertEqual(find_files(paths[0]), [paths[0]])
+
+            expected = [check_file(path) for path in paths]
+            self.assertEqual(expected[1], (paths[1], []))
+            self.assertEqual(expected[0], (paths[0], [
+                (1, 9, 'line-ending',
+                 'Line does not end correctly:\nlet a = 1')]))
+            self.assertEqual(list(check_files(paths, 1)), expected)
+            self.assertEqual(list(check_files(paths, 2)), expected)
+
+            # Workers that are not forked still get the rules registered
+            method = multiprocessing.get_start_method()
+            try:
+                register_rule('no-let', r'\blet ', '"let" found!')
+                multiprocessing.set_start_method('spawn', force=True)
+                with_rule = [check_file(path) for path in paths]
+                for path, problems in with_rule:
+                    self.assertIn((1, 1, 'no-let', '"let" found!'), problems)
+                self.assertEqual(list(check_files(paths, 2)), with_rule)
+            finally:
+                multiprocessing.set_start_method(method, force=True)
+                unregister_rule('no-let')
+
+            self.assertEqual(json.loads(format_json(expected)), [
+                {'file': path, 'line': 1, 'column': 9, 'rule': 'line-ending',
+                 'message': 'Line does not end correctly:\nlet a = 1'}
+                for path in paths[::2]])
+            sarif = json.loads(format_sarif(expected))
+            self.assertEqual(sarif['version'], '2.1.0')
+            results = sarif['runs'][0]['results']
+            self.assertEqual(len(results), 2)
+            self.assertEqual(results[0]['ruleId'], 'line-ending')
+            self.assertEqual(
+                results[0]['locations'][0]['physicalLocation']['region'],
+                {'startLine': 1, 'startColumn': 9})
+            rules = [rule['id']
+                     for rule in sarif['runs'][0]['tool']['driver']['rules']]
+            self.assertEqual(rules, list(RULES))
+
+    def test_register_rule(self):
+        """Test registering rules and checking against the reference."""
+        code = '''/*
+ * this.x in a comment;
+ */
+var(this.image).x = 1;
+let y = {}  // y.y == 1
+'''
+        self.assertEqual(check_javascript(code),
+                         _check_javascript_reference(code))
+        try:
+            register_rule('no-var', r'\bvar\(', '"var" found in JavaScript!',
+                          'Use let or const instead of var')
+            register_rule('no-var', 'var ', '"var" found in JavaScript!')
+            self.assertEqual(RULES['no-var'], 'Use let or const instead of var')
+            problems = find_problems(code * 2)
+            self.assertEqual(
+                [p[:3] for p in problems if p[2] == 'no-var'],
+                [(4, 1, 'no-var'), (9, 1, 'no-var')])
+            self.assertEqual(check_javascript(code),
+                             _check_javascript_reference(code) +
+                             ['"var" found in JavaScript!'])
+        finally:
+            unregister_rule('no-var')
+        self.assertNotIn('no-var', RULES)
+
+        # Rules matching at the same or overlapping offsets are all reported
+        for patterns, code, expected in [
+            ([r'\bfoo', r'\bfoob'], 'foobar;\n', [(1, 1, 'a'), (1, 1, 'b')]),
+            ([r'(?:x)+yz', r'[y]z'], 'xxyz;\n', [(1, 1, 'a'), (1, 3, 'b')]),
+            ([r'(?i)SELF\.', r'\bthis'], 'self.x = this;\n',
+             [(1, 1, 'a'), (1, 10, 'b')])]:
+            try:
+                for rule, pattern in zip('ab', patterns):
+                    register_rule(rule, pattern, rule)
+                self.assertEqual([p[:3] for p in find_problems(code)
+                                  if p[2] in ('a', 'b')], expected)
+            finally:
+                unregister_rule('a')
+                unregister_rule('b')
+        self.assertRaises(re.error, register_rule, 'bad', 'a(?i)b', 'bad')
+        self.assertRaises(re.error, register_rule, 'bad', '(', 'bad')
+        self.assertNotIn('bad', RULES)
+        self.assertEqual(check_javascript(code),
+                         _check_javascript_reference(code))
+
+        results = benchmark(10000, 1)
+        self.assertEqual(sorted(results),
+                         ['_check_javascript_reference', 'check_javascript'])
+
+    def test_LintCache(self):
+        """Test caching the problems found by the contents of files."""
+        with tempfile.TemporaryDirectory() as root:
+            paths = []
+            for filename, code in [('good.js', 'let a = 1;\n'),
+                                   ('bad.js', 'let a = 1\n'),
+                                   ('bad.html', '<script>\nlet a = 1\n')]:
+                paths.append(os.path.join(root, filename))
+                with open(paths[-1], 'w', encoding='utf-8') as f:
+                    f.write(code)
+            # Files with the same contents of a different kind differ
+            self.assertNotEqual(content_key(paths[1]), content_key(paths[2]))
+            expected = [check_file(path) for path in paths]
+
+            path = os.path.join(root, 'cache', CACHE_FILENAME)
+            cache = LintCache(path)
+            self.assertEqual(list(check_files(paths, 1, cache)), expected)
+            self.assertEqual((cache.hits, cache.misses), (0, 3))
+            cache.save()
+
+            cache = LintCache(path)
+            self.assertEqual(list(check_files(paths, 1, cache)), expected)
+            self.assertEqual((cache.hits, cache.misses), (3, 0))
+
+            with open(paths[0], 'w', encoding='utf-8') as f:
+                f.write('let b = 1\n')
+            expected[0] = check_file(paths[0])
+            self.assertEqual(list(check_files(paths, 2, cache)), expected)
+            self.assertEqual((cache.hits, cache.misses), (5, 1))
+            cache.save()
+
+            # Changing the rules discards the whole cache
+            version = ruleset_version()
+            try:
+                register_rule('no-let', 'let ', '"let" found in JavaScript!')
+                self.assertNotEqual(ruleset_version(), version)
+                self.assertEqual(len(LintCache(path).entries), 0)
+            finally:
+                unregister_rule('no-let')
+            self.assertEqual(ruleset_version(), version)
+            self.assertEqual(len(LintCache(path).entries), 4)
+
+            # Evict the least recently used entries over the size cap
+            cache = LintCache(path, 200)
+            cache.get(content_key(paths[1]))
+            cache.save()
+            cache = LintCache(path)
+            self.assertEqual(list(cache.entries), [content_key(paths[1])])
+
+            cache.clear()
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(LintCache(path).entries, {})
+
 if __name__ == '__main__':
     import argparse
-    import os.path
+    import sys
     parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--benchmark', metavar='CHARACTERS', type=int, default=None,
+        help='time checking CHARACTERS characters of JavaScript')
+    parser.add_argument(
+        '--cache', metavar='PATH', default=CACHE_FILENAME,
+        help='path to the cache of the problems found. \
+Defaults to {}'.format(CACHE_FILENAME))
+    parser.add_argument(
+        '--clean', action='store_true',
+        help='discard the cache before checking')
+    parser.add_argument(
+        '-f', '--format', choices=['text', 'json', 'sarif'], default='text',
+        help='output format. Defaults to text')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes. \
+Defaults to the number of processors')
+    parser.add_argument(
+        '-n', '--line-numbers', action='store_true',
+        help='start each message of the text output with its line and column')
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='check every file without using a cache')
     parser.add_argument(
         'path', nargs='?', default='',
-        help='path to the JavaScript, port HTML webpage, or directory')
+        help='path to the JavaScript, port HTML webpage, or directory to \
+search recursively')
     args = parser.parse_args()
 
+    if args.benchmark is not None:
+        for name, seconds in benchmark(args.benchmark).items():
+            print('{:8.3f}s  {} ({:.1f} MB/s)'.format(
+                seconds, name, args.benchmark / max(seconds, 1e-9) / 1e6))
+        parser.exit()
+
     paths = []
-    if os.path.isfile(args.path):
-        paths = [args.path]
-    elif os.path.isdir(args.path):
-        filenames = os.listdir(args.path)
-        for filename in filenames:
-            if filename.endswith(('.html', '.js')):
-                paths.append(os.path.join(args.path, filename))
+    if os.path.exists(args.path):
+        paths = find_files(args.path)
 
     if len(paths) > 0:
-        for path in paths:
-            with open(path, 'r', encoding='utf-8') as f:
-                source = f.read()
-            if path.endswith('.js'):
-                errors = check_javascript(source)
-            else:
-                port_parser = _PortParser()
-                port_parser.feed(source)
-                errors = port_parser.get_errors()
-            if len(errors) > 0:
-                if len(paths) > 1:
-                    print('==> {} <=='.format(path))
-                for error in errors:
-                    print(error)
+        cache = None
+        if not args.no_cache:
+            cache = LintCache(args.cache)
+            if args.clean:
+                cache.clear()
+        results = list(check_files(paths, args.jobs, cache))
+        if args.format == 'json':
+            print(format_json(results))
+        elif args.format == 'sarif':
+            print(format_sarif(results))
+        else:
+            for path, problems in results:
+                if len(problems) > 0:
+                    if len(paths) > 1:
+                        print('==> {} <=='.format(path))
+                    for line, column, rule, message in problems:
+                        if args.line_numbers:
+                            print('{}:{}: {}'.format(line, column, message))
+                        else:
+                            print(message)
+        if cache is not None:
+            cache.save()
+            # Keep the statistics out of the JSON and SARIF output
+            print('Cache: {} hits, {} misses'.format(cache.hits, cache.misses),
+                  file=sys.stdout if args.format == 'text' else sys.stderr)
+        if any(len(problems) > 0 for path, problems in results):
+            sys.exit(1)
     else:
         suite = unittest.defaultTestLoader.loadTestsFromTestCase(_UnitTest)
         unittest.TextTestRunner(verbosity=2).run(suite)